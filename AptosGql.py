@@ -1,54 +1,190 @@
-NODE_URL ="https://indexer.mainnet.aptoslabs.com/v1/graphql"
+import functools
+import json
+import os
+import re
+import threading
+import time
 
-
-import requests
 from gql import gql, Client
 from gql.transport.requests import RequestsHTTPTransport
+from graphql import print_schema
+
+import admission
+import http_client
+import tool_cache
+
+NODE_URL = os.getenv("APTOS_INDEXER_URL", "https://indexer.mainnet.aptoslabs.com/v1/graphql")
+
+# The indexer schema is large and changes rarely: fetch it once, keep the SDL on
+# disk and build the client from that, so constructing the tool costs no request.
+SCHEMA_CACHE = os.getenv("GQL_SCHEMA_CACHE", "./gqlSchema.graphql")
+SCHEMA_TTL = int(os.getenv("GQL_SCHEMA_TTL", str(7 * 24 * 60 * 60)))
+PAGE_SIZE = int(os.getenv("GQL_PAGE_SIZE", "100"))
+# how many NFTs the agent tool returns per owner
+NFT_TOOL_LIMIT = int(os.getenv("NFT_TOOL_LIMIT", "25"))
+MAX_OWNERS = 20
+
+ADDRESS_RE = re.compile(r"0x[0-9a-fA-F]{1,64}")
+
+NFT_FIELDS = """
+    amount
+    collection_name
+    creator_address
+    name
+    owner_address"""
 
 GET_NFTS_OWNER = """
-    query CurrentTokens($owner_address: String, $offset: Int) {
+    query CurrentTokens($owner_address: String, $offset: Int, $limit: Int) {
   current_token_ownerships(
     order_by: {last_transaction_version: desc}
     offset: $offset
+    limit: $limit
     where: {owner_address: {_eq: $owner_address}}
-  ) {
-    amount
-    collection_name
-    creator_address
-    name
-    owner_address
+  ) {""" + NFT_FIELDS + """
   }
 }"""
 
 
-# GET_TX 
+def owners_query(count):
+    # one aliased selection per owner, o0..oN, in a single request
+    variables = ", ".join(f"$o{i}: String" for i in range(count))
+    selections = "".join(f"""
+  o{i}: current_token_ownerships(
+    order_by: {{last_transaction_version: desc}}
+    limit: $limit
+    where: {{owner_address: {{_eq: $o{i}}}}}
+  ) {{{NFT_FIELDS}
+  }}""" for i in range(count))
+    return f"query OwnersTokens({variables}, $limit: Int) {{{selections}\n}}"
+
+
+@functools.lru_cache(maxsize=128)
+def parse(query_string):
+    return gql(query_string)
+
+
+def load_schema(path=SCHEMA_CACHE, ttl=SCHEMA_TTL):
+    if not path or not os.path.exists(path):
+        return None
+    if ttl and time.time() - os.path.getmtime(path) > ttl:
+        return None
+    with open(path) as f:
+        return f.read()
+
+
+def save_schema(schema, path=SCHEMA_CACHE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(print_schema(schema))
+    os.replace(tmp_path, path)
+
+
+def normalize_owner(address):
+    # the indexer stores owners as full 64 hex digit addresses
+    address = tool_cache.normalize_address(address)
+    return "0x" + address[2:].zfill(64) if address.startswith("0x") else address
+
+
+# GET_TX
 
 # def generic_formatter(query,variables):
 #     for var in variables.keys()
-    
+
 
 
 class AptosGQLTool:
-    def __init__(self, url=NODE_URL , headers=None):
+    def __init__(self, url=NODE_URL , headers=None, schema_path=SCHEMA_CACHE):
         self.url = url
         self.headers = headers or {}
-        self.transport = RequestsHTTPTransport(url=self.url, headers=self.headers)
-        self.client = Client(transport=self.transport, fetch_schema_from_transport=True)
+        self.schema_path = schema_path
+        self.transport = RequestsHTTPTransport(url=self.url, headers=self.headers,
+                                               timeout=http_client.READ_TIMEOUT,
+                                               retries=http_client.RETRIES)
+        schema = load_schema(schema_path)
+        self.client = Client(transport=self.transport, schema=schema,
+                             fetch_schema_from_transport=schema is None)
+        self.session = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        # one session for the tool's lifetime instead of a connect per query
+        if self.session is None:
+            with self._lock:
+                if self.session is None:
+                    session = self.client.connect_sync()
+                    if self.client.fetch_schema_from_transport and self.schema_path:
+                        save_schema(self.client.schema, self.schema_path)
+                    self.session = session
+        return self.session
+
+    def close(self):
+        with self._lock:
+            if self.session is not None:
+                self.client.close_sync()
+                self.session = None
 
     def execute_query(self, query_string, variables=None):
-        query = gql(query_string)
-        result = self.client.execute(query, variable_values=variables)
+        query = parse(query_string)
+        # the gql transport keeps its own requests session, outside http_client
+        admission.throttle("indexer")
+        result = self.connect().execute(query, variable_values=variables)
         return result
 
-      
-    def get_user_nfts(self, account):
+
+    def get_user_nfts(self, account, offset=0, limit=PAGE_SIZE):
         query_string = GET_NFTS_OWNER
-        variables = {"owner_address": account, "offset": 0}
+        variables = {"owner_address": normalize_owner(account), "offset": offset, "limit": limit}
         result = self.execute_query(query_string, variables=variables)
         return result
 
+    def iter_user_nfts(self, account, page_size=PAGE_SIZE, max_items=None):
+        offset = 0
+        while max_items is None or offset < max_items:
+            limit = page_size if max_items is None else min(page_size, max_items - offset)
+            page = self.get_user_nfts(account, offset, limit)["current_token_ownerships"]
+            yield from page
+            if len(page) < limit:
+                return
+            offset += len(page)
+
+    def get_owners_nfts(self, accounts, limit=PAGE_SIZE):
+        # first `limit` NFTs of every owner, one round trip for all of them
+        owners = list(dict.fromkeys(normalize_owner(a) for a in accounts))
+        results = {}
+        for start in range(0, len(owners), MAX_OWNERS):
+            batch = owners[start:start + MAX_OWNERS]
+            variables = {f"o{i}": owner for i, owner in enumerate(batch)}
+            variables["limit"] = limit
+            data = self.execute_query(owners_query(len(batch)), variables=variables)
+            for i, owner in enumerate(batch):
+                results[owner] = data[f"o{i}"]
+        return results
+
     # def get_user_nfts_by_collection(self, account, collection):
-      
+
+
+_tool = None
+_tool_lock = threading.Lock()
+
+
+def get_tool():
+    global _tool
+    if _tool is None:
+        with _tool_lock:
+            if _tool is None:
+                _tool = AptosGQLTool()
+    return _tool
+
+
+@tool_cache.cached(tool_cache.nfts)
+def account_nfts(input):
+    owners = ADDRESS_RE.findall(str(input))
+    if not owners:
+        return None
+    nfts = get_tool().get_owners_nfts(owners, limit=NFT_TOOL_LIMIT)
+    if len(nfts) == 1:
+        return json.dumps(next(iter(nfts.values())), separators=(",", ":"))
+    return json.dumps(nfts, separators=(",", ":"))
 
 
 
@@ -1,78 +1,228 @@
-from langchain.agents import Tool
-from langchain.tools import BaseTool
-from aptos_sdk.client import Account
-import aptos_sdk
-import requests
-from aptos_sdk.client import FaucetClient, RestClient
-from langchain.agents import initialize_agent
-from typing_extensions import dataclass_transform
-from ctypes import resize
 import requests
+import abi_catalog
+import admission
+import http_client
+import metrics
+import tool_cache
+import semantic_cache
+import tx_reader
+import tx_decode
+import vector_file
 
-import pickle
 import os
-import hnswlib
-from llama_index import GPTVectorStoreIndex
-from llama_index import StorageContext
-from llama_index import load_index_from_storage
 import json
-
-NODE_URL = "https://fullnode.mainnet.aptoslabs.com/v1"
-MOVE_URL = "http://localhost:3000/"
-client = RestClient(NODE_URL)
+import asyncio
+import functools
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# langchain, llama_index and aptos_sdk are imported where they are first needed:
+# importing this module must stay cheap for the CLI, the servers and loadMem.py
+
+NODE_URL = os.getenv("APTOS_NODE_URL", "https://fullnode.mainnet.aptoslabs.com/v1")
+MOVE_URL = os.getenv("MOVE_URL", "http://localhost:3000/")
+admission.register_backend(NODE_URL, "fullnode")
+admission.register_backend(MOVE_URL, "move")
+DOC_STORE_DIR = "./docStore/"
+# the same store converted with `python vector_file.py convert llama ./docStore/ ./docStore.bin/`,
+# mapped instead of parsed when present
+DOC_STORE_BIN = os.getenv("DOC_STORE_BIN", "./docStore.bin/")
+# answer Github Chat Agent questions with raw retrieved chunks instead of an LLM synthesis
+GH_RAW_CONTEXT = os.getenv("GH_RAW_CONTEXT", "0") == "1"
 
 APT_SCALE = 100000000
+# tool functions are blocking, the async agent runs them here instead of on the event loop
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
 # defining a single tool
 tools = []
-# store = hnswlib.load_index("github-vectorStore")
-# vector_store = GPTVectorStoreIndex.from_vector_store(store)
-vector_store = load_index_from_storage(StorageContext.from_defaults(persist_dir="./docStore/"))
+
+_client = None
+_vector_store = None
+_client_lock = threading.Lock()
+_store_lock = threading.Lock()
+load_times = {}
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                start = time.perf_counter()
+                # RestClient asks the node for its chain id on construction
+                _client = http_client.rest_client(NODE_URL)
+                load_times['rest_client'] = time.perf_counter() - start
+    return _client
+
+
+def get_vector_store():
+    global _vector_store
+    if _vector_store is None:
+        with _store_lock:
+            if _vector_store is None:
+                start = time.perf_counter()
+                if vector_file.is_store(DOC_STORE_BIN):
+                    _vector_store = vector_file.llama_index(vector_file.open_store(DOC_STORE_BIN))
+                else:
+                    from llama_index import StorageContext, load_index_from_storage
+                    _vector_store = load_index_from_storage(
+                        StorageContext.from_defaults(persist_dir=DOC_STORE_DIR))
+                load_times['vector_store'] = time.perf_counter() - start
+    return _vector_store
+
+
+def __getattr__(name):
+    # old callers read AptosToolClient.client / .vector_store directly
+    if name == 'client':
+        return get_client()
+    if name == 'vector_store':
+        return get_vector_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up(background=True):
+    # pay the index load and node handshake before the first user does
+    def load():
+        start = time.perf_counter()
+        from langchain.agents import Tool  # noqa: F401
+        load_times['langchain'] = time.perf_counter() - start
+        if GH_RAW_CONTEXT and move_context_ready():
+            import retrieval
+            retrieval.get_engine()
+        else:
+            get_vector_store()
+        import symbol_index
+        symbol_index.get_index()
+        abi_catalog.get_catalog()
+        get_client()
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
 def format_tool_prompt(tool_name, tool_function, tool_input):
     return f"{tool_name}: useful when {tool_function} input:{tool_input}"
 
 
-def create_tool(tool_name, tool_function, tool_use, tool_input):
+def to_coroutine(tool_function):
+    @functools.wraps(tool_function)
+    async def run(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            tool_executor, functools.partial(tool_function, *args, **kwargs))
+    return run
+
+
+def create_tool(tool_name, tool_function, tool_use, tool_input, tool_coroutine=None):
+    from langchain.agents import Tool
     tool_desc = format_tool_prompt(tool_name, tool_function, tool_input)
     tool = Tool(
         name=tool_name,
         func=tool_function,
+        coroutine=tool_coroutine or to_coroutine(tool_function),
         description=tool_desc,
     )
     return tool
 
 
-def create_kit(tool_specs):
+def create_kit(tool_specs, memo=None):
+    # with a ToolMemo, every tool not marked 'cacheable': False answers repeats
+    # from that memo; give each conversation its own. A tool whose 'available'
+    # check fails is left out, the agent can't pick what would only raise
     tools = []
     for tool_spec in tool_specs:
+        available = tool_spec.get('available')
+        if available is not None and not available():
+            continue
+        tool_function = tool_spec['func']
+        tool_coroutine = tool_spec.get('coroutine')
+        if memo is not None and tool_spec.get('cacheable', True):
+            tool_function = memo.wrap(tool_spec['name'], tool_function)
+            if tool_coroutine is not None:
+                tool_coroutine = memo.wrap_async(tool_spec['name'], tool_coroutine)
         tools.append(
             create_tool(tool_name=tool_spec['name'],
-                        tool_function=tool_spec['func'],
+                        tool_function=tool_function,
                         tool_use=tool_spec['use'],
-                        tool_input=tool_spec['input']))
+                        tool_input=tool_spec['input'],
+                        tool_coroutine=tool_coroutine))
     return tools
 
 
+# near-identical questions get the stored answer instead of another LLM round trip
+move_answers = semantic_cache.create("move_agent")
+# use_gh answers in two formats, raw chunks or a synthesized reply; each has
+# its own cache so flipping GH_RAW_CONTEXT never serves the other's answers
+gh_answers = semantic_cache.create("github_agent-vector_store")
+gh_contexts = semantic_cache.create("github_agent-move_context")
+
+
+@move_answers.wrap
 def use_moveGPT(input):
-    req = requests.post(MOVE_URL + "generate-response",
-                        json={"question": input})
+    req = http_client.post(MOVE_URL + "generate-response",
+                           json={"question": input},
+                           timeout=(http_client.CONNECT_TIMEOUT, http_client.MOVE_READ_TIMEOUT))
     answer = req.json().get('answer')
     res = json.dumps({"answer": answer})  # Wrapping the answer in a dictionary.
     return res
 
 
+@move_answers.wrap_async
+async def ause_moveGPT(input):
+    # the Move server can take a while, don't hold an executor thread for it
+    data = await http_client.async_client().post_json(
+        MOVE_URL + "generate-response", json={"question": input},
+        timeout=http_client.MOVE_READ_TIMEOUT)
+    return json.dumps({"answer": data.get('answer')})
+
+
 def use_gh(input="what is move"):
-    q = vector_store.query(input)
-    res = json.dumps(q)
+    if GH_RAW_CONTEXT and move_context_ready():
+        return gh_context(input)
+    return gh_answer(input)
+
+
+@gh_contexts.wrap
+def gh_context(input):
+    with metrics.retrieval_seconds.time(source="move_context"):
+        return use_move_context(input)
+
+
+@gh_answers.wrap
+def gh_answer(input):
+    with metrics.retrieval_seconds.time(source="vector_store"):
+        q = get_vector_store().as_query_engine().query(input)
+    res = json.dumps(str(q))  # the query Response object itself isn't JSON
     return res
 
 
+def move_context_ready():
+    import retrieval
+    return retrieval.has_store()
+
+
+def use_move_context(input="what is move"):
+    import retrieval
+    return retrieval.move_context(input)
+
+
+def use_symbol_lookup(input="coin::transfer"):
+    import symbol_index
+    return symbol_index.move_symbol_lookup(input)
+
+
 # THESE ARE THE FUNCTIONS TO BE USED BY THE TOOLS
+@tool_cache.cached(tool_cache.balances)
 def account_balance(
     input="0x9ee9892d8600ed0bf65173d801ab75204a16ac2c6f190454a3b98f6bcb99d915"
 ):
-    res = float(client.account_balance(input)) / APT_SCALE
+    res = float(get_client().account_balance(input)) / APT_SCALE
     res = json.dumps(res)
     return res
 
@@ -85,63 +235,73 @@ def account_balance(
 # def module_question()
 
 
-def split_function(func_str):
-    parts = func_str.split("::")
-    return {'address': parts[0], 'module': parts[1], 'function': parts[2]}
+# how many transactions the tool hands the agent unless asked for more
+TX_DEFAULT_COUNT = 2
+TX_MAX_COUNT = 50
 
 
-def account_transactions(input="0x1"):
-
-    req = requests.get(NODE_URL + "/accounts/" + input + '/transactions')
-    txs = []
-    if (req):
-        data = req.json()
-        for d in data:
-            payload = d['payload']
-            # print(payload)
-            f = split_function(payload['function'])
-            tx = {}
-            tx['address'] = f['address']
-            tx['module'] = f['module']
-            tx['function'] = f['function']
-            if payload['type_arguments']:
-                tx['type_arguments'] = payload['type_arguments']
-            if payload['arguments']:
-                tx['arguments'] = payload['arguments']
-            txs.append(tx)
-            # })
-        res = json.dumps(txs[:2])
-        return res
+def parse_int(value):
+    try:
+        return int(str(value).strip('"\'.'))
+    except (TypeError, ValueError):
+        return None
 
 
-def account_modules(input="0x1"):
-    req = requests.get(NODE_URL + "/accounts/" + input + '/modules')
+def parse_tx_query(input):
+    # "0xabc", "0xabc last=10" or "0xabc since=123456"
+    parts = str(input).replace(',', ' ').split()
+    address = parts[0].strip('"\'') if parts else "0x1"
+    options = dict(p.split('=', 1) for p in parts[1:] if '=' in p)
+    # the agent writes these, `last=ten` or `since=latest` fall back to the default
+    last = parse_int(options.get('last'))
+    since = parse_int(options.get('since'))
+    last = min(last, TX_MAX_COUNT) if last and last > 0 else None
+    since = since if since is not None and since >= 0 else None
+    if last is None and since is None:
+        last = TX_DEFAULT_COUNT
+    return address, last, since
 
-    if req:
-        data = req.json()
-        function_list = []
 
-        for module in data:
-            functions = module.get('abi', {}).get('exposed_functions', [])
-            function_info = []
+@tool_cache.cached(tool_cache.transactions)
+def account_transactions(input="0x1"):
+    address, last, since = parse_tx_query(input)
+    try:
+        txs = tx_reader.iter_transactions(NODE_URL, address, last=last, since_version=since)
+        # since= alone could be unbounded, the prompt can't be
+        res = tx_decode.dumps(itertools.islice(txs, TX_MAX_COUNT))
+    except requests.RequestException:
+        return None
+    return res
 
-            for func in functions:
-                func_name = func['name']
-                param_types = [param for param in func.get('params', [])]
 
-                func_string = format_func(module['name'], func_name,
-                                          param_types)
-                function_info.append(func_string)
-            function_list.append(function_info)
+@tool_cache.cached(tool_cache.modules)
+def account_modules(input="0x1"):
+    # "0x1" lists every module, "0x1::coin" or "coin::trans" searches the catalog
+    input = str(input).strip().strip('"\'')
+    if "::" in input:
+        return abi_catalog.get_catalog().search(input, node_url=NODE_URL)
+    cataloged = catalog_modules(input)
+    if cataloged is not None:
+        return cataloged
+    req = http_client.get(NODE_URL + "/accounts/" + input + '/modules')
 
-        return function_list
+    if req:
+        return module_functions(req.json())
     else:
         return []
 
 
-# need to fix to prop format types
-def format_func(mod_name, func_name, param_types):
-    return f"{mod_name}::{func_name}::({', '.join(param_types)})"
+def catalog_modules(address):
+    # None unless the catalog was stamped with every module of the address on
+    # chain, and the chain reports no upgrade since
+    catalog = abi_catalog.get_catalog()
+    if catalog.serves(address, NODE_URL):
+        return catalog.account_modules(address)
+    return None
+
+
+def module_functions(data):
+    return abi_catalog.module_functions(abi_catalog.from_abi(data))
 
 
 # def account_nft_balance(input="0x1"):
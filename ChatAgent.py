@@ -2,27 +2,48 @@ from langchain.agents import Tool, initialize_agent
 from langchain.chains.conversation.memory import ConversationBufferWindowMemory
 
 from langchain.chat_models import ChatOpenAI
+import os
 
-# Set up the turbo LLM
-turbo_llm = ChatOpenAI(
-    temperature=0,
-    model_name='gpt-3.5-turbo'
-) 
+from instrumentation import LLMThrottleHandler
+
+llms = {}
+# step-by-step agent transcript on stdout, for local debugging
+VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
+# offer the planner a Multi Tool that runs several tool calls in one step
+PARALLEL_TOOLS = os.getenv("AGENT_PARALLEL_TOOLS", "0") == "1"
+# turns of the conversation the agent sees
+MEMORY_TURNS = 3
+
+
+# Set up the turbo LLM on first use, not at import
+def get_llm(streaming=False):
+    if streaming not in llms:
+        # the streaming one emits on_llm_new_token callbacks for the streaming server
+        llms[streaming] = ChatOpenAI(
+            temperature=0,
+            model_name='gpt-3.5-turbo',
+            streaming=streaming,
+            callbacks=[LLMThrottleHandler()]
+        )
+    return llms[streaming]
 
 
 class ChatAgent:
-    def __init__(self, tools):
+    def __init__(self, tools, streaming=False, parallel_tools=PARALLEL_TOOLS):
+        if parallel_tools:
+            from parallel_tools import create_multi_tool
+            tools = list(tools) + [create_multi_tool(tools)]
         self.tools = tools
         self.memory = ConversationBufferWindowMemory(
             memory_key='chat_history',
-            k=3,
+            k=MEMORY_TURNS,
             return_messages=True
         )
         self.conversational_agent = initialize_agent(
             agent='chat-conversational-react-description',
             tools=tools,
-            llm=turbo_llm,
-            verbose=True,
+            llm=get_llm(streaming),
+            verbose=VERBOSE,
             max_iterations=3,
             early_stopping_method='generate',
             memory=self.memory
@@ -30,7 +51,17 @@ class ChatAgent:
 
   
 
-    def chat(self, message):
-        return self.conversational_agent(message)
+    def load_history(self, turns):
+        # rebuild the window from the stored transcript, for a conversation
+        # whose earlier turns ran in another agent or another process
+        self.memory.clear()
+        for turn in turns[-MEMORY_TURNS:]:
+            self.memory.save_context({'input': turn['user']}, {'output': turn['agent']})
+
+    def chat(self, message, callbacks=None):
+        return self.conversational_agent(message, callbacks=callbacks)
+
+    async def achat(self, message, callbacks=None):
+        return await self.conversational_agent.acall(message, callbacks=callbacks)
 
   
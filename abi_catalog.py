@@ -0,0 +1,344 @@
+import argparse
+import bisect
+import difflib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+
+import http_client
+import symbol_index
+
+# The exposed functions of the framework addresses, built offline from
+# move-files/ and loaded from one pickle, so "what can I call on 0x1" never
+# downloads every module's ABI. move-files/ is a snapshot, not the chain: the
+# build is stamped with the PackageRegistry of each address, and only modules
+# the registry lists are served, while the chain reports no upgrade since.
+# Anything else, test-only modules, modules missing from the snapshot, an
+# unstamped catalog, goes to the fullnode.
+CATALOG_PATH = os.getenv("ABI_CATALOG", "./abiCatalog.pkl")
+CATALOG_VERSION = 2
+ADDRESSES = ("0x1", "0x3", "0x4")
+# how often a stamped catalog asks the chain whether its packages moved on
+CHECK_INTERVAL = int(os.getenv("ABI_CATALOG_CHECK_INTERVAL", "3600"))
+MAX_RESULTS = 10
+FUZZY_CUTOFF = 0.6
+PACKAGE_REGISTRY = "0x1::code::PackageRegistry"
+DEFAULT_NODE_URL = "https://fullnode.mainnet.aptoslabs.com/v1"
+
+# function layout, tuples like the symbol index; params are (name, type) pairs,
+# the name is empty when the function came from an on-chain ABI
+FIELDS = ("name", "visibility", "entry", "generics", "params", "returns")
+
+
+def split_returns(returns):
+    if not returns:
+        return ()
+    if returns.startswith("(") and returns.endswith(")"):
+        return tuple(symbol_index.split_top(returns[1:-1]))
+    return (returns,)
+
+
+def exposed(visibility, entry):
+    # what the fullnode lists under abi.exposed_functions
+    return visibility in ("public", "friend", "package") or entry
+
+
+def from_records(records, addresses=ADDRESSES):
+    modules = {}
+    for r in map(dict, (zip(symbol_index.FIELDS, record) for record in records)):
+        if r["address"] not in addresses or r["test"]:
+            continue
+        if r["kind"] == "module":
+            modules.setdefault(r["address"], {}).setdefault(r["module"], [])
+        elif r["kind"] == "function" and exposed(r["visibility"], r["entry"]):
+            modules.setdefault(r["address"], {}).setdefault(r["module"], []).append((
+                r["name"], r["visibility"], bool(r["entry"]), tuple(r["generics"]),
+                tuple(r["params"]), split_returns(r["returns"])))
+    return {address: {module: tuple(sorted(functions)) for module, functions in by_module.items()}
+            for address, by_module in modules.items()}
+
+
+def from_abi(data):
+    # a fullnode /modules response in the catalog layout
+    modules = {}
+    for module in data:
+        abi = module.get('abi') or {}
+        functions = []
+        for func in abi.get('exposed_functions', []):
+            generics = tuple(f"T{i}" + (": " + " + ".join(g['constraints']) if g.get('constraints') else "")
+                             for i, g in enumerate(func.get('generic_type_params', [])))
+            functions.append((func['name'], func.get('visibility'), bool(func.get('is_entry')), generics,
+                              tuple(("", p) for p in func.get('params', [])), tuple(func.get('return', []))))
+        modules[abi.get('name') or module.get('name')] = tuple(functions)
+    return modules
+
+
+def format_function(module, func, address=None):
+    name, visibility, entry, generics, params, returns = func
+    head = " ".join(w for w in (visibility if visibility != "private" else "", "entry" if entry else "") if w)
+    text = f"{address}::{module}::{name}" if address else f"{module}::{name}"
+    if generics:
+        text += "<" + ", ".join(generics) + ">"
+    text += "(" + ", ".join(f"{n}: {t}" if n else t for n, t in params) + ")"
+    if returns:
+        text += ": " + (returns[0] if len(returns) == 1 else "(" + ", ".join(returns) + ")")
+    return f"{head} {text}" if head else text
+
+
+def module_functions(modules):
+    # one list of signatures per module, what the Account Modules tool returns
+    return [[format_function(module, func) for func in functions]
+            for module, functions in sorted(modules.items())]
+
+
+class AbiCatalog:
+    def __init__(self, modules, packages=None, onchain=None, built=None):
+        self.modules = modules  # address -> module -> functions
+        self.packages = packages or {}  # address -> package -> upgrade number, when stamped
+        self.onchain = onchain or {}  # address -> module names the registry listed, when stamped
+        self.built = built
+        self.checked = {}  # address -> (time, outdated)
+        self._lock = threading.Lock()
+        self.by_key = {}
+        for address, by_module in modules.items():
+            for module, functions in by_module.items():
+                for key in (f"{address}::{module}", module):
+                    self.by_key.setdefault(key.lower(), []).append((address, module, None))
+                for func in functions:
+                    for key in (f"{address}::{module}::{func[0]}", f"{module}::{func[0]}", func[0]):
+                        self.by_key.setdefault(key.lower(), []).append((address, module, func))
+        self.keys = sorted(self.by_key)
+        # fuzzy matching only compares names of the same shape, `coin::balnce`
+        # against module::function keys rather than all of them
+        self.shapes = {}
+        for key in self.keys:
+            self.shapes.setdefault(key.count("::"), []).append(key)
+
+    @classmethod
+    def build(cls, records=None):
+        if records is None:
+            records = symbol_index.SymbolIndex.build().records
+        return cls(from_records(records), built=time.time())
+
+    def save(self, path=CATALOG_PATH):
+        with open(path, "wb") as f:
+            pickle.dump((CATALOG_VERSION, self.built, self.packages, self.onchain, self.modules), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with open(path, "rb") as f:
+            version, built, packages, onchain, modules = pickle.load(f)
+        if version != CATALOG_VERSION:
+            raise ValueError(f"{path} is catalog version {version}, expected {CATALOG_VERSION}")
+        return cls(modules, packages, onchain, built)
+
+    def covers(self, address, module=None):
+        # only what the registry listed when the catalog was stamped; a whole
+        # address only when every one of its on-chain modules is cataloged
+        address = symbol_index.canonical_address(address)
+        onchain = self.onchain.get(address)
+        if not onchain:
+            return False
+        if module is None:
+            return onchain <= self.modules.get(address, {}).keys()
+        return module in onchain and module in self.modules.get(address, {})
+
+    def stamp(self, node_url):
+        # record the upgrade numbers and module names of each address's
+        # packages; build right after syncing move-files/ with the chain
+        for address in self.modules:
+            packages, names = fetch_registry(node_url, address)
+            self.packages[address] = packages
+            self.onchain[address] = frozenset(names)
+
+    def verified(self, address, node_url):
+        # stamped, and the chain reports no upgrade since; asks the chain at
+        # most once per CHECK_INTERVAL, unreachable counts as not verified
+        address = symbol_index.canonical_address(address)
+        known = self.packages.get(address)
+        if not known:
+            return False
+        with self._lock:
+            checked = self.checked.get(address)
+        if checked is not None and time.monotonic() - checked[0] < CHECK_INTERVAL:
+            return checked[1]
+        try:
+            current, _ = fetch_registry(node_url, address)
+        except Exception:
+            return False
+        result = all(number <= known.get(name, -1) for name, number in current.items())
+        with self._lock:
+            self.checked[address] = (time.monotonic(), result)
+        return result
+
+    def serves(self, address, node_url, module=None):
+        return self.covers(address, module) and self.verified(address, node_url)
+
+    def account_modules(self, address):
+        address = symbol_index.canonical_address(address)
+        return module_functions({module: functions for module, functions in self.modules[address].items()
+                                 if module in self.onchain[address]})
+
+    def exact(self, query):
+        return self.by_key.get(symbol_index.normalize_query(query), [])
+
+    def prefix(self, query, limit=MAX_RESULTS):
+        query = symbol_index.normalize_query(query)
+        start = bisect.bisect_left(self.keys, query)
+        names = []
+        for key in self.keys[start:]:
+            if not key.startswith(query) or len(names) >= limit:
+                break
+            names.append(key)
+        return names
+
+    def fuzzy(self, query, limit=MAX_RESULTS):
+        query = symbol_index.normalize_query(query)
+        return difflib.get_close_matches(query, self.shapes.get(query.count("::"), []),
+                                         n=limit, cutoff=FUZZY_CUTOFF)
+
+    def resolve(self, query, limit=MAX_RESULTS):
+        # exact name first, then names starting with the query, then close spellings
+        hits = self.exact(query)
+        if not hits:
+            names = self.prefix(query, limit) or self.fuzzy(query, limit)
+            hits = [hit for name in names for hit in self.by_key[name]]
+        return list(dict.fromkeys(hits))
+
+    def search(self, query, limit=MAX_RESULTS, node_url=None):
+        # with a node_url, modules the catalog can't vouch for are read from
+        # the fullnode and names it has that the chain doesn't are dropped
+        out = []
+        live = {}
+        for address, module, func in self.resolve(query, limit):
+            if node_url is None or self.serves(address, node_url, module):
+                functions = self.modules[address][module]
+            else:
+                if (address, module) not in live:
+                    live[(address, module)] = fetch_module(node_url, address, module)
+                functions = live[(address, module)]
+                if functions is None:
+                    continue
+                if func is not None:
+                    func = next((f for f in functions if f[0] == func[0]), None)
+                    if func is None:
+                        continue
+            if func is None:
+                out.append({"module": f"{address}::{module}",
+                            "functions": [format_function(module, f) for f in functions]})
+            else:
+                out.append({"function": format_function(module, func, address)})
+            if len(out) >= limit:
+                break
+        if not out and node_url is not None:
+            return search_live(query, node_url, limit)
+        return out
+
+
+def fetch_registry(node_url, address):
+    # upgrade number per package, and the names of every module they publish
+    req = http_client.get(node_url + "/accounts/" + address + "/resource/" + PACKAGE_REGISTRY)
+    if req.status_code == 404:
+        return {}, set()
+    req.raise_for_status()
+    packages = req.json()['data']['packages']
+    return ({p['name']: int(p['upgrade_number']) for p in packages},
+            {m['name'] for p in packages for m in p.get('modules', [])})
+
+
+def fetch_module(node_url, address, module):
+    # one module's exposed functions from the fullnode, None when it isn't on chain
+    req = http_client.get(node_url + "/accounts/" + address + "/module/" + module)
+    if req.status_code == 404:
+        return None
+    req.raise_for_status()
+    return from_abi([req.json()]).get(module, ())
+
+
+def search_live(query, node_url, limit=MAX_RESULTS):
+    # `0x3::token` or `0x3::token::create` the catalog doesn't know, straight from the fullnode
+    parts = symbol_index.normalize_query(query).split("::")
+    if len(parts) < 2 or not parts[0].startswith("0x"):
+        return []
+    address, module, name = parts[0], parts[1], "::".join(parts[2:])
+    functions = fetch_module(node_url, address, module)
+    if functions is None:
+        return []
+    if not name:
+        return [{"module": f"{address}::{module}", "functions": [format_function(module, f) for f in functions]}]
+    return [{"function": format_function(module, f, address)}
+            for f in functions if f[0].lower().startswith(name)][:limit]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(path=CATALOG_PATH):
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_or_build(path)
+    return _catalog
+
+
+def load_or_build(path=CATALOG_PATH):
+    # an older or damaged pickle is rebuilt and replaced; the rebuild is
+    # unstamped, so until `abi_catalog.py build` runs again it answers names
+    # offline and goes to the fullnode for the ABIs themselves
+    if not os.path.exists(path):
+        return AbiCatalog.build(symbol_index.get_index().records)
+    try:
+        return AbiCatalog.load(path)
+    except (ValueError, EOFError, pickle.UnpicklingError) as e:
+        print(f"{path}: {e}, rebuilding", file=sys.stderr)
+    catalog = AbiCatalog.build(symbol_index.get_index().records)
+    try:
+        catalog.save(path)
+    except OSError as e:
+        print(f"{path}: not saved, {e}", file=sys.stderr)
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the framework ABI catalog")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--out", default=CATALOG_PATH)
+    build.add_argument("--stamp", metavar="NODE_URL", default=os.getenv("APTOS_NODE_URL", DEFAULT_NODE_URL),
+                       help="fullnode whose PackageRegistry the catalog is checked against")
+    build.add_argument("--no-stamp", dest="stamp", action="store_const", const=None,
+                       help="skip the check; the catalog then only answers name searches offline")
+    query = sub.add_parser("query")
+    query.add_argument("name")
+    query.add_argument("--catalog", default=CATALOG_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        catalog = AbiCatalog.build()
+        if args.stamp:
+            catalog.stamp(args.stamp.rstrip("/"))
+        catalog.save(args.out)
+        functions = sum(len(f) for by_module in catalog.modules.values() for f in by_module.values())
+        modules = sum(len(by_module) for by_module in catalog.modules.values())
+        print(f"Cataloged {functions} functions in {modules} modules "
+              f"in {time.perf_counter() - start:.1f}s -> {args.out} ({os.path.getsize(args.out)} bytes)")
+    else:
+        start = time.perf_counter()
+        catalog = AbiCatalog.load(args.catalog)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        result = catalog.search(args.name)
+        elapsed = time.perf_counter() - start
+        print(json.dumps(result, indent=2))
+        print(f"load {loaded * 1000:.1f} ms, search {elapsed * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
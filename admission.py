@@ -0,0 +1,229 @@
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# Overload protection. Chat turns are admitted under a global and a per-user
+# concurrency limit; the rest wait in a bounded FIFO queue with a deadline and
+# are turned away fast once it is full. Below that, every backend (OpenAI, the
+# fullnode, the Move server, the indexer) has a token bucket, so a burst of
+# admitted turns still reaches each service at a steady rate.
+MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "2"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# longest a call waits on a backend's bucket before giving up
+BACKEND_MAX_WAIT = float(os.getenv("BACKEND_MAX_WAIT", "10"))
+
+# requests per second and burst per backend, RATE_LIMIT_<NAME>=rate[:burst], 0 is unlimited
+BACKEND_RATES = {
+    "openai": "50:50",
+    "fullnode": "50:100",
+    "indexer": "20:40",
+    "move": "5:10",
+}
+
+queue_depth = metrics.gauge("movegpt_admission_queue_depth", "Chat turns waiting for a slot")
+active_turns = metrics.gauge("movegpt_admission_active", "Chat turns running")
+wait_seconds = metrics.histogram("movegpt_admission_wait_seconds", "Time a chat turn waited for a slot")
+rejected = metrics.counter("movegpt_admission_rejected_total", "Chat turns turned away by reason")
+backend_wait_seconds = metrics.histogram("movegpt_backend_wait_seconds", "Time spent waiting on a backend rate limit")
+backend_rejected = metrics.counter("movegpt_backend_rejected_total", "Calls dropped after waiting too long on a backend rate limit")
+
+
+class Rejected(Exception):
+    def __init__(self, status, reason, retry_after=1):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class BackendBusy(Rejected):
+    def __init__(self, backend):
+        super().__init__(503, f"{backend} rate limit, try again shortly")
+        self.backend = backend
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait, tokens=1):
+        # take tokens now or book them in the future; returns the wait, or
+        # None when that wait would exceed max_wait
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= tokens else (tokens - self.tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self.tokens -= tokens
+            return wait
+
+
+buckets = {}
+prefixes = []  # (url prefix, backend), longest first
+
+
+def configure(rates=BACKEND_RATES, share=1.0):
+    # `share` is this process's part of the limits, 1/N in each of N workers
+    for name, default in rates.items():
+        rate, _, burst = os.getenv(f"RATE_LIMIT_{name.upper()}", default).partition(":")
+        if float(rate) > 0:
+            burst = float(burst) if burst else float(rate)
+            buckets[name] = TokenBucket(float(rate) * share, max(1.0, burst * share))
+        else:
+            buckets.pop(name, None)
+
+
+def register_backend(url_prefix, name):
+    prefixes.append((url_prefix.rstrip("/"), name))
+    prefixes.sort(key=lambda p: -len(p[0]))
+
+
+def backend_for(url):
+    for prefix, name in prefixes:
+        if url.startswith(prefix):
+            return name
+    return None
+
+
+def reserve(backend):
+    bucket = buckets.get(backend)
+    if bucket is None:
+        return 0.0
+    wait = bucket.reserve(BACKEND_MAX_WAIT)
+    if wait is None:
+        backend_rejected.inc(backend=backend)
+        raise BackendBusy(backend)
+    if wait:
+        backend_wait_seconds.observe(wait, backend=backend)
+    return wait
+
+
+def throttle(url_or_backend):
+    # blocks until the backend behind this URL has capacity
+    backend = backend_for(url_or_backend) or url_or_backend
+    wait = reserve(backend)
+    if wait:
+        time.sleep(wait)
+
+
+async def athrottle(url_or_backend):
+    backend = backend_for(url_or_backend) or url_or_backend
+    wait = reserve(backend)
+    if wait:
+        await asyncio.sleep(wait)
+
+
+class Ticket:
+    def __init__(self, user):
+        self.user = user
+        self.admitted = False
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_per_user=MAX_PER_USER,
+                 max_queue=MAX_QUEUE, timeout=QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.per_user = {}
+        self.waiting = deque()
+
+    def _fits(self, user):
+        return self.active < self.max_concurrent and self.per_user.get(user, 0) < self.max_per_user
+
+    def _start(self, ticket):
+        ticket.admitted = True
+        self.active += 1
+        self.per_user[ticket.user] = self.per_user.get(ticket.user, 0) + 1
+        active_turns.set(self.active)
+
+    def _dispatch(self):
+        # oldest waiter first, skipping users that are at their own limit
+        for ticket in list(self.waiting):
+            if self.active >= self.max_concurrent:
+                break
+            if self._fits(ticket.user):
+                self.waiting.remove(ticket)
+                self._start(ticket)
+        queue_depth.set(len(self.waiting))
+
+    def acquire(self, user):
+        start = time.perf_counter()
+        with self._cond:
+            ticket = Ticket(user)
+            if not self.waiting and self._fits(user):
+                self._start(ticket)
+            else:
+                # one user may hold max_per_user turns and queue as many again
+                queued = sum(1 for t in self.waiting if t.user == user)
+                if self.per_user.get(user, 0) + queued >= 2 * self.max_per_user:
+                    rejected.inc(reason="user")
+                    raise Rejected(429, "too many chats in progress for this user")
+                if len(self.waiting) >= self.max_queue:
+                    rejected.inc(reason="queue_full")
+                    raise Rejected(503, "server busy, try again shortly", retry_after=2)
+                self.waiting.append(ticket)
+                queue_depth.set(len(self.waiting))
+                deadline = time.monotonic() + self.timeout
+                while not ticket.admitted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.waiting.remove(ticket)
+                        queue_depth.set(len(self.waiting))
+                        rejected.inc(reason="timeout")
+                        raise Rejected(503, "timed out waiting for a free slot", retry_after=5)
+                    self._cond.wait(remaining)
+        wait_seconds.observe(time.perf_counter() - start)
+        return ticket
+
+    def release(self, ticket):
+        with self._cond:
+            self.active -= 1
+            count = self.per_user[ticket.user] - 1
+            if count:
+                self.per_user[ticket.user] = count
+            else:
+                del self.per_user[ticket.user]
+            active_turns.set(self.active)
+            self._dispatch()
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, user):
+        ticket = self.acquire(user)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'waiting': len(self.waiting),
+                'users': len(self.per_user),
+                'max_concurrent': self.max_concurrent,
+                'max_per_user': self.max_per_user,
+                'max_queue': self.max_queue,
+            }
+
+
+configure()
+controller = AdmissionController()
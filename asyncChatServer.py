@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+
+from aiohttp import web
+
+import metrics
+from AptosToolClient import create_kit, warm_up
+from ChatAgent import ChatAgent
+from instrumentation import AgentMetricsHandler
+from session_pool import SessionPool
+from streaming import PING, AgentStreamHandler, sse_event
+from tool_memo import ToolMemo
+from tools import tool_specs
+
+# asyncio flavour of chatServer: one process, one event loop, every conversation
+# is a task, and /chat/stream pushes agent steps and tokens as Server-Sent Events
+
+if os.getenv("WARM_UP", "1") == "1":
+    warm_up()
+
+sessions = SessionPool(lambda: ChatAgent(create_kit(tool_specs, memo=ToolMemo()), streaming=True),
+                       lock_factory=asyncio.Lock)
+
+
+@web.middleware
+async def cors(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    return response
+
+
+async def read_turn(request):
+    payload = await request.json()
+    key = (payload['user_id'], payload['convo_id'])
+    return key, payload['messages']
+
+
+async def chat(request):
+    key, user_input = await read_turn(request)
+    session = sessions.get(key)
+    metrics_handler = AgentMetricsHandler()
+    ok = False
+    try:
+        with metrics.chat_seconds.time():
+            async with session.lock:
+                response = await session.agent.achat(user_input, callbacks=[metrics_handler])
+        ok = True
+    finally:
+        sessions.release(session)
+        metrics_handler.finish(ok)
+    return web.Response(text=response['output'])
+
+
+async def chat_stream(request):
+    key, user_input = await read_turn(request)
+    stream = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    stream.enable_chunked_encoding()
+    await stream.prepare(request)
+    # flush something right away, time to first byte should not wait on the LLM
+    await stream.write(sse_event('start', {'user_id': key[0], 'convo_id': key[1]}))
+
+    session = sessions.get(key)
+    handler = AgentStreamHandler()
+    metrics_handler = AgentMetricsHandler()
+    ok = False
+    start = time.perf_counter()
+    try:
+        async with session.lock:
+            task = asyncio.create_task(session.agent.achat(user_input, callbacks=[handler, metrics_handler]))
+            task.add_done_callback(lambda _: handler.close())
+            try:
+                async for item in handler.events():
+                    # aiohttp 3.8 doesn't cancel the handler on disconnect, the
+                    # heartbeat's write fails instead, even mid tool call
+                    await stream.write(sse_event(*item) if item else PING)
+                response = await task
+            except (asyncio.CancelledError, ConnectionResetError):
+                # client went away: aiohttp cancels this handler, or the write
+                # fails. Stop spending tokens on it, and keep the lock until the
+                # agent has stopped so the next turn never runs beside it
+                task.cancel()
+                await asyncio.wait([task])
+                raise
+            except Exception as e:
+                await stream.write(sse_event('error', {'error': str(e)}))
+            else:
+                ok = True
+                await stream.write(sse_event('done', {'output': response['output']}))
+    finally:
+        sessions.release(session)
+        metrics.chat_seconds.observe(time.perf_counter() - start)
+        metrics_handler.finish(ok)
+    await stream.write_eof()
+    return stream
+
+
+async def session_stats(request):
+    return web.json_response(sessions.stats())
+
+
+async def metrics_text(request):
+    return web.Response(body=metrics.render().encode('utf-8'),
+                        headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+def create_app():
+    app = web.Application(middlewares=[cors])
+    app.router.add_post('/chat', chat)
+    app.router.add_post('/chat/stream', chat_stream)
+    app.router.add_get('/sessions', session_stats)
+    app.router.add_get('/metrics', metrics_text)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), port=int(os.getenv("PORT", "5000")))
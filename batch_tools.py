@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import re
+from urllib.parse import quote
+
+import http_client
+import tool_cache
+import tx_decode
+from AptosToolClient import NODE_URL, APT_SCALE, TX_DEFAULT_COUNT, catalog_modules, module_functions, tool_executor
+
+# Multi-address variants of the account tools: one agent step fans out to every
+# address at once instead of one LLM iteration per wallet.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ADDRESSES = int(os.getenv("BATCH_MAX_ADDRESSES", "50"))
+APT_COIN_STORE = "0x1::coin::CoinStore<0x1::aptos_coin::AptosCoin>"
+
+ADDRESS_RE = re.compile(r"0x[0-9a-fA-F]{1,64}")
+
+
+def parse_addresses(input):
+    # accepts a JSON list or any comma/space separated text with 0x addresses
+    seen = []
+    for address in ADDRESS_RE.findall(str(input)):
+        address = address.lower()
+        if address not in seen:
+            seen.append(address)
+    return seen[:BATCH_MAX_ADDRESSES]
+
+
+async def fetch_balance(address):
+    data = await http_client.async_client().get_json(
+        NODE_URL + "/accounts/" + address + "/resource/" + quote(APT_COIN_STORE))
+    return json.dumps(float(data['data']['coin']['value']) / APT_SCALE)
+
+
+async def fetch_transactions(address, count=TX_DEFAULT_COUNT):
+    client = http_client.async_client()
+    try:
+        account = await client.get_json(NODE_URL + "/accounts/" + address)
+    except http_client.HttpError as e:
+        # never used on chain, same answer as the single-address tool
+        if e.status == 404:
+            return json.dumps([])
+        raise
+    end = int(account['sequence_number'])
+    if end == 0:
+        return json.dumps([])
+    start = max(0, end - count)
+    page = await client.get_json(NODE_URL + "/accounts/" + address + "/transactions",
+                                 params={'start': start, 'limit': end - start})
+    return tx_decode.dumps([tx_decode.record(d) for d in reversed(page)])
+
+
+async def fetch_modules(address):
+    # the catalog check may load the catalog or ask the chain, keep it off the loop
+    cataloged = await asyncio.get_running_loop().run_in_executor(tool_executor, catalog_modules, address)
+    if cataloged is not None:
+        return cataloged
+    data = await http_client.async_client().get_json(
+        NODE_URL + "/accounts/" + address + "/modules")
+    return module_functions(data)
+
+
+async def fan_out(addresses, fetch, cache, concurrency=BATCH_CONCURRENCY):
+    # cached addresses are answered locally, the rest go out under a semaphore
+    results = {}
+    missing = []
+    for address in addresses:
+        hit, value = cache.get(address)
+        if hit:
+            results[address] = value
+        else:
+            missing.append(address)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(address):
+        async with semaphore:
+            try:
+                value = await fetch(address)
+            except Exception as e:
+                return address, {'error': str(e)}
+            if value:
+                cache.set(address, value)
+            return address, value
+
+    for address, value in await asyncio.gather(*(one(a) for a in missing)):
+        results[address] = value
+    return results
+
+
+def compact(results, addresses):
+    # same order the user gave, values decoded so the agent sees one JSON object
+    out = {}
+    for address in addresses:
+        value = results.get(address)
+        out[address] = json.loads(value) if isinstance(value, str) else value
+    return json.dumps(out, separators=(',', ':'))
+
+
+async def aaccount_balances(input):
+    addresses = parse_addresses(input)
+    return compact(await fan_out(addresses, fetch_balance, tool_cache.balances), addresses)
+
+
+async def aaccount_transactions_batch(input):
+    addresses = parse_addresses(input)
+    return compact(await fan_out(addresses, fetch_transactions, tool_cache.transactions), addresses)
+
+
+async def aaccount_modules_batch(input):
+    addresses = parse_addresses(input)
+    return compact(await fan_out(addresses, fetch_modules, tool_cache.modules), addresses)
+
+
+def account_balances(input):
+    return http_client.run(aaccount_balances(input))
+
+
+def account_transactions_batch(input):
+    return http_client.run(aaccount_transactions_batch(input))
+
+
+def account_modules_batch(input):
+    return http_client.run(aaccount_modules_batch(input))
+
+
+batch_tool_specs = [
+  {
+    'name': 'Account Balances',
+    'func': account_balances,
+    'coroutine': aaccount_balances,
+    'use': 'find the balances of several accounts at once',
+    'input': 'comma separated list of accounts'
+  },
+  {
+    'name': 'Accounts Transactions',
+    'func': account_transactions_batch,
+    'coroutine': aaccount_transactions_batch,
+    'use': 'find recent transactions of several accounts at once',
+    'input': 'comma separated list of accounts'
+  },
+  {
+    'name': 'Accounts Modules',
+    'func': account_modules_batch,
+    'coroutine': aaccount_modules_batch,
+    'use': 'list the module functions published by several accounts at once',
+    'input': 'comma separated list of accounts'
+  },
+]
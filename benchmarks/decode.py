@@ -0,0 +1,104 @@
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Transaction page decoding, the previous path against tx_decode, on pages shaped
+# like the fullnode's (write sets and events included), no network:
+#   python benchmarks/decode.py --sizes 100,1000 --runs 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stubs  # noqa: E402
+import tx_decode  # noqa: E402
+
+ADDRESS = "0x" + "ab" * 32
+
+
+def legacy_summarize(d):
+    # tx_reader.summarize before tx_decode
+    payload = d.get('payload') or {}
+    if payload.get('type') == 'multisig_payload':
+        payload = payload.get('transaction_payload') or payload
+    tx = {}
+    if 'function' in payload:
+        parts = payload['function'].split("::")
+        tx.update({'address': parts[0], 'module': parts[1], 'function': parts[2]})
+    else:
+        tx['type'] = payload.get('type', d.get('type'))
+    if payload.get('type_arguments'):
+        tx['type_arguments'] = payload['type_arguments']
+    if payload.get('arguments'):
+        tx['arguments'] = payload['arguments']
+    if 'version' in d:
+        tx['version'] = int(d['version'])
+    if 'success' in d:
+        tx['success'] = d['success']
+    return tx
+
+
+def legacy(body):
+    return json.dumps([legacy_summarize(d) for d in json.loads(body)])
+
+
+def bulk(body):
+    return tx_decode.dumps(tx_decode.decode_page(body))
+
+
+def streamed(body):
+    return tx_decode.dumps(list(tx_decode.iter_stream(io.BytesIO(body))))
+
+
+def page(size):
+    return json.dumps([stubs.transaction(ADDRESS, n) for n in range(size)]).encode()
+
+
+def measure(decode, body, runs):
+    decode(body)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        decode(body)
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    decode(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = {"legacy": legacy, "tx_decode": bulk}
+    if tx_decode.ijson is not None:
+        paths["tx_decode_stream"] = streamed
+    report = {"backends": {"orjson": tx_decode.orjson is not None,
+                           "ijson": tx_decode.ijson is not None}}
+    for size in (int(s) for s in args.sizes.split(",")):
+        body = page(size)
+        expected = json.loads(legacy(body))
+        row = {"page_kib": round(len(body) / 1024, 1)}
+        for name, decode in paths.items():
+            if json.loads(decode(body)) != expected:
+                raise SystemExit(f"{name} disagrees with the legacy path on {size} transactions")
+            row[name] = measure(decode, body, args.runs)
+        report[f"{size}_transactions"] = row
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
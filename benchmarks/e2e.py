@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# End-to-end baseline with no network: the fullnode, indexer and Move server are
+# local stubs, OpenAI is replaced by a scripted chat model and a hashing
+# embedder. Reports throughput and latency percentiles for /chat, every tool,
+# retrieval and startup:
+#   python benchmarks/e2e.py --requests 200 --concurrency 8 --node-latency-ms 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stubs  # noqa: E402
+import startup  # noqa: E402
+
+SCENARIOS = ["startup", "tools", "retrieval", "chat"]
+STARTUP_MODULES = ["AptosToolClient", "tools", "chatServer"]
+
+QUESTIONS = [
+    "how do I transfer coins",
+    "what is a resource account",
+    "how to create a fungible token",
+    "how does the table module store items",
+    "write a module that stores a counter",
+    "how do events work",
+]
+SYMBOLS = ["coin::transfer", "0x1::coin::CoinStore", "table::add", "aptos_account::transfer_coins",
+           "object::create_object", "coin::"]
+
+
+def address(i):
+    return "0x" + format(i + 1, "064x")
+
+
+def tool_inputs(name, i):
+    # unique per call, so the TTL and semantic caches measure the miss path
+    if name in ("Account Balances", "Accounts Transactions", "Accounts Modules"):
+        return ",".join(address(i * 5 + j) for j in range(5))
+    if name.startswith("Account"):
+        return address(i)
+    if name == "Move Symbol Lookup":
+        return SYMBOLS[i % len(SYMBOLS)]
+    return f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+
+
+def percentile(ordered, p):
+    # nearest rank
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples, wall, errors=0):
+    ordered = sorted(samples)
+
+    def ms(seconds):
+        return round(seconds * 1000, 2) if seconds is not None else None
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / wall, 1) if wall else None,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+    }
+
+
+def run_load(call, count, concurrency, warm_up=1):
+    # call(i) -> truthy on success; latency is per call, throughput over the wall
+    for i in range(warm_up):
+        call(-1 - i)
+    samples, errors = [], [0]
+    lock = threading.Lock()
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            ok = call(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append(elapsed)
+            if not ok:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(count)))
+    return summarize(samples, time.perf_counter() - start, errors[0])
+
+
+def configure(servers, workdir, rate_limits=False):
+    # must happen before the repo modules are imported, they read these at import
+    os.environ.update({
+        "APTOS_NODE_URL": servers["node"].url,
+        "APTOS_INDEXER_URL": servers["indexer"].url,
+        "MOVE_URL": servers["move"].url,
+        "GQL_SCHEMA_CACHE": os.path.join(workdir, "schema.graphql"),
+        "SEMANTIC_CACHE_DIR": os.path.join(workdir, "semanticCache"),
+        "SYMBOL_INDEX": os.path.join(workdir, "symbolIndex.pkl"),
+        "ABI_CATALOG": os.path.join(workdir, "abiCatalog.pkl"),
+        "CONVERSATION_DB": os.path.join(workdir, "conversations.db"),
+        "EMBEDDING_CACHE": os.path.join(workdir, "embeddingCache.db"),
+        "RETRIEVAL_STORE": os.path.join(workdir, "retrievalStore"),
+        "DOC_STORE_BIN": os.path.join(workdir, "docStore.bin"),
+        "GH_RAW_CONTEXT": "1",
+        "WARM_UP": "0",
+    })
+    if not rate_limits:
+        # the stubs have no quota to protect, measure the code rather than the buckets
+        import admission
+        os.environ.update({f"RATE_LIMIT_{name.upper()}": "0" for name in admission.BACKEND_RATES})
+        admission.configure()
+    with open(os.environ["GQL_SCHEMA_CACHE"], "w") as f:
+        f.write(stubs.INDEXER_SDL)
+
+
+def install_fakes(embedder, llm_latency):
+    import AptosToolClient  # noqa: F401, creates the semantic caches
+    import ChatAgent
+    import semantic_cache
+    import retrieval
+
+    ChatAgent.llms[False] = stubs.fake_chat_model(llm_latency)
+    for cache in semantic_cache.caches:
+        cache._embed = embedder.embed_query
+    start = time.perf_counter()
+    index = retrieval.RetrievalIndex.build(retrieval.load_corpus(ROOT), embedder)
+    retrieval._engine = retrieval.RetrievalEngine(index, embedder)
+    return time.perf_counter() - start
+
+
+def bench_startup(runs):
+    env = dict(os.environ)
+    return {module: startup.measure(startup.IMPORT_PROBE.format(module=module), runs, env)
+            for module in STARTUP_MODULES}
+
+
+def bench_tools(count, concurrency):
+    from tools import tool_specs
+    report = {}
+    for spec in tool_specs:
+        name, func = spec["name"], spec["func"]
+        report[name] = run_load(lambda i: func(tool_inputs(name, i)), count, concurrency)
+    return report
+
+
+def bench_retrieval(count, concurrency):
+    import retrieval
+    engine = retrieval.get_engine()
+    questions = [f"{QUESTIONS[i % len(QUESTIONS)]} ({i})" for i in range(count)]
+    report = {"query": run_load(lambda i: engine.query(questions[i % count]), count, concurrency)}
+    start = time.perf_counter()
+    engine.query(questions)
+    report["batched"] = summarize([time.perf_counter() - start], time.perf_counter() - start)
+    report["batched"]["questions"] = count
+    return report
+
+
+def bench_chat(count, concurrency):
+    import chatServer
+    local = threading.local()
+    tool_names = [spec["name"] for spec in chatServer.tool_specs]
+
+    def call(i):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = chatServer.app.test_client()
+        name = tool_names[i % len(tool_names)]
+        response = client.post("/chat", json={
+            "user_id": f"bench-{i % concurrency}",
+            "convo_id": f"bench-{i % (concurrency * 4)}",
+            "messages": f"[{name}] {tool_inputs(name, i)}",
+        })
+        return response.status_code == 200 and response.get_data(as_text=True).startswith("The tool returned")
+
+    return run_load(call, count, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline MoveGPT end-to-end benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--node-latency-ms", type=float, default=0)
+    parser.add_argument("--indexer-latency-ms", type=float, default=0)
+    parser.add_argument("--move-latency-ms", type=float, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the per-backend rate limits, off by default against the stubs")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    servers = stubs.start_all(args.node_latency_ms / 1000, args.indexer_latency_ms / 1000,
+                              args.move_latency_ms / 1000)
+    workdir = tempfile.mkdtemp(prefix="movegpt-bench-")
+    configure(servers, workdir, args.rate_limits)
+    os.chdir(ROOT)
+    report = {"config": vars(args)}
+    # the app prints as it goes, stdout stays for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if "startup" in scenarios:
+                report["startup"] = bench_startup(args.startup_runs)
+            report["setup"] = {"retrieval_index_s": round(install_fakes(stubs.HashEmbedder(), args.llm_latency_ms / 1000), 2)}
+            if "tools" in scenarios:
+                report["tools"] = bench_tools(args.requests, args.concurrency)
+            if "retrieval" in scenarios:
+                report["retrieval"] = bench_retrieval(args.requests, args.concurrency)
+            if "chat" in scenarios:
+                report["chat"] = bench_chat(args.requests, args.concurrency)
+        finally:
+            for server in servers.values():
+                server.stop()
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
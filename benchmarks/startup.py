@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start cost of the entry points: each probe runs in a fresh interpreter so
+# nothing is shared between samples. Run from anywhere:
+#   python benchmarks/startup.py --runs 5 --first-request vector_store,rest_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTS = ["http_client", "AptosToolClient", "ChatAgent", "tools", "chatServer", "asyncChatServer"]
+
+IMPORT_PROBE = """
+import json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+# time from a cold process to the first answer of each resource or endpoint
+FIRST_REQUEST_PROBES = {
+    "vector_store": """
+import json, time
+start = time.perf_counter()
+import AptosToolClient
+AptosToolClient.get_vector_store()
+print(json.dumps({"seconds": time.perf_counter() - start}))
+""",
+    "rest_client": """
+import json, time
+start = time.perf_counter()
+import AptosToolClient
+AptosToolClient.get_client()
+print(json.dumps({"seconds": time.perf_counter() - start}))
+""",
+    "account_balance": """
+import json, time
+start = time.perf_counter()
+import AptosToolClient
+AptosToolClient.account_balance()
+print(json.dumps({"seconds": time.perf_counter() - start}))
+""",
+    "use_gh": """
+import json, time
+start = time.perf_counter()
+import AptosToolClient
+AptosToolClient.use_gh("what is move")
+print(json.dumps({"seconds": time.perf_counter() - start}))
+""",
+    "chat": """
+import json, time
+start = time.perf_counter()
+import chatServer
+client = chatServer.app.test_client()
+client.post("/chat", json={"user_id": "bench", "convo_id": "bench", "messages": "what is move"})
+print(json.dumps({"seconds": time.perf_counter() - start}))
+""",
+}
+
+
+def run_probe(code, env):
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        return None, out.stderr.strip().splitlines()[-1] if out.stderr else "failed"
+    return json.loads(out.stdout.strip().splitlines()[-1])["seconds"], None
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "min_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def measure(code, runs, env):
+    samples = []
+    for _ in range(runs):
+        seconds, error = run_probe(code, env)
+        if error:
+            return {"error": error}
+        samples.append(seconds)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MoveGPT startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--imports", default=",".join(IMPORTS))
+    parser.add_argument("--first-request", default="vector_store",
+                        help="comma separated: " + ", ".join(FIRST_REQUEST_PROBES))
+    parser.add_argument("--warm-up", action="store_true",
+                        help="let the servers start their background warm-up thread")
+    args = parser.parse_args()
+
+    env = dict(os.environ, WARM_UP="1" if args.warm_up else "0")
+    report = {"import": {}, "first_request": {}}
+    for module in filter(None, args.imports.split(",")):
+        report["import"][module] = measure(IMPORT_PROBE.format(module=module), args.runs, env)
+    for name in filter(None, args.first_request.split(",")):
+        report["first_request"][name] = measure(FIRST_REQUEST_PROBES[name], args.runs, env)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
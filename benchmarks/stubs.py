@@ -0,0 +1,360 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+# Local stand-ins for everything MoveGPT talks to over the network: the Aptos
+# fullnode REST API, the indexer's GraphQL endpoint and the Node Move server.
+# Responses are derived from a hash of the request, so every run sees the same
+# data. Plus a deterministic chat model and embedder so no OpenAI call is made.
+
+LEDGER_VERSION = 500_000_000
+MAX_SEQUENCE = 400
+NFTS_PER_OWNER = 250
+
+# just enough of the indexer schema for the queries in AptosGql.py
+INDEXER_SDL = """
+scalar numeric
+
+enum order_by {
+  asc
+  desc
+}
+
+input String_comparison_exp {
+  _eq: String
+}
+
+input current_token_ownerships_bool_exp {
+  owner_address: String_comparison_exp
+}
+
+input current_token_ownerships_order_by {
+  last_transaction_version: order_by
+}
+
+type current_token_ownerships {
+  amount: numeric!
+  collection_name: String!
+  creator_address: String!
+  name: String!
+  owner_address: String!
+  last_transaction_version: Int!
+}
+
+type query_root {
+  current_token_ownerships(
+    limit: Int
+    offset: Int
+    order_by: [current_token_ownerships_order_by!]
+    where: current_token_ownerships_bool_exp
+  ): [current_token_ownerships!]!
+}
+
+schema {
+  query: query_root
+}
+"""
+
+
+def seed(*parts):
+    return int.from_bytes(hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).digest(), "big")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; with Nagle on, every
+    # keep-alive response waits out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    latency = 0.0
+    routes = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def dispatch(self, method):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        for route_method, pattern, handler in self.routes:
+            m = re.fullmatch(pattern, unquote(url.path))
+            if m and route_method == method:
+                return handler(self, query, *m.groups())
+        self.reply(404, {"message": "not found", "path": url.path})
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+
+# fullnode
+
+def node_reply(handler, body, status=200):
+    handler.reply(status, body, {"X-Aptos-Ledger-Version": str(LEDGER_VERSION),
+                                 "X-Aptos-Chain-Id": "1"})
+
+
+def sequence_of(address):
+    return seed("seq", address) % MAX_SEQUENCE + 1
+
+
+def node_info(handler, query):
+    node_reply(handler, {"chain_id": 1, "epoch": "1", "ledger_version": str(LEDGER_VERSION),
+                         "oldest_ledger_version": "0", "block_height": str(LEDGER_VERSION // 4),
+                         "node_role": "full_node"})
+
+
+def account(handler, query, address):
+    node_reply(handler, {"sequence_number": str(sequence_of(address)),
+                         "authentication_key": address})
+
+
+def transaction(address, n):
+    version = LEDGER_VERSION - seed("version", address, n) % LEDGER_VERSION
+    receiver = "0x" + hashlib.sha256(f"{address}{n}".encode()).hexdigest()
+    return {
+        "version": str(version),
+        "hash": "0x" + hashlib.sha256(f"tx{address}{n}".encode()).hexdigest(),
+        "type": "user_transaction",
+        "success": True,
+        "vm_status": "Executed successfully",
+        "sender": address,
+        "sequence_number": str(n),
+        "gas_used": str(seed("gas", address, n) % 2000 + 5),
+        "gas_unit_price": "100",
+        "max_gas_amount": "200000",
+        "expiration_timestamp_secs": str(1_690_000_000 + n),
+        "timestamp": str(1_690_000_000_000_000 + n * 1_000_000),
+        "payload": {
+            "type": "entry_function_payload",
+            "function": "0x1::aptos_account::transfer",
+            "type_arguments": [],
+            "arguments": [receiver, str(seed("amount", address, n) % 10 ** 9)],
+        },
+        # the bulk of a real response: write set changes and events
+        "changes": [{
+            "type": "write_resource",
+            "address": address,
+            "state_key_hash": "0x" + hashlib.sha256(f"{address}{n}{i}".encode()).hexdigest(),
+            "data": {"type": "0x1::coin::CoinStore<0x1::aptos_coin::AptosCoin>",
+                     "data": {"coin": {"value": str(i * 1000 + n)}, "frozen": False}},
+        } for i in range(4)],
+        "events": [{
+            "guid": {"creation_number": str(i), "account_address": address},
+            "sequence_number": str(n),
+            "type": "0x1::coin::WithdrawEvent" if i == 0 else "0x1::coin::DepositEvent",
+            "data": {"amount": str(seed("amount", address, n) % 10 ** 9)},
+        } for i in range(2)],
+    }
+
+
+def transactions(handler, query, address):
+    end = sequence_of(address)
+    start = int(query.get("start", 0))
+    limit = min(int(query.get("limit", 25)), 100)
+    node_reply(handler, [transaction(address, n) for n in range(start, min(end, start + limit))])
+
+
+def modules(handler, query, address):
+    out = []
+    for m in range(seed("modules", address) % 6 + 2):
+        name = f"module_{m}"
+        out.append({
+            "bytecode": "0x" + "a1" * 512,
+            "abi": {
+                "address": address,
+                "name": name,
+                "friends": [],
+                "exposed_functions": [{
+                    "name": f"function_{f}",
+                    "visibility": "public",
+                    "is_entry": f % 2 == 0,
+                    "generic_type_params": [],
+                    "params": ["&signer", "address", "u64"][:f % 3 + 1],
+                    "return": [],
+                } for f in range(8)],
+                "structs": [],
+            },
+        })
+    node_reply(handler, out)
+
+
+def resource(handler, query, address, resource_type):
+    if "CoinStore" not in resource_type:
+        return node_reply(handler, {"error_code": "resource_not_found"}, 404)
+    node_reply(handler, {"type": resource_type, "data": {
+        "coin": {"value": str(seed("balance", address) % 10 ** 12)}, "frozen": False}})
+
+
+class NodeHandler(StubHandler):
+    routes = [
+        ("GET", r"/v1/?", node_info),
+        ("GET", r"/v1/accounts/([^/]+)", account),
+        ("GET", r"/v1/accounts/([^/]+)/transactions", transactions),
+        ("GET", r"/v1/accounts/([^/]+)/modules", modules),
+        ("GET", r"/v1/accounts/([^/]+)/resource/(.+)", resource),
+    ]
+
+
+# indexer
+
+ALIAS_RE = re.compile(r"(?:(\w+)\s*:\s*)?current_token_ownerships\s*\((.*?)\)\s*\{", re.S)
+
+
+def nft(owner, n):
+    return {
+        "amount": 1,
+        "collection_name": f"Collection {seed('collection', owner, n) % 40}",
+        "creator_address": "0x" + hashlib.sha256(f"creator{n % 7}".encode()).hexdigest(),
+        "name": f"Token #{n}",
+        "owner_address": owner,
+    }
+
+
+def graphql(handler, query):
+    request = handler.body()
+    variables = request.get("variables") or {}
+    data = {}
+    for alias, args in ALIAS_RE.findall(request.get("query", "")):
+        owner = re.search(r"_eq:\s*\$(\w+)", args)
+        owner = variables.get(owner.group(1)) if owner else None
+        limit = variables.get("limit") or NFTS_PER_OWNER
+        offset = variables.get("offset") or 0
+        count = seed("nfts", owner) % NFTS_PER_OWNER
+        data[alias or "current_token_ownerships"] = [
+            nft(owner, n) for n in range(offset, min(count, offset + limit))]
+    handler.reply(200, {"data": data})
+
+
+class IndexerHandler(StubHandler):
+    routes = [("POST", r"/v1/graphql", graphql)]
+
+
+# Move server
+
+def generate_response(handler, query):
+    question = handler.body().get("question", "")
+    handler.reply(200, {"answer": f"module 0x1::stub {{ /* answer to: {question[:200]} */ }}"})
+
+
+class MoveHandler(StubHandler):
+    routes = [("POST", r"/generate-response", generate_response)]
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 overflows under the batch tools' fan-out, and a
+    # dropped SYN is retried after a full second
+    request_queue_size = 256
+
+
+class StubServer:
+    def __init__(self, handler, latency=0.0, prefix=""):
+        self.handler = type(handler.__name__, (handler,), {"latency": latency})
+        self.server = StubHTTPServer(("127.0.0.1", 0), self.handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}{prefix}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_all(node_latency=0.0, indexer_latency=0.0, move_latency=0.0):
+    return {
+        "node": StubServer(NodeHandler, node_latency, "/v1").start(),
+        "indexer": StubServer(IndexerHandler, indexer_latency, "/v1/graphql").start(),
+        "move": StubServer(MoveHandler, move_latency, "/").start(),
+    }
+
+
+# OpenAI stand-ins
+
+class HashEmbedder:
+    # bag of hashed words: identical text, identical vector; shared words, nearby vectors
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def vector(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            h = seed(word)
+            vector[h % self.dimensions] += 1.0 if h & 1 << 32 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_query(self, text):
+        return self.vector(text).tolist()
+
+    def embed_documents(self, texts):
+        return [self.vector(t).tolist() for t in texts]
+
+
+# "[Tool Name] tool input" as the question makes the fake model call that tool
+SCRIPTED_RE = re.compile(r"\[([^\]]+)\]\s*(.*)")
+
+
+def react(action, action_input):
+    return "```json\n" + json.dumps({"action": action, "action_input": action_input}) + "\n```"
+
+
+def fake_chat_model(latency=0.0):
+    # built lazily so importing this module doesn't need langchain
+    from langchain.chat_models.base import BaseChatModel
+    from langchain.schema import AIMessage, ChatGeneration, ChatResult
+
+    class FakeChatModel(BaseChatModel):
+        latency: float = 0.0
+
+        @property
+        def _llm_type(self):
+            return "fake-react"
+
+        def respond(self, messages):
+            content = messages[-1].content
+            if content.startswith("TOOL RESPONSE"):
+                observation = content.split("---------------------", 1)[-1]
+                return react("Final Answer", f"The tool returned {len(observation)} characters.")
+            m = SCRIPTED_RE.search(content.strip().splitlines()[-1])
+            if m:
+                return react(m.group(1), m.group(2))
+            return react("Final Answer", "I can answer that without a tool.")
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respond(messages)))])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            import asyncio
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respond(messages)))])
+
+    return FakeChatModel(latency=latency)
@@ -1,11 +1,19 @@
 from flask import Flask, request
 from flask_cors import CORS
 from flask_cors import cross_origin
-from AptosToolClient import account_balance, account_transactions,create_kit,use_moveGPT,use_gh
-from ChatAgent import ChatAgent
-# from AptosGql import AptosGQLTool
-
-# aQgl = AptosGQLTool()
+import os
+from AptosToolClient import account_balance, account_transactions,create_kit,use_moveGPT,use_gh,use_move_context,move_context_ready,use_symbol_lookup,warm_up
+from ChatAgent import ChatAgent, MEMORY_TURNS
+from batch_tools import batch_tool_specs
+from session_pool import SessionPool
+from tool_memo import ToolMemo
+from conversation_store import PAGE_SIZE, StoreUnavailable, get_store, transcript_text
+import tool_cache
+import semantic_cache
+import metrics
+import admission
+from instrumentation import AgentMetricsHandler
+from AptosGql import account_nfts
 
 tool_specs = [
   {
@@ -18,7 +26,7 @@ tool_specs = [
     'name': 'Account Transactions',
     'func': account_transactions,
     'use': 'find account transactions',
-    'input':'account to find transactions of'
+    'input':'account to find transactions of, optionally followed by last=N or since=VERSION'
   },
   {
     'name': 'Move Agent',
@@ -26,13 +34,26 @@ tool_specs = [
     'use': 'to give information about writing move code or the aptos blockchain when unsure what agent to use use this one',
     'input':'question user has about move or the aptos blockchain'
   },
-  # {
-  #   'name':"Account NFT Balance",
-  #   'func':aQgl.get_user_nfts,
-  #   'use':"find account nft balance",
-  #   'input':'account to find nft balance of'
+  {
+    'name':"Account NFT Balance",
+    'func':account_nfts,
+    'use':"find the nfts an account owns, or several accounts at once",
+    'input':'account, or comma separated accounts, to find nft balance of'
     
-  # },
+  },
+  {
+    'name': 'Move Symbol Lookup',
+    'func': use_symbol_lookup,
+    'use': 'to get the exact signature, params, return type, abilities or fields of a named Move function, struct or module like coin::transfer or 0x1::coin::CoinStore',
+    'input':'fully qualified or module::name Move symbol'
+  },
+  {
+    'name': 'Move Context Search',
+    'func': use_move_context,
+    'available': move_context_ready,
+    'use': 'to look up Move source code and docs related to a question, returns the matching code snippets',
+    'input':'question or keywords about move code'
+  },
   {
     'name': 'Github Chat Agent',
     'func': use_gh,
@@ -43,17 +64,28 @@ tool_specs = [
   
 ]
 
-tool_kit = create_kit(tool_specs)
-
+# multi-address variants of the account tools
+tool_specs.extend(batch_tool_specs)
 
-
-chat_agent = ChatAgent(tool_kit)
+# load the doc index in the background, the server can take requests meanwhile
+if os.getenv("WARM_UP", "1") == "1":
+    warm_up()
 
 app = Flask(__name__)
 CORS(app)
 app.config['CORS_HEADERS'] = 'Content-Type'
 app.debug = True
-conversations = {}
+conversations = get_store()
+
+
+def drop_conversation(conversation_key, session):
+    # the transcript stays on disk, only its in-memory window goes
+    conversations.forget(*conversation_key)
+
+
+# one agent per conversation, reused across turns so its memory survives
+sessions = SessionPool(lambda: ChatAgent(create_kit(tool_specs, memo=ToolMemo())),
+                       on_evict=drop_conversation)
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -62,43 +94,73 @@ def chat():
     user_id = payload['user_id']
     convo_id = payload['convo_id']
     user_input = payload['messages']
-    # if len(user_input)>1:
-    #     agent= conversations[(user_id, convo_id)]
-    # else:
-    agent = ChatAgent(tool_kit)
-    conversations[(user_id, convo_id)]= agent
-    response = agent.chat(user_input)
-    # save_message(user_id, convo_id, user_input, response)
+    # waits for a slot or raises admission.Rejected, answered by busy() below
+    with admission.controller.admit(user_id):
+        session = sessions.get((user_id, convo_id))
+        handler = AgentMetricsHandler()
+        ok = False
+        # the agent memory is not thread safe, so one turn at a time per conversation
+        try:
+            with metrics.chat_seconds.time(), session.lock:
+                # a new session picks the conversation up from the transcript; with
+                # several workers every turn does, the last one may have run elsewhere
+                if conversations.shared or session.turns == 0:
+                    session.agent.load_history(conversations.recent(user_id, convo_id, MEMORY_TURNS))
+                response = session.agent.chat(user_input, callbacks=[handler])
+                # appended before the lock is released, so the next turn's history has it
+                conversations.append(user_id, convo_id, user_input, response['output'])
+            ok = True
+        finally:
+            sessions.release(session)
+            handler.finish(ok)
     return response['output']
 
-def save_message(user_id, convo_id, user_input, response):
-    conversation_key = (user_id, convo_id)
-    if conversation_key in conversations:
-        conversations[conversation_key].append((user_input, response))
-    else:
-        conversations[conversation_key] = [(user_input, response)]
+@app.errorhandler(admission.Rejected)
+def busy(e):
+    return {'error': e.reason}, e.status, {'Retry-After': str(e.retry_after)}
+
+@app.errorhandler(StoreUnavailable)
+def store_behind(e):
+    return {'error': str(e)}, 503, {'Retry-After': '5'}
+
+@app.route('/admission', methods=['GET'])
+def admission_stats():
+    return admission.controller.stats()
+
+@app.route('/sessions', methods=['GET'])
+def session_stats():
+    return sessions.stats()
+
+@app.route('/metrics', methods=['GET'])
+def metrics_text():
+    return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    return {'tools': tool_cache.stats(), 'answers': semantic_cache.stats()}
 
 def end_conversation(user_id, convo_id):
-    conversation_key = (user_id, convo_id)
-    if conversation_key in conversations:
-        del conversations[conversation_key]
+    sessions.remove((user_id, convo_id))
+    conversations.delete(user_id, convo_id)
 
 @app.route('/conversations', methods=['GET'])
 @cross_origin(origin='*')
 def get_conversation():
     user_id = request.args.get('user_id')
     convo_id = request.args.get('convo_id')
-    conversation_key = (user_id, convo_id)
-
-    if conversation_key in conversations:
-        conversation = conversations[conversation_key]
-        conversation_str = ""
-        for message in conversation:
-            user_message, agent_response = message
-            conversation_str += f"User: {user_message}\nAgent: {agent_response}\n"
-        return conversation_str
+    # ?recent=N is served from memory, otherwise oldest first, ?offset=&limit= per page
+    recent = request.args.get('recent', type=int)
+    if recent:
+        page = {'turns': conversations.recent(user_id, convo_id, recent), 'next_offset': None}
     else:
+        offset = request.args.get('offset', 0, type=int)
+        limit = min(request.args.get('limit', PAGE_SIZE, type=int), PAGE_SIZE)
+        page = conversations.page(user_id, convo_id, offset, limit)
+    if request.args.get('format') == 'json':
+        return page
+    if not page['turns']:
         return "Conversation not found."
+    return transcript_text(page['turns'])
 
 if __name__ == '__main__':
     app.run()
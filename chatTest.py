@@ -1,8 +1,7 @@
-from AptosToolClient import account_balance, account_transactions,create_kit,use_moveGPT,use_gh
+from AptosToolClient import account_balance, account_transactions,create_kit,use_moveGPT,use_gh,use_move_context,move_context_ready,use_symbol_lookup,warm_up
 from ChatAgent import ChatAgent
-from AptosGql import AptosGQLTool
-
-aQgl = AptosGQLTool()
+from batch_tools import batch_tool_specs
+from AptosGql import account_nfts
 
 tool_specs = [
   {
@@ -15,7 +14,7 @@ tool_specs = [
     'name': 'Account Transactions',
     'func': account_transactions,
     'use': 'find account transactions',
-    'input':'account to find transactions of'
+    'input':'account to find transactions of, optionally followed by last=N or since=VERSION'
   },
   {
     'name': 'Move Agent',
@@ -23,13 +22,26 @@ tool_specs = [
     'use': 'to give information about writing move code or the aptos blockchain when unsure what agent to use use this one',
     'input':'question user has about move or the aptos blockchain'
   },
-  # {
-  #   'name':"Account NFT Balance",
-  #   'func':aQgl.get_user_nfts,
-  #   'use':"find account nft balance",
-  #   'input':'account to find nft balance of'
+  {
+    'name':"Account NFT Balance",
+    'func':account_nfts,
+    'use':"find the nfts an account owns, or several accounts at once",
+    'input':'account, or comma separated accounts, to find nft balance of'
     
-  # },
+  },
+  {
+    'name': 'Move Symbol Lookup',
+    'func': use_symbol_lookup,
+    'use': 'to get the exact signature, params, return type, abilities or fields of a named Move function, struct or module like coin::transfer or 0x1::coin::CoinStore',
+    'input':'fully qualified or module::name Move symbol'
+  },
+  {
+    'name': 'Move Context Search',
+    'func': use_move_context,
+    'available': move_context_ready,
+    'use': 'to look up Move source code and docs related to a question, returns the matching code snippets',
+    'input':'question or keywords about move code'
+  },
   {
     'name': 'Github Chat Agent',
     'func': use_gh,
@@ -40,11 +52,15 @@ tool_specs = [
   
 ]
 
+# multi-address variants of the account tools
+tool_specs.extend(batch_tool_specs)
+
 tool_kit = create_kit(tool_specs)
 
 
 
 chat_agent = ChatAgent(tool_kit)
+warm_up()
 
 print("Welcome to the CLI. Type 'quit' to exit.")
 
@@ -1,5 +1,7 @@
 from chat_session import ChatSession
+from AptosToolClient import warm_up
 
+warm_up()  # loads the doc index while the user is typing
 print("Welcome to the CLI. Type 'quit' to exit.")
 
 chat_session = ChatSession()
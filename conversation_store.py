@@ -0,0 +1,254 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Chat transcripts in SQLite, shared by every worker and kept across restarts.
+# /chat only appends to an in-memory window and a queue; a writer thread drains
+# the queue in batched transactions. The window holds the last RECENT_TURNS of
+# the most recently used conversations, older turns are read back page by page.
+DB_PATH = os.getenv("CONVERSATION_DB", "./conversations.db")
+RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "20"))
+MAX_CACHED_CONVERSATIONS = int(os.getenv("CONVERSATION_CACHE_SIZE", "1024"))
+PAGE_SIZE = 100
+WRITE_BATCH = 256
+# longest a read waits for the writer to commit what was queued before it
+FLUSH_TIMEOUT = float(os.getenv("CONVERSATION_FLUSH_TIMEOUT", "10"))
+
+INSERT = (
+    "INSERT INTO messages (user_id, convo_id, seq, user_input, response, created) VALUES"
+    " (?, ?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM messages WHERE user_id = ? AND convo_id = ?),"
+    " ?, ?, ?)")
+DELETE = "DELETE FROM messages WHERE user_id = ? AND convo_id = ?"
+
+log = logging.getLogger(__name__)
+
+
+class StoreUnavailable(Exception):
+    pass
+
+
+def as_text(value):
+    # the columns are TEXT: a list of messages or a structured answer is stored
+    # as JSON rather than failing the whole write batch
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+class ConversationStore:
+    def __init__(self, path=DB_PATH, recent_turns=RECENT_TURNS,
+                 max_cached=MAX_CACHED_CONVERSATIONS, clock=time.time,
+                 flush_timeout=FLUSH_TIMEOUT):
+        self.path = path
+        self.recent_turns = recent_turns
+        self.max_cached = max_cached
+        self.clock = clock
+        self.flush_timeout = flush_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.windows = OrderedDict()  # (user_id, convo_id) -> deque of turns, LRU order
+        self.loading = {}  # key -> appends seen while its window was read from disk
+        self.pending = queue.Queue()
+        # several processes write the database (prefork_server.py): appends are
+        # committed before append() returns and recent() reads the database,
+        # since another process may have added turns behind this one's window
+        self.shared = False
+        self.connection().executescript(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " user_id TEXT NOT NULL, convo_id TEXT NOT NULL, seq INTEGER NOT NULL,"
+            " user_input TEXT NOT NULL, response TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (user_id, convo_id, seq)) WITHOUT ROWID;")
+        self.start_writer()
+
+    def start_writer(self):
+        self.writer = threading.Thread(target=self._write_loop, name="conversation-writer", daemon=True)
+        self.writer.start()
+
+    def ensure_writer(self):
+        # nothing commits the queue once the writer is gone, start another
+        if not self.writer.is_alive():
+            with self._lock:
+                if not self.writer.is_alive():
+                    log.error("conversation writer died, restarting it with %d writes pending",
+                              self.pending.qsize())
+                    self.start_writer()
+
+    def after_fork(self):
+        # a forked worker inherits neither the writer thread nor usable
+        # connections, and any lock may have been mid-acquire at fork time
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.loading = {}
+        self.pending = queue.Queue()
+        self.start_writer()
+
+    def connection(self):
+        # sqlite connections can't cross threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, user_id, convo_id, user_input, response):
+        turn = {'user': as_text(user_input), 'agent': as_text(response), 'created': self.clock()}
+        key = (user_id, convo_id)
+        with self._lock:
+            window = self.windows.get(key)
+            if window is not None:
+                window.append(turn)
+                self.windows.move_to_end(key)
+            elif key in self.loading:
+                self.loading[key] += 1
+        self.pending.put(("insert", key, turn))
+        if self.shared:
+            self.flush()
+
+    def delete(self, user_id, convo_id):
+        key = (user_id, convo_id)
+        with self._lock:
+            self.windows.pop(key, None)
+            if key in self.loading:
+                self.loading[key] += 1
+        self.pending.put(("delete", key, None))
+
+    def forget(self, user_id, convo_id):
+        # drop the in-memory window only, the transcript stays on disk
+        with self._lock:
+            self.windows.pop((user_id, convo_id), None)
+
+    def recent(self, user_id, convo_id, count=RECENT_TURNS):
+        key = (user_id, convo_id)
+        if self.shared:
+            return self._tail(key)[-count:]
+        with self._lock:
+            window = self.windows.get(key)
+            if window is not None:
+                self.windows.move_to_end(key)
+                return list(window)[-count:]
+            owner = key not in self.loading
+            if owner:
+                self.loading[key] = 0
+        tail = self._tail(key)
+        if owner:
+            with self._lock:
+                # a turn appended during the read may be missing from it, so
+                # only a quiet read becomes the window
+                if self.loading.pop(key) == 0:
+                    self.windows[key] = deque(tail, maxlen=self.recent_turns)
+                    while len(self.windows) > self.max_cached:
+                        self.windows.popitem(last=False)
+        return tail[-count:]
+
+    def page(self, user_id, convo_id, offset=0, limit=PAGE_SIZE):
+        # oldest first; next_offset is None on the last page
+        self.flushed()
+        rows = self.connection().execute(
+            "SELECT user_input, response, created FROM messages"
+            " WHERE user_id = ? AND convo_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+            (user_id, convo_id, limit + 1, offset)).fetchall()
+        turns = [{'user': u, 'agent': a, 'created': c} for u, a, c in rows[:limit]]
+        return {'turns': turns, 'next_offset': offset + limit if len(rows) > limit else None}
+
+    def _tail(self, key):
+        self.flushed()
+        rows = self.connection().execute(
+            "SELECT user_input, response, created FROM messages"
+            " WHERE user_id = ? AND convo_id = ? ORDER BY seq DESC LIMIT ?",
+            (*key, self.recent_turns)).fetchall()
+        return [{'user': u, 'agent': a, 'created': c} for u, a, c in reversed(rows)]
+
+    def flush(self, timeout=None):
+        # wait until everything queued so far is committed
+        timeout = self.flush_timeout if timeout is None else timeout
+        self.ensure_writer()
+        done = threading.Event()
+        self.pending.put(("flush", None, done))
+        if done.wait(timeout):
+            return True
+        log.error("conversation writer has not committed in %ss, %d writes pending",
+                  timeout, self.pending.qsize())
+        return False
+
+    def flushed(self):
+        # a read must not pass off an outdated transcript as the whole one
+        if not self.flush():
+            raise StoreUnavailable("conversation store is behind on writes, try again shortly")
+
+    def _write_loop(self):
+        conn = self.connection()
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            writes = [w for w in batch if w[0] != "flush"]
+            try:
+                self._write_batch(conn, writes)
+            except Exception:
+                # the loop must outlive anything a batch throws
+                log.exception("conversation writer lost a batch of %d writes", len(writes))
+            waiters = [item for op, _, item in batch if op == "flush"]
+            for waiter in waiters:
+                waiter.set()
+
+    def _write_batch(self, conn, writes):
+        try:
+            conn.execute("BEGIN")
+            for write in writes:
+                self._write(conn, *write)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # one bad row or a busy database must not cost the other
+            # conversations their turns: retry each write on its own
+            log.warning("batch of %d writes failed (%s), retrying one by one",
+                        len(writes), e)
+            for op, key, item in writes:
+                try:
+                    self._write(conn, op, key, item)
+                except sqlite3.Error as e:
+                    log.error("dropped %s for %s: %s", op, key, e)
+
+    def _write(self, conn, op, key, item):
+        if op == "insert":
+            conn.execute(INSERT, (*key, *key, item['user'], item['agent'], item['created']))
+        elif op == "delete":
+            conn.execute(DELETE, key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached_conversations': len(self.windows),
+                'pending_writes': self.pending.qsize(),
+            }
+
+
+def transcript_text(turns):
+    return "".join(f"User: {t['user']}\nAgent: {t['agent']}\n" for t in turns)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=DB_PATH):
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore(path)
+                atexit.register(_store.flush)
+                os.register_at_fork(after_in_child=_store.after_fork)
+    return _store
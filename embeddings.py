@@ -0,0 +1,314 @@
+import functools
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from admission import TokenBucket
+
+# One embedding stage for every index build. Texts are deduplicated, looked up
+# in an on-disk cache keyed by sha256(model + text), and only the misses go out,
+# in large batches run concurrently under a request and token budget. Each batch
+# is cached as soon as it lands, so a failed build resumes where it stopped and
+# a rebuild only pays for new text.
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-ada-002")
+# "openai", or "hash" for the offline deterministic embedder
+EMBEDDER = os.getenv("EMBEDDER", "openai")
+CACHE_PATH = os.getenv("EMBEDDING_CACHE", "./embeddingCache.db")
+BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))
+# OpenAI caps a request's input, stay under it whatever the count
+BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))
+CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("EMBED_RPM", "3000"))
+TOKENS_PER_MINUTE = float(os.getenv("EMBED_TPM", "1000000"))
+RETRIES = int(os.getenv("EMBED_RETRIES", "5"))
+# chat questions are embedded while the user waits: one quick retry at most
+QUERY_RETRIES = int(os.getenv("EMBED_QUERY_RETRIES", "1"))
+BACKOFF = 1.0
+# ada-002 rejects a single input over 8191 tokens, and with it the whole request
+MAX_INPUT_TOKENS = int(os.getenv("EMBED_MAX_INPUT_TOKENS", "8191"))
+HASH_DIMENSIONS = 256
+
+
+def estimate_tokens(text):
+    # close enough for budgeting, no tokenizer load
+    return len(text) // 4 + 1
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def encoding_for(model):
+    # None when tiktoken or its vocabulary (a download) isn't available
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+class OpenAIEmbedder:
+    remote = True
+
+    def __init__(self, model=EMBED_MODEL, max_tokens=MAX_INPUT_TOKENS):
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def fit(self, text):
+        # a token is at least one byte, so anything shorter fits as is
+        data = text.encode("utf-8")
+        if len(data) <= self.max_tokens:
+            return text
+        encoding = encoding_for(self.model)
+        if encoding is None:
+            return data[:self.max_tokens].decode("utf-8", errors="ignore")
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= self.max_tokens else encoding.decode(tokens[:self.max_tokens])
+
+    def retryable(self, error):
+        # rate limits, timeouts and server errors; a bad key or a rejected
+        # input fails the same way every time
+        import openai.error
+        if isinstance(error, (openai.error.RateLimitError, openai.error.Timeout, openai.error.TryAgain,
+                              openai.error.APIConnectionError, openai.error.ServiceUnavailableError)):
+            return True
+        if isinstance(error, openai.error.APIError):
+            return (error.http_status or 0) >= 500
+        return isinstance(error, (TimeoutError, ConnectionError))
+
+    def embed_batch(self, texts):
+        import openai
+        # newlines hurt ada-002 quality, same as the langchain wrapper does
+        response = openai.Embedding.create(input=[t.replace("\n", " ") for t in texts], model=self.model)
+        return [row["embedding"] for row in sorted(response["data"], key=lambda r: r["index"])]
+
+
+# source code repeats the same identifiers endlessly
+@functools.lru_cache(maxsize=1 << 16)
+def word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big")
+
+
+class HashEmbedder:
+    # bag of hashed words: identical text, identical vector, in every process
+    remote = False
+
+    def __init__(self, dimensions=HASH_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model = f"hash-{dimensions}"
+
+    def vector(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter(map(word_hash, re.findall(r"\w+", text.lower())), dtype=np.uint64)
+        signs = np.where(hashes & np.uint64(1 << 32), 1.0, -1.0).astype(np.float32)
+        np.add.at(vector, (hashes % np.uint64(self.dimensions)).astype(np.intp), signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_batch(self, texts):
+        return [self.vector(t) for t in texts]
+
+
+EMBEDDERS = {
+    "openai": OpenAIEmbedder,
+    "hash": HashEmbedder,
+}
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.register_at_fork(after_in_child=self.after_fork)
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL) WITHOUT ROWID")
+
+    def after_fork(self):
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite connections can't cross threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        found = {}
+        conn = self.connection()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        conn = self.connection()
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                         [(key, model, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items])
+        conn.execute("COMMIT")
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingPipeline:
+    # embed_documents / embed_query like a langchain embedder, so it drops into
+    # retrieval.py and the semantic cache as is
+    def __init__(self, embedder, cache=None, batch_size=BATCH_SIZE, batch_tokens=BATCH_TOKENS,
+                 concurrency=CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, retries=RETRIES):
+        self.embedder = embedder
+        self.model = embedder.model
+        # inputs are cut to what the model accepts, cache keys stay on the full text
+        self.fit = getattr(embedder, "fit", None) or (lambda text: text)
+        self.retryable = getattr(embedder, "retryable", None) or (lambda error: False)
+        self.cache = cache
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.concurrency = concurrency
+        self.retries = retries
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+        self.tokens = TokenBucket(tokens_per_minute / 60, max(float(batch_tokens), tokens_per_minute / 60))
+        self._lock = threading.Lock()
+        self.counts = {'cached': 0, 'embedded': 0, 'requests': 0, 'retries': 0}
+
+    def batches(self, texts):
+        batch, tokens = [], 0
+        for text in texts:
+            cost = estimate_tokens(self.fit(text))
+            if batch and (len(batch) >= self.batch_size or tokens + cost > self.batch_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += cost
+        if batch:
+            yield batch
+
+    def throttle(self, texts):
+        # the budget is the provider's, local embedders run flat out
+        if not getattr(self.embedder, "remote", True):
+            return
+        wait = max(self.requests.reserve(float("inf")),
+                   self.tokens.reserve(float("inf"), sum(map(estimate_tokens, texts))))
+        if wait:
+            time.sleep(wait)
+
+    def embed_batch(self, texts):
+        inputs = [self.fit(t) for t in texts]
+        attempt = 0
+        while True:
+            self.throttle(inputs)
+            try:
+                vectors = self.embedder.embed_batch(inputs)
+                break
+            except Exception as e:
+                # only what may pass on a second try, the cache keeps what's done
+                if attempt >= self.retries or not self.retryable(e):
+                    raise
+                with self._lock:
+                    self.counts['retries'] += 1
+                time.sleep(BACKOFF * 2 ** attempt)
+                attempt += 1
+        vectors = [np.asarray(v, dtype=np.float32) for v in vectors]
+        if self.cache is not None:
+            self.cache.put_many(self.model, [(cache_key(self.model, t), v) for t, v in zip(texts, vectors)])
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts['embedded'] += len(texts)
+        return dict(zip(texts, vectors))
+
+    def embed_many(self, texts):
+        unique = list(dict.fromkeys(texts))
+        keys = [cache_key(self.model, t) for t in unique]
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+        vectors = {t: cached[k] for t, k in zip(unique, keys) if k in cached}
+        missing = [t for t in unique if t not in vectors]
+        with self._lock:
+            self.counts['cached'] += len(vectors)
+        batches = list(self.batches(missing))
+        if len(batches) == 1:
+            vectors.update(self.embed_batch(batches[0]))
+        elif batches:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+                futures = [pool.submit(self.embed_batch, batch) for batch in batches]
+                # every batch is waited for, so the ones that succeed are cached
+                # even when another fails
+                errors = []
+                for future in futures:
+                    try:
+                        vectors.update(future.result())
+                    except Exception as e:
+                        errors.append(e)
+            if errors:
+                raise errors[0]
+        return [vectors[t] for t in texts]
+
+    def embed_documents(self, texts):
+        return [v.tolist() for v in self.embed_many(list(texts))]
+
+    def embed_query(self, text):
+        return self.embed_many([text])[0].tolist()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, model=self.model)
+
+
+def llama_embedding(pipeline):
+    # a llama_index embed_model backed by the pipeline; llama_index hands over
+    # its largest batches and the pipeline splits them into concurrent requests
+    from llama_index.embeddings.base import BaseEmbedding
+
+    class PipelineEmbedding(BaseEmbedding):
+        def _get_query_embedding(self, query):
+            return pipeline.embed_query(query)
+
+        def _get_text_embedding(self, text):
+            return pipeline.embed_query(text)
+
+        def _get_text_embeddings(self, texts):
+            return pipeline.embed_documents(texts)
+
+    return PipelineEmbedding(embed_batch_size=2048)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(embedder=EMBEDDER, path=CACHE_PATH):
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = EmbeddingPipeline(EMBEDDERS[embedder](), EmbeddingCache(path))
+    return _pipeline
+
+
+_query_pipeline = None
+
+
+def get_query_pipeline(embedder=EMBEDDER):
+    # for the serving path: one-off questions would only grow the disk cache
+    # and add a write per question, and a build's retry budget is too long to wait on
+    global _query_pipeline
+    if _query_pipeline is None:
+        with _pipeline_lock:
+            if _query_pipeline is None:
+                _query_pipeline = EmbeddingPipeline(EMBEDDERS[embedder](), retries=QUERY_RETRIES)
+    return _query_pipeline
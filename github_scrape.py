@@ -1,11 +1,18 @@
+import argparse
+import asyncio
+import hashlib
+import json
 import os
-import pickle
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from llama_index import (
     download_loader,
-    GPTSimpleVectorIndex,
+    GPTVectorStoreIndex,
     LLMPredictor,
     ServiceContext,
     PromptHelper,
+    StorageContext,
+    load_index_from_storage,
 )
 from llama_index.readers.llamahub_modules.github_repo import (
     GithubClient,
@@ -13,8 +20,20 @@ from llama_index.readers.llamahub_modules.github_repo import (
 )
 from langchain import OpenAI
 
+import embeddings
+import http_client
+import vector_file
+
 download_loader("GithubRepositoryReader")
 
+# Same index AptosToolClient serves use_gh from
+PERSIST_DIR = "./docStore/"
+BIN_DIR = os.getenv("DOC_STORE_BIN", "./docStore.bin/")
+# owner/repo -> {"commit": sha, "files": {file_path: sha256 of content}}
+MANIFEST_PATH = "github-manifest.json"
+REPO_WORKERS = 4
+GITHUB_API = "https://api.github.com"
+
 repos = [
     {
         "owner": "aptos-labs",
@@ -175,43 +194,162 @@ repos = [
     # Add other repository configurations here
 ]
 
-docs = None
-if os.path.exists("docs.pkl"):
-    with open("docs.pkl", "rb") as f:
-        docs = pickle.load(f)
-
-if docs is None:
-    github_client = GithubClient(os.getenv("GITHUB_TOKEN"))
-    all_docs = []
-
-    for repo in repos:
-        loader = GithubRepositoryReader(
-            github_client,
-            owner=repo["owner"],
-            repo=repo["repo"],
-            filter_directories=repo["filter_directories"],
-            filter_file_extensions=repo["filter_file_extensions"],
-            verbose=True,
-            concurrent_requests=10,
-        )
-        try:
-            repo_docs = loader.load_data(branch="main")
-            all_docs.extend(repo_docs)
-        except KeyError:
-            print(f"Error loading data for {repo['owner']}/{repo['repo']}. Skipping this repository.")
-
-
-    with open("docs.pkl", "wb") as f:
-        pickle.dump(all_docs, f)
-
-llm_predictor = LLMPredictor(
-    llm=OpenAI(temperature=0, model_name="text-davinci-003")
-)
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest):
+    # written only after the index is persisted, so a crash just redoes the diff
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def repo_key(repo):
+    return f"{repo['owner']}/{repo['repo']}"
+
+
+def latest_commit(repo):
+    headers = {"Accept": "application/vnd.github+json"}
+    if os.getenv("GITHUB_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.getenv('GITHUB_TOKEN')}"
+    req = http_client.get(
+        f"{GITHUB_API}/repos/{repo_key(repo)}/commits/{repo.get('branch', 'main')}",
+        headers=headers)
+    req.raise_for_status()
+    return req.json()["sha"]
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_repo(repo, commit):
+    # the reader drives its own asyncio loop, worker threads don't have one
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    loader = GithubRepositoryReader(
+        GithubClient(os.getenv("GITHUB_TOKEN")),
+        owner=repo["owner"],
+        repo=repo["repo"],
+        filter_directories=repo["filter_directories"],
+        filter_file_extensions=repo["filter_file_extensions"],
+        verbose=False,
+        concurrent_requests=10,
+    )
+    docs = loader.load_data(commit_sha=commit)
+    for doc in docs:
+        # stable ids so a changed file replaces its old nodes in place
+        doc.doc_id = f"{repo_key(repo)}/{doc.extra_info['file_path']}"
+    return docs
+
+
+def fetch_changes(repo, known):
+    commit = latest_commit(repo)
+    if known and known.get("commit") == commit:
+        return None
+    docs = load_repo(repo, commit)
+    files = {doc.extra_info["file_path"]: content_hash(doc.text) for doc in docs}
+    old_files = known.get("files", {}) if known else {}
+    changed = [doc for doc in docs
+               if old_files.get(doc.extra_info["file_path"]) != files[doc.extra_info["file_path"]]]
+    # deleted files and the old version of changed ones both leave the index
+    stale = [f"{repo_key(repo)}/{path}" for path in old_files
+             if files.get(path) != old_files[path]]
+    return {"commit": commit, "files": files}, changed, stale
+
+
+def service_context():
+    llm_predictor = LLMPredictor(
+        llm=OpenAI(temperature=0, model_name="text-davinci-003")
+    )
+    prompt_helper = PromptHelper(10000, 10000, 20)
+    # only files new since the last build are embedded, and in large batches
+    embed_model = embeddings.llama_embedding(embeddings.get_pipeline())
+    return ServiceContext.from_defaults(llm_predictor=llm_predictor, prompt_helper=prompt_helper,
+                                        embed_model=embed_model)
+
+
+def index_exists():
+    return os.path.exists(os.path.join(PERSIST_DIR, "docstore.json"))
+
+
+def load_index(context):
+    if index_exists():
+        return load_index_from_storage(
+            StorageContext.from_defaults(persist_dir=PERSIST_DIR),
+            service_context=context)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the GitHub doc index, embedding only changed files")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the manifest and index every file afresh")
+    args = parser.parse_args()
+
+    # without a manifest nothing tells new files from ones already in the
+    # store, inserting them all would index everything twice
+    rebuild = args.rebuild or not os.path.exists(MANIFEST_PATH)
+    manifest = {} if rebuild else load_manifest()
+    updates = {}
+    changed_docs = []
+    stale_ids = []
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=REPO_WORKERS) as pool:
+        futures = {pool.submit(fetch_changes, repo, manifest.get(repo_key(repo))): repo
+                   for repo in repos}
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error loading data for {repo_key(repo)}: {e}. Skipping this repository.")
+                failed.append(repo_key(repo))
+                continue
+            if result is None:
+                print(f"{repo_key(repo)} unchanged")
+                continue
+            entry, changed, stale = result
+            print(f"{repo_key(repo)}: {len(changed)} added or changed, {len(stale)} removed or replaced")
+            updates[repo_key(repo)] = entry
+            changed_docs.extend(changed)
+            stale_ids.extend(stale)
+
+    if rebuild and failed and index_exists():
+        # a rebuild replaces the store, it would lose those repositories
+        print(f"Not rebuilding, {', '.join(failed)} failed to load. Run again.")
+        return
+
+    if not changed_docs and not stale_ids:
+        manifest.update(updates)
+        save_manifest(manifest)
+        print("Index is up to date.")
+        return
 
-prompt_helper = PromptHelper(10000, 10000, 20)
+    context = service_context()
+    index = None if rebuild else load_index(context)
+    if index is None:
+        index = GPTVectorStoreIndex.from_documents(changed_docs, service_context=context)
+    else:
+        # only new and changed files are embedded, the rest of the index is
+        # untouched; their nodes go in together so the embeddings batch across files
+        for doc_id in stale_ids:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        index.insert_nodes(context.node_parser.get_nodes_from_documents(changed_docs))
+        for doc in changed_docs:
+            index.docstore.set_document_hash(doc.get_doc_id(), doc.hash)
 
-service_context = ServiceContext.from_defaults(llm_predictor=llm_predictor, prompt_helper=prompt_helper)
+    index.storage_context.persist(persist_dir=PERSIST_DIR)
+    # the mapped copy the servers load, kept in step with the JSON one
+    vector_file.convert("llama", PERSIST_DIR, BIN_DIR)
+    manifest.update(updates)
+    save_manifest(manifest)
+    print(f"Embedded {len(changed_docs)} documents, removed {len(stale_ids)}.")
 
-index = GPTSimpleVectorIndex.from_documents(docs, service_context=service_context)
 
-index.save_to_disk("github-vectorStore")
+if __name__ == "__main__":
+    main()
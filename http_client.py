@@ -0,0 +1,225 @@
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import admission
+
+# One shared HTTP layer for the fullnode, the indexer and the Move server:
+# pooled keep-alive connections, default timeouts, bounded retries with backoff.
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+# the Move server waits on an LLM completion, give it room
+MOVE_READ_TIMEOUT = float(os.getenv("MOVE_READ_TIMEOUT", "120"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT = frozenset(["GET", "HEAD", "OPTIONS"])
+
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def retry_policy():
+    # connect errors are retried for every method, read/status errors only for
+    # idempotent ones so a slow POST to the Move server is never sent twice
+    return Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT,
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+
+
+def create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                          pool_maxsize=POOL_SIZE,
+                          max_retries=retry_policy())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def reset_after_fork():
+    # pooled sockets and the pool's locks belong to the parent
+    global _session, _session_lock
+    global _loop
+    _session = None
+    _session_lock = threading.Lock()
+    # the loop's thread didn't survive the fork
+    _loop = None
+    _async_clients.clear()
+
+
+def request(method, url, timeout=None, **kwargs):
+    admission.throttle(url)
+    return get_session().request(method, url, timeout=timeout or TIMEOUT, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def throttle_request(request):
+    admission.throttle(str(request.url))
+
+
+def httpx_client():
+    # aptos_sdk's RestClient talks httpx, give it the same pool size and timeouts
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=POOL_SIZE,
+                            max_keepalive_connections=POOL_SIZE),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        # httpx only retries failed connects, there is no backoff knob
+        transport=httpx.HTTPTransport(retries=RETRIES),
+        event_hooks={"request": [throttle_request]},
+    )
+
+
+def rest_client(node_url):
+    from aptos_sdk.client import RestClient
+    client = RestClient(node_url)
+    pooled = httpx_client()
+    # RestClient identifies itself with an x-aptos-client header, keep it
+    pooled.headers.update(client.client.headers)
+    client.client.close()
+    client.client = pooled
+    return client
+
+
+class HttpError(Exception):
+    def __init__(self, status, url, body=""):
+        super().__init__(f"{status} from {url}: {body[:200]}")
+        self.status = status
+        self.url = url
+
+
+class AsyncHttpClient:
+    def __init__(self, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF,
+                 pool_size=POOL_SIZE):
+        self.connect_timeout, self.read_timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._session = None
+
+    def session(self):
+        import aiohttp
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size,
+                                               keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout,
+                                              sock_read=self.read_timeout),
+            )
+        return self._session
+
+    async def request_json(self, method, url, timeout=None, **kwargs):
+        import aiohttp
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(sock_connect=self.connect_timeout,
+                                                      sock_read=timeout)
+        attempt = 0
+        while True:
+            await admission.athrottle(url)
+            try:
+                async with self.session().request(method, url, **kwargs) as resp:
+                    if resp.status < 400:
+                        return await resp.json(content_type=None)
+                    body = await resp.text()
+                    error = HttpError(resp.status, url, body)
+                    retryable = resp.status in RETRY_STATUSES and method in IDEMPOTENT
+            except aiohttp.ClientConnectionError as e:
+                error = e
+                # the request may have reached the server, same rule as the sync side
+                retryable = method in IDEMPOTENT or isinstance(
+                    e, aiohttp.ClientConnectorError)
+            except asyncio.TimeoutError as e:
+                error = e
+                retryable = method in IDEMPOTENT
+            if not retryable or attempt >= self.retries:
+                raise error
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    async def get_json(self, url, **kwargs):
+        return await self.request_json("GET", url, **kwargs)
+
+    async def post_json(self, url, **kwargs):
+        return await self.request_json("POST", url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# aiohttp sessions are bound to the loop that created them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncHttpClient()
+    return client
+
+
+_loop = None
+
+
+def background_loop():
+    # one loop for every sync caller in the process, so its aiohttp session and
+    # connection pool outlive a single call instead of closing with it
+    global _loop
+    if _loop is None:
+        with _session_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run(coro):
+    # for sync callers; never from a coroutine on the background loop itself
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result()
+
+
+@atexit.register
+def close_background_loop():
+    loop = _loop
+    client = _async_clients.get(loop) if loop is not None else None
+    if client is not None:
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result(5)
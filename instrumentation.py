@@ -0,0 +1,84 @@
+import time
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+import admission
+import metrics
+
+# One handler per chat turn: turns agent callbacks into the metrics in metrics.py.
+# An iteration runs from the LLM call that picks an action to the end of that
+# action's tool call, or to the final answer.
+
+
+class AgentMetricsHandler(BaseCallbackHandler):
+    def __init__(self):
+        self.llm_started = {}
+        self.tools_started = {}
+        self.iteration_start = None
+        self.iterations = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.start_llm(kwargs.get("run_id"))
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.start_llm(kwargs.get("run_id"))
+
+    def start_llm(self, run_id):
+        now = time.perf_counter()
+        self.llm_started[run_id] = now
+        if self.iteration_start is None:
+            self.iteration_start = now
+
+    def on_llm_end(self, response, **kwargs):
+        start = self.llm_started.pop(kwargs.get("run_id"), None)
+        if start is not None:
+            metrics.llm_seconds.observe(time.perf_counter() - start)
+        # streaming responses carry no usage
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens"):
+            metrics.llm_tokens.inc(usage["prompt_tokens"], kind="prompt")
+        if usage.get("completion_tokens"):
+            metrics.llm_tokens.inc(usage["completion_tokens"], kind="completion")
+
+    def on_llm_error(self, error, **kwargs):
+        self.llm_started.pop(kwargs.get("run_id"), None)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tools_started[kwargs.get("run_id")] = (serialized.get("name", "unknown"), time.perf_counter())
+
+    def on_tool_end(self, output, **kwargs):
+        name, start = self.tools_started.pop(kwargs.get("run_id"), ("unknown", None))
+        if start is not None:
+            metrics.tool_seconds.observe(time.perf_counter() - start, tool=name)
+        metrics.tool_output_bytes.observe(len(str(output).encode("utf-8")), tool=name)
+        self.end_iteration()
+
+    def on_tool_error(self, error, **kwargs):
+        name, _ = self.tools_started.pop(kwargs.get("run_id"), ("unknown", None))
+        metrics.tool_errors.inc(tool=name)
+        self.end_iteration()
+
+    def on_agent_finish(self, finish, **kwargs):
+        self.end_iteration()
+
+    def end_iteration(self):
+        if self.iteration_start is not None:
+            metrics.agent_iteration_seconds.observe(time.perf_counter() - self.iteration_start)
+            self.iteration_start = None
+            self.iterations += 1
+
+    def finish(self, ok=True):
+        metrics.agent_iterations.observe(self.iterations)
+        metrics.chat_requests.inc(status="ok" if ok else "error")
+
+
+class LLMThrottleHandler(BaseCallbackHandler):
+    # holds every OpenAI call to the "openai" token bucket; raise_error lets
+    # BackendBusy end the turn instead of being logged and ignored
+    raise_error = True
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        admission.throttle("openai")
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        admission.throttle("openai")
@@ -0,0 +1,144 @@
+import bisect
+import contextlib
+import threading
+import time
+
+# Counters, gauges and histograms in the Prometheus text format, no client library.
+# Label values are passed as keyword arguments: tool_seconds.observe(0.2, tool="Move Agent")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 8, 13)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{escape(v)}"' for k, v in labels)
+    return "{" + pairs + "}"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.values = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            rows = [(key, list(row)) for key, row in self.values.items()]
+        for key, row in rows:
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                out.append((self.name + "_bucket", key + (("le", repr(float(bound))),), cumulative))
+            out.append((self.name + "_bucket", key + (("le", "+Inf"),), row[-1]))
+            out.append((self.name + "_sum", key, row[-2]))
+            out.append((self.name + "_count", key, row[-1]))
+        return out
+
+
+registry = []
+
+
+def counter(name, help):
+    metric = Counter(name, help)
+    registry.append(metric)
+    return metric
+
+
+def gauge(name, help):
+    metric = Gauge(name, help)
+    registry.append(metric)
+    return metric
+
+
+def histogram(name, help, buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, help, buckets)
+    registry.append(metric)
+    return metric
+
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+chat_requests = counter("movegpt_chat_requests_total", "Chat turns by outcome")
+chat_seconds = histogram("movegpt_chat_seconds", "Wall time of a chat turn")
+agent_iteration_seconds = histogram("movegpt_agent_iteration_seconds",
+                                    "Wall time of one agent iteration, LLM call plus tool")
+agent_iterations = histogram("movegpt_agent_iterations", "Agent iterations per chat turn", COUNT_BUCKETS)
+tool_seconds = histogram("movegpt_tool_seconds", "Tool call latency")
+tool_output_bytes = histogram("movegpt_tool_output_bytes", "Tool observation size", SIZE_BUCKETS)
+tool_errors = counter("movegpt_tool_errors_total", "Tool calls that raised")
+llm_seconds = histogram("movegpt_llm_seconds", "LLM call latency")
+llm_tokens = counter("movegpt_llm_tokens_total", "LLM tokens by kind, prompt or completion")
+retrieval_seconds = histogram("movegpt_retrieval_seconds", "Doc retrieval latency in the Github tool")
@@ -0,0 +1,279 @@
+import glob
+import hashlib
+import os
+import re
+
+# Splits Move sources into one chunk per module header, struct, function and
+# spec block, so retrieval hands the prompt the item that matched instead of
+# the whole file. Comments and string literals are blanked out of a copy of the
+# source first; braces and keywords are then found on that copy, while the
+# chunk text is sliced from the original at the same offsets.
+MOVE_GLOBS = ["move-files/*.move", "training/move-files-md/*.md"]
+# one giant function is still better split than dropped from the prompt
+MAX_CHUNK_CHARS = 6000
+
+MODIFIERS = r"(?:(?:public(?:\s*\([^)]*\))?|entry|native|inline)\s+)*"
+FUN_RE = re.compile(r"^" + MODIFIERS + r"fun\s+(\w+)")
+STRUCT_RE = re.compile(r"^(?:(?:public|native)\s+)*(struct|enum)\s+(\w+)")
+SPEC_RE = re.compile(r"^spec\s+(?:(module)\b|schema\s+(\w+)|fun\s+(\w+)|(\w+))")
+HEADER_RE = re.compile(r"^(?:use|friend|const)\b")
+MODULE_RE = re.compile(r"^module\s+(?:([\w@]+)\s*::\s*)?(\w+)\s*\{")
+SPEC_MODULE_RE = re.compile(r"^spec\s+(?:([\w@]+)\s*::\s*)?(\w+)\s*\{")
+ADDRESS_RE = re.compile(r"^address\s+([\w@]+)\s*\{")
+SCRIPT_RE = re.compile(r"^script\s*\{")
+ATTRIBUTE_RE = re.compile(r"^(?:#\[[^\]]*\]\s*)+")
+# items that only exist in unit tests and the prover, never on chain
+TEST_RE = re.compile(r"#\[\s*(?:test|test_only|verify_only)\b")
+ABILITIES_RE = re.compile(r"\bhas\s+([\w\s,]+?)\s*[{;]")
+
+
+TOKEN_RE = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\])*"?', re.S)
+BRACE_RE = re.compile(r"[{};]")
+
+
+def blank(m):
+    text = m.group(0)
+    if text.startswith('"'):
+        # keep the quotes so the statement shape survives
+        return '"' + " " * (len(text) - 2) + '"' if len(text) > 1 else text
+    return re.sub(r"[^\n]", " ", text)
+
+
+def mask(source):
+    # same length as source, comments and string bodies replaced with spaces
+    return TOKEN_RE.sub(blank, source)
+
+
+def statements(masked, start, end):
+    # top-level statements of a block body: each ends with `;` or with the `}`
+    # that closes its own braces, unless a `;` follows as in `use a::{b, c};`
+    depth = 0
+    begin = start
+    for m in BRACE_RE.finditer(masked, start, end):
+        c = m.group(0)
+        i = m.start()
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                rest = masked[i + 1:end].lstrip()
+                if rest.startswith(";") or rest.startswith(","):
+                    continue
+                yield begin, i + 1
+                begin = i + 1
+        elif depth == 0:
+            yield begin, i + 1
+            begin = i + 1
+    if masked[begin:end].strip():
+        yield begin, end
+
+
+def block_body(masked, start, end):
+    # (open + 1, close) of the first brace block in [start, end)
+    open_at = masked.index("{", start, end)
+    return open_at + 1, end - 1
+
+
+def strip_fence(text):
+    # training/move-files-md holds the same sources wrapped in a ``` fence
+    lines = text.strip().splitlines()
+    if lines and lines[0].startswith("```"):
+        lines = lines[1:]
+        if lines and lines[-1].startswith("```"):
+            lines = lines[:-1]
+    return "\n".join(lines)
+
+
+class Chunker:
+    def __init__(self, source, path="", max_chars=MAX_CHUNK_CHARS):
+        self.source = source
+        self.masked = mask(source)
+        self.path = path
+        self.max_chars = max_chars
+        self.chunks = []
+        # offset -> line number, built once
+        self.line_starts = [0] + [m.end() for m in re.finditer("\n", source)]
+
+    def line(self, offset):
+        lo, hi = 0, len(self.line_starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.line_starts[mid] <= offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def head(self, start, end):
+        # the masked statement without leading whitespace and attributes
+        text = self.masked[start:end].lstrip()
+        return ATTRIBUTE_RE.sub("", text).lstrip()
+
+    def test_only(self, start, end):
+        m = ATTRIBUTE_RE.match(self.masked[start:end].lstrip())
+        return bool(m and TEST_RE.search(m.group(0)))
+
+    def trim(self, start, end):
+        # drop the blank lines between items but keep doc comments and attributes
+        while start < end and self.source[start] in " \t\r\n":
+            start += 1
+        return start, end
+
+    def emit(self, kind, name, start, end, address=None, module=None, text=None, test=False, **extra):
+        start, end = self.trim(start, end)
+        chunk = {
+            "kind": kind,
+            "name": name,
+            "address": address,
+            "module": module,
+            "path": self.path,
+            "start_line": self.line(start),
+            "end_line": self.line(max(start, end - 1)),
+            "text": self.source[start:end] if text is None else text,
+        }
+        if test:
+            chunk["test"] = True
+        chunk.update(extra)
+        self.add(chunk)
+
+    def add(self, chunk):
+        text = chunk["text"]
+        if len(text) <= self.max_chars:
+            self.chunks.append(chunk)
+            return
+        # split oversized items on line boundaries, every part keeps the metadata
+        lines, size, part = [], 0, 0
+        line_no = chunk["start_line"]
+        for line in text.splitlines(keepends=True):
+            if lines and size + len(line) > self.max_chars:
+                self.chunks.append(dict(chunk, text="".join(lines), part=part,
+                                        start_line=line_no))
+                line_no += len(lines)
+                lines, size, part = [], 0, part + 1
+            lines.append(line)
+            size += len(line)
+        self.chunks.append(dict(chunk, text="".join(lines), part=part, start_line=line_no))
+
+    def run(self):
+        self.top_level(0, len(self.source), None)
+        return self.chunks
+
+    def top_level(self, start, end, address):
+        for s, e in statements(self.masked, start, end):
+            head = self.head(s, e)
+            m = ADDRESS_RE.match(head)
+            if m:
+                body_start, body_end = block_body(self.masked, s, e)
+                self.top_level(body_start, body_end, m.group(1))
+                continue
+            m = MODULE_RE.match(head)
+            if m:
+                self.module(s, e, m.group(1) or address, m.group(2), "module", self.test_only(s, e))
+                continue
+            m = SPEC_MODULE_RE.match(head)
+            if m:
+                self.module(s, e, m.group(1) or address, m.group(2), "spec_module", self.test_only(s, e))
+                continue
+            if SCRIPT_RE.match(head):
+                self.emit("script", "script", s, e, address=address)
+
+    def module(self, start, end, address, name, kind, test=False):
+        body_start, body_end = block_body(self.masked, start, end)
+        header = [(start, body_start)]
+        for s, e in statements(self.masked, body_start, body_end):
+            head = self.head(s, e)
+            if not head:
+                continue
+            if HEADER_RE.match(head):
+                header.append((s, e))
+                continue
+            m = FUN_RE.match(head)
+            if m:
+                self.emit("function", m.group(1), s, e, address, name, test=test or self.test_only(s, e),
+                          visibility=visibility(head), entry=bool(re.search(r"\bentry\b", head[:m.start(1)])))
+                continue
+            m = STRUCT_RE.match(head)
+            if m:
+                abilities = ABILITIES_RE.search(head)
+                self.emit(m.group(1), m.group(2), s, e, address, name, test=test or self.test_only(s, e),
+                          abilities=[a.strip() for a in abilities.group(1).split(",")] if abilities else [])
+                continue
+            m = SPEC_RE.match(head)
+            if m:
+                target = m.group(1) or m.group(2) or m.group(3) or m.group(4)
+                spec_kind = "schema" if m.group(2) else "spec_fun" if m.group(3) else "spec"
+                self.emit(spec_kind, target, s, e, address, name, test=test)
+                continue
+            header.append((s, e))
+        # the module line plus its uses, friends and constants as one chunk
+        text = "\n".join(self.source[s:e].strip() for s, e in header) + "\n}"
+        self.emit(kind, name, start, end, address, name, text=text, test=test)
+
+
+def visibility(head):
+    m = re.match(r"(?:(?:entry|native|inline)\s+)*public(?:\s*\(\s*(\w+)\s*\))?", head)
+    if not m:
+        return "private"
+    return m.group(1) or "public"
+
+
+def chunk_source(source, path=""):
+    if path.endswith(".md"):
+        source = strip_fence(source)
+    return Chunker(source, path).run()
+
+
+def chunk_id(chunk):
+    return f"{chunk['address']}::{chunk['module']}::{chunk['kind']}::{chunk['name']}"
+
+
+def pair_specs(chunks):
+    # link spec blocks (inline or from a .spec.move file) to the item they specify
+    items = {}
+    for chunk in chunks:
+        if chunk["kind"] in ("function", "struct", "enum", "module"):
+            items.setdefault((chunk["address"], chunk["module"], chunk["name"]), chunk)
+    impl_paths = {}
+    for chunk in chunks:
+        if chunk["kind"] == "module":
+            impl_paths[(chunk["address"], chunk["module"])] = chunk["path"]
+    for chunk in chunks:
+        if chunk["kind"] not in ("spec", "spec_module"):
+            continue
+        # `spec module { .. }` specifies the module itself
+        name = chunk["module"] if chunk["name"] == "module" else chunk["name"]
+        key = (chunk["address"], chunk["module"], name)
+        if chunk["path"].endswith(".spec.move"):
+            chunk["impl_path"] = impl_paths.get((chunk["address"], chunk["module"]))
+        target = items.get(key)
+        if target is not None and chunk["kind"] == "spec":
+            chunk["spec_for"] = chunk_id(target)
+            target.setdefault("specs", []).append(chunk_id(chunk))
+    return chunks
+
+
+def chunk_files(paths, root="."):
+    chunks = []
+    seen = set()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            source = f.read()
+        if path.endswith(".md"):
+            source = strip_fence(source)
+        # the markdown twins differ from the sources only in whitespace
+        digest = hashlib.sha256(" ".join(source.split()).encode("utf-8")).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        chunks.extend(Chunker(source, os.path.relpath(path, root)).run())
+    return pair_specs(chunks)
+
+
+def corpus_paths(root=".", globs=MOVE_GLOBS):
+    return [p for pattern in globs for p in sorted(glob.glob(os.path.join(root, pattern)))]
+
+
+def chunk_corpus(root=".", globs=MOVE_GLOBS):
+    return chunk_files(corpus_paths(root, globs), root)
+
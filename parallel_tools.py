@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# A meta-tool for the ReAct agent: one action carries several independent tool
+# calls, they run concurrently, and the agent gets one merged observation back.
+# "balance and recent transactions of 0x1" becomes one LLM step instead of two.
+MULTI_TOOL_NAME = "Multi Tool"
+MAX_PARALLEL_CALLS = int(os.getenv("MAX_PARALLEL_CALLS", "6"))
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", "16"))
+
+# separate from the tool executor: the sync path blocks on these futures
+executor = ThreadPoolExecutor(max_workers=PARALLEL_WORKERS, thread_name_prefix="multi-tool")
+
+LINE_RE = re.compile(r"^\s*([^:]+?)\s*:\s*(.+?)\s*$")
+
+
+def parse_calls(input, names):
+    # a JSON list of {"tool", "input"}, or "Tool Name: input" per line or per ';'
+    calls = None
+    if isinstance(input, str):
+        try:
+            calls = json.loads(input)
+        except ValueError:
+            calls = None
+    else:
+        calls = input
+    if isinstance(calls, dict):
+        calls = calls.get("calls") or [calls]
+    if isinstance(calls, list):
+        parsed = [(str(c.get("tool", "")).strip(), c.get("input", ""))
+                  for c in calls if isinstance(c, dict)]
+    else:
+        parsed = []
+        for part in re.split(r"[\n;]", str(input)):
+            m = LINE_RE.match(part)
+            if m:
+                parsed.append((m.group(1), m.group(2)))
+    known = {n.lower(): n for n in names}
+    return [(known.get(name.lower()), name, tool_input)
+            for name, tool_input in parsed[:MAX_PARALLEL_CALLS]]
+
+
+def decoded(output):
+    # tool outputs are mostly JSON strings, nest them instead of escaping twice
+    if isinstance(output, str):
+        try:
+            return json.loads(output)
+        except ValueError:
+            return output
+    return output
+
+
+def merge(calls, outputs):
+    return json.dumps([{"tool": name, "input": tool_input, "output": decoded(output)}
+                       for (_, name, tool_input), output in zip(calls, outputs)],
+                      separators=(",", ":"))
+
+
+def unknown(name, names):
+    return {"error": f"unknown tool {name!r}, use one of: {', '.join(names)}"}
+
+
+def create_multi_tool(tools):
+    from langchain.agents import Tool
+
+    by_name = {tool.name: tool for tool in tools if tool.name != MULTI_TOOL_NAME}
+    names = list(by_name)
+
+    def call(name, tool_input):
+        try:
+            return by_name[name].func(str(tool_input))
+        except Exception as e:
+            return {"error": str(e)}
+
+    def run(input):
+        calls = parse_calls(input, by_name)
+        futures = [executor.submit(call, name, tool_input) if name else None
+                   for name, raw_name, tool_input in calls]
+        return merge(calls, [f.result() if f else unknown(raw_name, names)
+                             for f, (_, raw_name, _) in zip(futures, calls)])
+
+    async def arun(input):
+        calls = parse_calls(input, by_name)
+
+        async def one(name, raw_name, tool_input):
+            if not name:
+                return unknown(raw_name, names)
+            try:
+                return await by_name[name].coroutine(str(tool_input))
+            except Exception as e:
+                return {"error": str(e)}
+
+        return merge(calls, await asyncio.gather(*(one(*c) for c in calls)))
+
+    class MultiTool(Tool):
+        def _to_args_and_kwargs(self, tool_input):
+            # the planner often emits the call list as JSON rather than a string
+            if not isinstance(tool_input, str):
+                tool_input = json.dumps(tool_input)
+            return (tool_input,), {}
+
+    return MultiTool(
+        name=MULTI_TOOL_NAME,
+        func=run,
+        coroutine=arun,
+        description=(f"{MULTI_TOOL_NAME}: useful when you need several independent facts at once, "
+                     f"for example the balance and the transactions of an account, runs the tools "
+                     f"concurrently input:JSON list of up to {MAX_PARALLEL_CALLS} "
+                     f'{{"tool": tool name, "input": tool input}}'),
+    )
@@ -0,0 +1,272 @@
+import argparse
+import gc
+import mmap
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+
+# Production mode for chatServer: the parent imports the app and loads the doc
+# index, symbol index, ABI catalog and tool registry once, then forks workers
+# that share those pages copy-on-write. Every worker serves the same listening
+# socket. The parent restarts workers that die or stop heartbeating, and
+# recycles each one after MAX_REQUESTS so slow leaks never build up.
+#   python prefork_server.py --workers 4 --bind 0.0.0.0:5000
+# SIGTERM/SIGINT stop gracefully, SIGHUP replaces the workers one by one.
+WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+BIND = os.getenv("BIND", "0.0.0.0:5000")
+BACKLOG = int(os.getenv("BACKLOG", "256"))
+MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "2000"))
+# spread recycling out so the workers don't all restart together
+MAX_REQUESTS_JITTER = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "200"))
+# a worker whose accept loop hasn't ticked for this long is killed and replaced
+WORKER_TIMEOUT = float(os.getenv("WORKER_TIMEOUT", "60"))
+# how long a stopping worker may finish the turns it already accepted
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "60"))
+POLL_INTERVAL = 0.5
+# a worker that dies this soon after starting is crash looping, slow down
+MIN_WORKER_LIFETIME = 5
+
+HEARTBEAT = struct.Struct("d")
+
+
+class Worker:
+    # runs in the child: one threaded werkzeug server on the inherited socket
+    def __init__(self, app, sock, slot, heartbeats, max_requests):
+        self.app = app
+        self.sock = sock
+        self.slot = slot
+        self.heartbeats = heartbeats
+        self.max_requests = max_requests
+        self.requests = 0
+        self.active = 0
+        self.started = time.time()
+        self.draining = False
+        self._lock = threading.Lock()
+        self.server = None
+
+    def beat(self):
+        HEARTBEAT.pack_into(self.heartbeats, self.slot * HEARTBEAT.size, time.time())
+
+    def wsgi(self, environ, start_response):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            recycle = self.requests == self.max_requests
+        try:
+            return self.app(environ, start_response)
+        finally:
+            with self._lock:
+                self.active -= 1
+            if recycle:
+                self.stop()
+
+    def healthz(self):
+        with self._lock:
+            body = {
+                'pid': os.getpid(),
+                'requests': self.requests,
+                'active': self.active,
+                'uptime': round(time.time() - self.started, 1),
+                'draining': self.draining,
+            }
+        return body, 503 if self.draining else 200
+
+    def stop(self, *args):
+        # stop accepting; serve_forever returns and run() drains what's in flight
+        if not self.draining:
+            self.draining = True
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def run(self):
+        from werkzeug.serving import make_server
+        host, port = self.sock.getsockname()[:2]
+        self.app.add_url_rule("/healthz", "healthz", self.healthz)
+        self.server = make_server(host, port, self.wsgi, threaded=True, fd=self.sock.fileno())
+        # called by serve_forever on every poll, so a stuck accept loop stops beating
+        self.server.service_actions = self.beat
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        self.beat()
+        self.server.serve_forever(poll_interval=POLL_INTERVAL)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.active and time.monotonic() < deadline:
+            self.beat()
+            time.sleep(0.1)
+
+
+class Arbiter:
+    # runs in the parent: forks, watches and replaces workers
+    def __init__(self, app, sock, workers=WORKERS, max_requests=MAX_REQUESTS):
+        self.app = app
+        self.sock = sock
+        self.count = workers
+        self.max_requests = max_requests
+        self.workers = {}  # pid -> (slot, started)
+        # one heartbeat slot per worker, shared with the children
+        self.heartbeats = mmap.mmap(-1, HEARTBEAT.size * workers)
+        self.stopping = False
+        self.reload = False
+        self.failures = 0
+
+    def spawn(self, slot):
+        # the request limit is drawn before the fork, so each worker gets its own
+        max_requests = self.max_requests + int.from_bytes(os.urandom(2), "little") % (MAX_REQUESTS_JITTER + 1)
+        HEARTBEAT.pack_into(self.heartbeats, slot * HEARTBEAT.size, time.time())
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = (slot, time.monotonic())
+            return pid
+        status = 0
+        try:
+            gc.enable()
+            Worker(self.app, self.sock, slot, self.heartbeats, max_requests).run()
+        except BaseException as e:
+            print(f"worker {os.getpid()}: {e!r}", file=sys.stderr)
+            status = 1
+        finally:
+            # exit() rather than _exit(): the conversation store flushes and
+            # the semantic caches save in atexit
+            sys.exit(status)
+
+    def free_slot(self):
+        used = {slot for slot, _ in self.workers.values()}
+        return next(i for i in range(self.count) if i not in used)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            entry = self.workers.pop(pid, None)
+            if entry is not None and os.waitstatus_to_exitcode(status) != 0:
+                if time.monotonic() - entry[1] < MIN_WORKER_LIFETIME:
+                    self.failures += 1
+                print(f"worker {pid} exited with {os.waitstatus_to_exitcode(status)}", file=sys.stderr)
+
+    def check_heartbeats(self):
+        now = time.time()
+        for pid, (slot, _) in list(self.workers.items()):
+            last, = HEARTBEAT.unpack_from(self.heartbeats, slot * HEARTBEAT.size)
+            if now - last > WORKER_TIMEOUT:
+                print(f"worker {pid} missed its heartbeat for {now - last:.0f}s, killing it", file=sys.stderr)
+                self.kill(pid, signal.SIGKILL)
+
+    def kill(self, pid, sig=signal.SIGTERM):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def rolling_restart(self):
+        # replace one worker at a time, the rest keep serving
+        for pid in list(self.workers):
+            entry = self.workers.get(pid)
+            if entry is None:
+                continue
+            slot, _ = entry
+            self.kill(pid)
+            deadline = time.monotonic() + GRACEFUL_TIMEOUT + WORKER_TIMEOUT
+            while pid in self.workers and time.monotonic() < deadline and not self.stopping:
+                time.sleep(POLL_INTERVAL)
+                self.reap()
+            if pid in self.workers:
+                self.kill(pid, signal.SIGKILL)
+            if self.stopping:
+                return
+            self.spawn(slot)
+
+    def handle(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self.reload = True
+        else:
+            self.stopping = True
+
+    def run(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, self.handle)
+        # everything loaded so far is never collected: keep the collector from
+        # touching (and so copying) those objects in every worker
+        gc.freeze()
+        while not self.stopping:
+            self.reap()
+            if self.reload:
+                self.reload = False
+                self.rolling_restart()
+                continue
+            while len(self.workers) < self.count and not self.stopping:
+                if self.failures >= self.count:
+                    # every slot is crash looping, don't fork-bomb the box
+                    time.sleep(min(30, self.failures))
+                self.spawn(self.free_slot())
+            self.check_heartbeats()
+            time.sleep(POLL_INTERVAL)
+            if self.workers and all(time.monotonic() - started > MIN_WORKER_LIFETIME
+                                    for _, started in self.workers.values()):
+                self.failures = 0
+        self.shutdown()
+
+    def shutdown(self):
+        for pid in list(self.workers):
+            self.kill(pid)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGKILL)
+        self.reap()
+
+
+def listen(bind, backlog=BACKLOG):
+    host, _, port = bind.rpartition(":")
+    sock = socket.create_server((host or "0.0.0.0", int(port)), backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app(workers):
+    # no background warm-up thread: it would not survive the fork
+    os.environ["WARM_UP"] = "0"
+    # collecting while the index loads only dirties pages; freeze() takes over after
+    gc.disable()
+    import admission
+    import chatServer
+    import conversation_store
+    from AptosToolClient import warm_up
+    start = time.perf_counter()
+    warm_up(background=False)
+    print(f"loaded in {time.perf_counter() - start:.1f}s, forking {workers} workers", file=sys.stderr)
+    chatServer.app.debug = False
+    # consecutive turns of a conversation land on any worker: the agent memory
+    # is rebuilt from the shared transcript on every turn
+    conversation_store.get_store().shared = True
+    # each worker enforces its share of the rate and concurrency limits
+    admission.configure(share=1 / workers)
+    admission.controller = admission.AdmissionController(
+        max_concurrent=max(1, admission.MAX_CONCURRENT // workers),
+        max_queue=max(1, admission.MAX_QUEUE // workers))
+    return chatServer.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve chatServer from pre-forked workers")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--bind", default=BIND)
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS)
+    args = parser.parse_args()
+
+    sock = listen(args.bind)
+    app = load_app(args.workers)
+    Arbiter(app, sock, args.workers, args.max_requests).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import move_chunker
+import vector_file
+
+# First-party retrieval over the Move corpus: a float32 matrix of normalized
+# chunk embeddings searched with one matrix product per batch of queries, plus
+# an optional hnswlib graph for large corpora. Returns raw chunks, the caller
+# decides whether an LLM ever sees them.
+CORPUS_GLOBS = move_chunker.MOVE_GLOBS
+STORE_DIR = os.getenv("RETRIEVAL_STORE", "./retrievalStore/")
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+# same settings the JS side uses for vectorStore/ (space "ip", 1536 dims)
+HNSW_SPACE = "ip"
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF = 64
+
+
+def default_embedder():
+    # batched, rate limited and cached on disk, see embeddings.py
+    import embeddings
+    return embeddings.get_pipeline()
+
+
+def query_embedder():
+    # questions at serving time skip the disk cache
+    import embeddings
+    return embeddings.get_query_pipeline()
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def load_corpus(root=".", globs=CORPUS_GLOBS):
+    # one chunk per module header, struct, function and spec block
+    return move_chunker.chunk_corpus(root, globs)
+
+
+class RetrievalIndex:
+    def __init__(self, matrix, chunks, normalized=False):
+        # a mapped store is normalized already, normalizing again would copy it
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+        self.chunks = chunks
+        self.hnsw = None
+
+    @classmethod
+    def build(cls, chunks, embedder=None):
+        embedder = embedder or default_embedder()
+        rows = embedder.embed_documents([c["text"] for c in chunks])
+        return cls(np.array(rows, dtype=np.float32), chunks)
+
+    def build_hnsw(self, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef=HNSW_EF):
+        import hnswlib
+        index = hnswlib.Index(space=HNSW_SPACE, dim=self.matrix.shape[1])
+        index.init_index(max_elements=len(self.matrix), ef_construction=ef_construction, M=m)
+        index.add_items(self.matrix, np.arange(len(self.matrix)))
+        index.set_ef(ef)
+        self.hnsw = index
+        return index
+
+    def search(self, query_vectors, k=TOP_K):
+        # (n, d) queries -> (n, k) chunk ids and scores, best first
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        k = min(k, len(self.matrix))
+        if self.hnsw is not None:
+            ids, distances = self.hnsw.knn_query(queries, k=k)
+            return ids, 1.0 - distances
+        scores = queries @ self.matrix.T
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def results(self, ids, scores):
+        return [dict(self.chunks[i], score=round(float(s), 4)) for i, s in zip(ids, scores)]
+
+    def save(self, path=STORE_DIR, model=None):
+        vector_file.write(path, self.matrix, [c["text"] for c in self.chunks],
+                          [{k: v for k, v in c.items() if k != "text"} for c in self.chunks],
+                          model=model, source="retrieval")
+        if self.hnsw is not None:
+            self.hnsw.save_index(os.path.join(path, "hnsw.bin"))
+
+    @classmethod
+    def load(cls, path=STORE_DIR, use_hnsw=True):
+        if vector_file.is_store(path):
+            store = vector_file.open_store(path)
+            matrix = store.matrix
+            index = cls(matrix, store.records, normalized=True)
+        else:
+            # stores saved before the binary format
+            matrix = np.load(os.path.join(path, "embeddings.npy"))
+            with open(os.path.join(path, "chunks.json")) as f:
+                chunks = json.load(f)
+            index = cls(matrix, chunks)
+        hnsw_path = os.path.join(path, "hnsw.bin")
+        if use_hnsw and os.path.exists(hnsw_path):
+            import hnswlib
+            index.hnsw = hnswlib.Index(space=HNSW_SPACE, dim=matrix.shape[1])
+            index.hnsw.load_index(hnsw_path, max_elements=len(matrix))
+            index.hnsw.set_ef(HNSW_EF)
+        return index
+
+
+class RetrievalEngine:
+    def __init__(self, index, embedder=None):
+        self.index = index
+        self._embedder = embedder
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = query_embedder()
+        return self._embedder
+
+    def query(self, questions, k=TOP_K):
+        single = isinstance(questions, str)
+        questions = [questions] if single else list(questions)
+        vectors = [self.embedder.embed_query(q) for q in questions]
+        ids, scores = self.index.search(np.array(vectors, dtype=np.float32), k)
+        results = [self.index.results(i, s) for i, s in zip(ids, scores)]
+        return results[0] if single else results
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def has_store(path=STORE_DIR):
+    # only `python retrieval.py build` creates it, a fresh checkout has none
+    return vector_file.is_store(path) or os.path.exists(os.path.join(path, "chunks.json"))
+
+
+def get_engine(path=STORE_DIR):
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RetrievalEngine(RetrievalIndex.load(path))
+    return _engine
+
+
+def move_context(input, k=TOP_K):
+    # raw chunks for the agent, no synthesis call
+    hits = get_engine().query(input, k)
+    return json.dumps([{"path": h["path"], "item": item_name(h),
+                        "score": h["score"], "text": h["text"]} for h in hits])
+
+
+def item_name(hit):
+    # scripts belong to no module
+    return f"{hit['module']}::{hit['name']}" if hit.get("module") else hit["name"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the Move retrieval store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--store", default=STORE_DIR)
+    build.add_argument("--hnsw", action="store_true", help="also build an HNSW graph")
+    query = sub.add_parser("query")
+    query.add_argument("question")
+    query.add_argument("--store", default=STORE_DIR)
+    query.add_argument("-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        chunks = load_corpus()
+        print(f"Embedding {len(chunks)} chunks...")
+        embedder = default_embedder()
+        index = RetrievalIndex.build(chunks, embedder)
+        if args.hnsw:
+            index.build_hnsw()
+        index.save(args.store, model=embedder.model)
+        print(f"Saved {len(chunks)} chunks to {args.store}")
+    else:
+        engine = RetrievalEngine(RetrievalIndex.load(args.store))
+        start = time.perf_counter()
+        hits = engine.query(args.question, args.k)
+        elapsed = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            print(f"{hit['score']:.3f} {hit['path']}:{hit['start_line']} {hit['kind']} {item_name(hit)}")
+        print(f"{elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import asyncio
+import atexit
+import fcntl
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Answers to questions that embed close enough to one we already answered.
+# Vectors are L2-normalized float32 rows, so similarity is a single mat-vec.
+THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", "./semanticCache/")
+
+@functools.lru_cache(maxsize=512)
+def embed_query(text):
+    # shared by every cache, so one question asked of two tools is embedded once
+    import embeddings
+    return tuple(embeddings.get_query_pipeline().embed_query(text))
+
+
+def cacheable(answer):
+    # an empty or failed answer would be replayed to every similar question;
+    # the tools answer with JSON like {"answer": null} or "None"
+    if isinstance(answer, str):
+        try:
+            answer = json.loads(answer)
+        except ValueError:
+            pass
+    if isinstance(answer, dict):
+        if answer.get("error"):
+            return False
+        answer = answer.get("answer", answer)
+    if isinstance(answer, str):
+        return answer.strip() not in ("", "None", "null", "Empty Response")
+    return answer not in (None, [], {})
+
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    def __init__(self, name, embed=embed_query, threshold=THRESHOLD,
+                 max_entries=MAX_ENTRIES, ttl=None, path=None):
+        self.name = name
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = OrderedDict()  # question -> (answer, row, created), in LRU order
+        self.matrix = None
+        self.row_keys = []  # row -> question, None for a free row
+        self.free_rows = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+        self.dim = None  # of the embedder in use, known from the first vector
+        self.dirty = False
+        self.loaded = path is None
+
+    def embed(self, text):
+        return normalize(self._embed(text))
+
+    def lookup(self, question, vector=None):
+        self._ensure_loaded()
+        vector = self.embed(question) if vector is None else vector
+        with self._lock:
+            self._match_dim(vector)
+            if question not in self.entries and self.entries:
+                used = len(self.row_keys)
+                scores = self.matrix[:used] @ vector
+                if self.free_rows:
+                    scores[self.free_rows] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    question = self.row_keys[best]
+            entry = self.entries.get(question)
+            if entry is not None and self.ttl and time.time() - entry[2] > self.ttl:
+                self._drop(question)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, vector
+            self.entries.move_to_end(question)
+            self.hits += 1
+            return entry[0], vector
+
+    def store(self, question, answer, vector=None):
+        if not cacheable(answer):
+            with self._lock:
+                self.skipped += 1
+            return
+        self._ensure_loaded()
+        vector = self.embed(question) if vector is None else vector
+        with self._lock:
+            self._match_dim(vector)
+            if question in self.entries:
+                self._drop(question)
+            self._insert(question, answer, vector, time.time())
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+            self.dirty = True
+
+    def _match_dim(self, vector):
+        # entries saved under another embedder can't be compared with this
+        # one's vectors: drop them rather than fail every lookup
+        self.dim = len(vector)
+        if self.matrix is not None and self.matrix.shape[1] != self.dim:
+            self.entries.clear()
+            self.matrix = None
+            self.row_keys = []
+            self.free_rows = []
+            self.dirty = True
+
+    def _insert(self, question, answer, vector, created):
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.row_keys[row] = question
+        else:
+            row = len(self.row_keys)
+            if self.matrix is None:
+                self.matrix = np.zeros((16, len(vector)), dtype=np.float32)
+            elif row >= len(self.matrix):
+                grown = np.zeros((len(self.matrix) * 2, self.matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.row_keys.append(question)
+        self.matrix[row] = vector
+        self.entries[question] = (answer, row, created)
+
+    def _drop(self, question):
+        _, row, _ = self.entries.pop(question)
+        self.row_keys[row] = None
+        self.free_rows.append(row)
+
+    def wrap(self, func):
+        # the tool's own function stays the source of truth, the cache sits in front
+        @functools.wraps(func)
+        def cached(input):
+            answer, vector = self.lookup(input)
+            if answer is not None:
+                return answer
+            answer = func(input)
+            self.store(input, answer, vector)
+            return answer
+        cached.cache = self
+        return cached
+
+    def wrap_async(self, func):
+        # embedding is a blocking call, keep it off the event loop
+        @functools.wraps(func)
+        async def cached(input):
+            loop = asyncio.get_running_loop()
+            answer, vector = await loop.run_in_executor(None, self.lookup, input)
+            if answer is not None:
+                return answer
+            answer = await func(input)
+            await loop.run_in_executor(None, self.store, input, answer, vector)
+            return answer
+        cached.cache = self
+        return cached
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self._load()
+                    self.loaded = True
+
+    def save(self):
+        # every prefork worker saves into the same directory: under a lock,
+        # merge with what the others saved, then swap one file in whole so a
+        # reader never pairs one save's vectors with another's answers
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            questions = list(self.entries)
+            rows = [self.entries[q][1] for q in questions]
+            meta = [[q, self.entries[q][0], self.entries[q][2]] for q in questions]
+            vectors = list(self.matrix[rows]) if rows else []
+            dim = self.dim
+            self.dirty = False
+        base = os.path.join(self.path, self.name)
+        with open(base + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            saved_meta, saved_vectors = self._read(base)
+            ours = set(questions)
+            theirs = [(m, v) for m, v in zip(saved_meta, saved_vectors)
+                      if m[0] not in ours and cacheable(m[1]) and (dim is None or len(v) == dim)]
+            # theirs first, ours are the most recently used in this process
+            merged = (theirs + list(zip(meta, vectors)))[-self.max_entries:]
+            tmp = f"{base}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, vectors=np.array([v for _, v in merged], dtype=np.float32),
+                         meta=np.frombuffer(json.dumps([m for m, _ in merged]).encode("utf-8"), dtype=np.uint8))
+            os.replace(tmp, base + ".npz")
+
+    def _read(self, base):
+        if os.path.exists(base + ".npz"):
+            with np.load(base + ".npz") as data:
+                return json.loads(data["meta"].tobytes()), data["vectors"]
+        if os.path.exists(base + ".json"):
+            # saved before the single-file format
+            with open(base + ".json") as f:
+                meta = json.load(f)
+            vectors = np.load(base + ".npy")
+            if len(vectors) == len(meta):
+                return meta, vectors
+        return [], []
+
+    def _load(self):
+        meta, vectors = self._read(os.path.join(self.path, self.name))
+        # saved in LRU order, keep the most recently used ones
+        keep = len(meta) - min(len(meta), self.max_entries)
+        for (question, answer, created), vector in zip(meta[keep:], vectors[keep:]):
+            # saved before empty answers were kept out
+            if cacheable(answer):
+                self._insert(question, answer, vector, created)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'skipped': self.skipped,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+caches = []
+
+
+def create(name, **kwargs):
+    cache = SemanticCache(name, path=CACHE_DIR, **kwargs)
+    caches.append(cache)
+    return cache
+
+
+def save_all():
+    for cache in caches:
+        cache.save()
+
+
+def stats():
+    return {cache.name: cache.stats() for cache in caches}
+
+
+atexit.register(save_all)
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+MAX_SESSIONS = 256
+SESSION_TTL = 30 * 60  # seconds a conversation may sit idle before eviction
+
+
+class Session:
+    def __init__(self, key, agent, lock):
+        self.key = key
+        self.agent = agent
+        self.lock = lock
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.turns = 0
+        self.leases = 0  # requests between get() and release()
+
+
+class SessionPool:
+    # keeps one agent (and its memory) per (user_id, convo_id), least recently
+    # used first so the oldest idle session is evicted when the pool is full;
+    # every get() is paired with a release() once the turn is over
+    def __init__(self, factory, max_size=MAX_SESSIONS, ttl=SESSION_TTL,
+                 lock_factory=threading.Lock, clock=time.monotonic,
+                 on_evict=None):
+        self.factory = factory
+        self.on_evict = on_evict
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock_factory = lock_factory
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            dropped = self._expire(now)
+            session = self.sessions.get(key)
+            if session is not None:
+                self.hits += 1
+                self.sessions.move_to_end(key)
+                session.last_used = now
+                session.leases += 1
+            else:
+                self.misses += 1
+        self._notify(dropped)
+        if session is not None:
+            return session
+
+        # build outside the pool lock, initialize_agent is not free
+        created = Session(key, self.factory(), self.lock_factory())
+        created.last_used = now
+        dropped = []
+        with self._lock:
+            # another request may have raced us to the same conversation
+            session = self.sessions.get(key)
+            if session is not None:
+                self.sessions.move_to_end(key)
+                session.leases += 1
+                return session
+            created.leases = 1
+            self.sessions[key] = created
+            dropped = self._evict()
+        self._notify(dropped)
+        return created
+
+    def release(self, session):
+        # called once a turn finishes so a long turn doesn't count as idle time
+        with self._lock:
+            session.turns += 1
+            session.leases -= 1
+            session.last_used = self.clock()
+            if self.sessions.get(session.key) is session:
+                self.sessions.move_to_end(session.key)
+            dropped = self._evict()
+        self._notify(dropped)
+
+    def _evict(self):
+        # a session with a turn in flight stays: dropping it would let the next
+        # request build a second agent, with its own lock, for the same
+        # conversation. The pool runs over max_size until those turns finish.
+        excess = len(self.sessions) - self.max_size
+        if excess <= 0:
+            return []
+        keys = []
+        for key, session in self.sessions.items():
+            if len(keys) == excess:
+                break
+            if not session.leases:
+                keys.append(key)
+        self.evictions += len(keys)
+        return [self.sessions.pop(key) for key in keys]
+
+    def peek(self, key):
+        with self._lock:
+            return self.sessions.get(key)
+
+    def remove(self, key):
+        with self._lock:
+            session = self.sessions.pop(key, None)
+        if session is None:
+            return False
+        self._notify([session])
+        return True
+
+    def evict_expired(self):
+        with self._lock:
+            dropped = self._expire(self.clock())
+        self._notify(dropped)
+        return len(dropped)
+
+    def _expire(self, now):
+        keys = []
+        # sessions are ordered by last use, so stop at the first fresh one
+        for key, session in self.sessions.items():
+            if now - session.last_used < self.ttl:
+                break
+            if not session.leases:
+                keys.append(key)
+        self.expirations += len(keys)
+        return [self.sessions.pop(key) for key in keys]
+
+    def _notify(self, dropped):
+        if self.on_evict is None:
+            return
+        for session in dropped:
+            self.on_evict(session.key, session)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, key):
+        return key in self.sessions
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.sessions),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
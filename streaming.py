@@ -0,0 +1,54 @@
+import asyncio
+import json
+import os
+
+from langchain.callbacks.base import AsyncCallbackHandler
+
+DONE = object()
+# seconds without an event before a keep-alive comment goes out; proxies keep
+# the stream open, and a client that went away is noticed on the write
+HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+PING = b": ping\n\n"
+
+
+def sse_event(event, data):
+    # one Server-Sent Events frame, data is always a single JSON line
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class AgentStreamHandler(AsyncCallbackHandler):
+    # turns agent callbacks into (event, data) pairs that the server drains in
+    # order; the answer itself goes out once, in the server's `done` event
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def on_llm_new_token(self, token, **kwargs):
+        self.queue.put_nowait(("token", {"token": token}))
+
+    async def on_agent_action(self, action, **kwargs):
+        self.queue.put_nowait(("tool_start", {
+            "tool": action.tool,
+            "input": action.tool_input,
+            "thought": action.log,
+        }))
+
+    async def on_tool_end(self, output, **kwargs):
+        self.queue.put_nowait(("tool_end", {"output": str(output)}))
+
+    async def on_tool_error(self, error, **kwargs):
+        self.queue.put_nowait(("tool_error", {"error": str(error)}))
+
+    def close(self):
+        self.queue.put_nowait(DONE)
+
+    async def events(self):
+        # None when nothing happened for HEARTBEAT seconds
+        while True:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is DONE:
+                return
+            yield item
@@ -0,0 +1,336 @@
+import argparse
+import bisect
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+
+import move_chunker
+
+# Exact and prefix lookup of Move functions, structs and modules by name, built
+# offline from move-files/ and loaded from one pickle. Answers "what are the
+# params of coin::transfer" without an embedding or LLM call.
+INDEX_PATH = os.getenv("SYMBOL_INDEX", "./symbolIndex.pkl")
+INDEX_VERSION = 2
+MAX_RESULTS = 10
+
+# named addresses used by the framework sources
+NAMED_ADDRESSES = {
+    "std": "0x1",
+    "aptos_std": "0x1",
+    "aptos_framework": "0x1",
+    "aptos_token": "0x3",
+    "aptos_token_objects": "0x4",
+}
+
+# record layout, kept as tuples so the pickle stays small and loads fast
+FIELDS = ("kind", "address", "module", "name", "signature", "generics", "params",
+          "returns", "visibility", "entry", "acquires", "abilities", "fields",
+          "uses", "doc", "path", "start_line", "end_line", "test")
+
+USE_RE = re.compile(r"\buse\s+([\w@]+::\w+(?:::\{[^}]*\}|::\w+)?)")
+FRIEND_RE = re.compile(r"\bfriend\s+([\w@]+::\w+)")
+DOC_RE = re.compile(r"^\s*///\s?(.*)$", re.M)
+
+
+def resolve_address(address):
+    return NAMED_ADDRESSES.get(address, address)
+
+
+def canonical_address(address):
+    address = resolve_address((address or "").lstrip("@"))
+    if re.fullmatch(r"0x[0-9a-fA-F]+", address):
+        return hex(int(address, 16))
+    return address
+
+
+def balanced(text, start, open_char, close_char):
+    # end offset (exclusive) of the bracket group opening at text[start]
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == open_char:
+            depth += 1
+        elif text[i] == close_char:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+
+def split_top(text, sep=","):
+    # split on separators that are not nested inside <>, (), {}
+    parts, depth, current = [], 0, ""
+    for c in text:
+        if c in "<({[":
+            depth += 1
+        elif c in ">)}]":
+            depth -= 1
+        if c == sep and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += c
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def squash(text):
+    return " ".join(text.split())
+
+
+def signature(masked, stop):
+    # the declaration up to its body, comments and attributes already out of the way
+    return squash(move_chunker.ATTRIBUTE_RE.sub("", masked[:stop].strip()))
+
+
+def doc_comment(text):
+    # `///` lines above the declaration
+    masked = move_chunker.mask(text)
+    lead = len(masked) - len(masked.lstrip())
+    return " ".join(DOC_RE.findall(text[:lead])) or None
+
+
+def parse_function(chunk):
+    masked = move_chunker.mask(chunk["text"])
+    m = re.search(r"\bfun\s+" + re.escape(chunk["name"]) + r"\b", masked)
+    if m is None:
+        return None
+    i = m.end()
+    generics = []
+    if masked[i:].lstrip().startswith("<"):
+        i = masked.index("<", i)
+        end = balanced(masked, i, "<", ">")
+        generics = split_top(masked[i + 1:end - 1])
+        i = end
+    params = []
+    open_at = masked.find("(", i)
+    if open_at != -1:
+        end = balanced(masked, open_at, "(", ")")
+        for param in split_top(masked[open_at + 1:end - 1]):
+            name, _, type_ = param.partition(":")
+            params.append((name.strip(), squash(type_)))
+        i = end
+    stop = len(masked)
+    for token in ("{", ";"):
+        at = masked.find(token, i)
+        if at != -1:
+            stop = min(stop, at)
+    tail, _, acquired = masked[i:stop].partition("acquires")
+    tail = tail.strip()
+    return {
+        "signature": signature(masked, stop),
+        "generics": generics,
+        "params": params,
+        "returns": squash(tail[1:]) if tail.startswith(":") else None,
+        "acquires": [a.strip() for a in acquired.split(",") if a.strip()],
+    }
+
+
+def parse_struct(chunk):
+    masked = move_chunker.mask(chunk["text"])
+    m = re.search(r"\b(?:struct|enum)\s+" + re.escape(chunk["name"]) + r"\b", masked)
+    if m is None:
+        return None
+    i = m.end()
+    generics = []
+    if masked[i:].lstrip().startswith("<"):
+        i = masked.index("<", i)
+        end = balanced(masked, i, "<", ">")
+        generics = split_top(masked[i + 1:end - 1])
+        i = end
+    fields = []
+    open_at = masked.find("{", i)
+    stop = open_at if open_at != -1 else len(masked)
+    if open_at != -1:
+        end = balanced(masked, open_at, "{", "}")
+        body = masked[open_at + 1:end - 1]
+        for field in split_top(body):
+            name, _, type_ = field.partition(":")
+            if name.strip():
+                fields.append((name.strip(), squash(type_)))
+    return {
+        "signature": signature(masked, stop),
+        "generics": generics,
+        "fields": fields,
+    }
+
+
+def record_for(chunk):
+    kind = chunk["kind"]
+    record = dict.fromkeys(FIELDS)
+    record.update(
+        kind=kind,
+        address=canonical_address(chunk["address"]),
+        module=chunk["module"],
+        name=chunk["name"],
+        path=chunk["path"],
+        start_line=chunk["start_line"],
+        end_line=chunk["end_line"],
+        doc=doc_comment(chunk["text"]),
+        # #[test] / #[test_only] items, None for everything that ships
+        test=chunk.get("test"),
+    )
+    if kind == "function":
+        parsed = parse_function(chunk)
+        if parsed is None:
+            return None
+        record.update(parsed, visibility=chunk.get("visibility"), entry=chunk.get("entry"))
+    elif kind in ("struct", "enum"):
+        parsed = parse_struct(chunk)
+        if parsed is None:
+            return None
+        record.update(parsed, abilities=chunk.get("abilities"))
+    elif kind == "module":
+        record.update(
+            signature=f"module {chunk['address']}::{chunk['module']}",
+            uses=USE_RE.findall(chunk["text"]) + ["friend " + f for f in FRIEND_RE.findall(chunk["text"])],
+        )
+    else:
+        return None
+    return tuple(record[f] for f in FIELDS)
+
+
+def keys_for(record):
+    kind, address, module, name = record[:4]
+    if kind == "module":
+        return [f"{address}::{module}", module]
+    return [f"{address}::{module}::{name}", f"{module}::{name}", name]
+
+
+class SymbolIndex:
+    def __init__(self, records):
+        self.records = records
+        self.by_key = {}
+        for i, record in enumerate(records):
+            for key in keys_for(record):
+                self.by_key.setdefault(key.lower(), []).append(i)
+        self.keys = sorted(self.by_key)
+
+    @classmethod
+    def build(cls, root=".", globs=("move-files/*.move",)):
+        chunks = move_chunker.chunk_corpus(root, list(globs))
+        records = []
+        for chunk in chunks:
+            # oversized items are split, their first part carries the signature
+            if chunk.get("part"):
+                continue
+            record = record_for(chunk)
+            if record is not None:
+                records.append(record)
+        return cls(records)
+
+    def save(self, path=INDEX_PATH):
+        with open(path, "wb") as f:
+            pickle.dump((INDEX_VERSION, self.records), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with open(path, "rb") as f:
+            version, records = pickle.load(f)
+        if version != INDEX_VERSION:
+            raise ValueError(f"{path} is index version {version}, expected {INDEX_VERSION}")
+        return cls(records)
+
+    def exact(self, name):
+        ids = self.by_key.get(normalize_query(name))
+        return [self.records[i] for i in ids] if ids else []
+
+    def prefix(self, prefix, limit=MAX_RESULTS):
+        prefix = normalize_query(prefix)
+        start = bisect.bisect_left(self.keys, prefix)
+        names = []
+        for key in self.keys[start:]:
+            if not key.startswith(prefix) or len(names) >= limit:
+                break
+            names.append(key)
+        return names
+
+    def lookup(self, query, limit=MAX_RESULTS):
+        records = self.exact(query)
+        if records:
+            return {"matches": [as_dict(r) for r in records[:limit]]}
+        return {"matches": [], "prefix": self.prefix(query, limit)}
+
+
+def normalize_query(query):
+    # `aptos_framework::coin::transfer(...)`, `0x0001::coin::transfer` and
+    # `0x1::coin::transfer` all land on the same key
+    query = str(query).strip().strip("\"'`").lower()
+    query = re.sub(r"\s*::\s*", "::", query).split("(")[0].split("<")[0].strip()
+    head, sep, rest = query.partition("::")
+    if sep:
+        head = canonical_address(head)
+    return head + sep + rest
+
+
+def as_dict(record):
+    return {f: v for f, v in zip(FIELDS, record) if v not in (None, [], ())}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(path=INDEX_PATH):
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_or_build(path)
+    return _index
+
+
+def load_or_build(path=INDEX_PATH):
+    # a pickle from an older release, or a damaged one, is rebuilt and replaced
+    # rather than failing every lookup
+    if not os.path.exists(path):
+        return SymbolIndex.build()
+    try:
+        return SymbolIndex.load(path)
+    except (ValueError, EOFError, pickle.UnpicklingError) as e:
+        print(f"{path}: {e}, rebuilding", file=sys.stderr)
+    index = SymbolIndex.build()
+    try:
+        index.save(path)
+    except OSError as e:
+        print(f"{path}: not saved, {e}", file=sys.stderr)
+    return index
+
+
+def move_symbol_lookup(input):
+    return json.dumps(get_index().lookup(input), separators=(",", ":"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the Move symbol index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--out", default=INDEX_PATH)
+    query = sub.add_parser("query")
+    query.add_argument("name")
+    query.add_argument("--index", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = SymbolIndex.build()
+        index.save(args.out)
+        print(f"Indexed {len(index.records)} symbols under {len(index.keys)} names "
+              f"in {time.perf_counter() - start:.1f}s -> {args.out}")
+    else:
+        start = time.perf_counter()
+        index = SymbolIndex.load(args.index)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        result = index.lookup(args.name)
+        elapsed = time.perf_counter() - start
+        print(json.dumps(result, indent=2))
+        print(f"load {loaded * 1000:.1f} ms, lookup {elapsed * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import pickle
+
+import pytest
+
+pytest.importorskip("requests")
+
+import abi_catalog
+import move_chunker
+import symbol_index
+
+NODE = "http://node"
+
+SOURCE = """
+module aptos_framework::coin {
+    public fun value<T>(coin: &Coin<T>): u64 { coin.value }
+
+    public entry fun transfer<T>(from: &signer, to: address, amount: u64) { }
+
+    #[test(source = @0x1)]
+    #[expected_failure(abort_code = 0x60005, location = Self)]
+    public entry fun fail_transfer(source: signer) { }
+
+    #[test_only]
+    public fun create_fake_money(source: &signer) { }
+}
+
+#[test_only]
+module aptos_framework::vector_tests {
+    public fun helper() { }
+}
+
+module aptos_framework::gone {
+    public fun old() { }
+}
+"""
+
+
+def records():
+    return [r for r in map(symbol_index.record_for, move_chunker.chunk_source(SOURCE, "coin.move")) if r]
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    state = {"packages": {"AptosFramework": 3}, "modules": {"coin", "event"}, "fetched": []}
+
+    def fetch_registry(node_url, address):
+        return dict(state["packages"]), set(state["modules"])
+
+    def fetch_module(node_url, address, module):
+        state["fetched"].append(f"{address}::{module}")
+        if module not in state["modules"]:
+            return None
+        return (("emit", "public", False, (), (("", "&mut 0x1::event::EventHandle<T0>"), ("", "T0")), ()),)
+
+    monkeypatch.setattr(abi_catalog, "fetch_registry", fetch_registry)
+    monkeypatch.setattr(abi_catalog, "fetch_module", fetch_module)
+    return state
+
+
+def test_test_items_are_not_cataloged():
+    catalog = abi_catalog.AbiCatalog.build(records())
+    assert sorted(catalog.modules["0x1"]) == ["coin", "gone"]
+    assert [f[0] for f in catalog.modules["0x1"]["coin"]] == ["transfer", "value"]
+
+
+def test_unstamped_catalog_is_not_served(chain):
+    catalog = abi_catalog.AbiCatalog.build(records())
+    assert not catalog.serves("0x1", NODE)
+    assert not catalog.serves("0x1", NODE, "coin")
+    catalog.search("coin::value", node_url=NODE)
+    assert chain["fetched"] == ["0x1::coin"]
+
+
+def test_stamped_catalog_serves_only_onchain_modules(chain):
+    catalog = abi_catalog.AbiCatalog.build(records())
+    catalog.stamp(NODE)
+    assert catalog.serves("0x1", NODE, "coin")
+    assert not catalog.serves("0x1", NODE, "gone")
+    # event is on chain but not in the snapshot, the address listing goes live
+    assert not catalog.serves("0x1", NODE)
+    assert catalog.search("0x1::coin::value", node_url=NODE) == [
+        {"function": "public 0x1::coin::value<T>(coin: &Coin<T>): u64"}]
+    assert catalog.search("gone::old", node_url=NODE) == []
+    assert catalog.search("0x1::event::emit", node_url=NODE) == [
+        {"function": "public 0x1::event::emit(&mut 0x1::event::EventHandle<T0>, T0)"}]
+
+    chain["modules"] = {"coin"}
+    catalog.stamp(NODE)
+    assert catalog.serves("0x1", NODE)
+    assert catalog.account_modules("0x1") == [[
+        "public entry coin::transfer<T>(from: &signer, to: address, amount: u64)",
+        "public coin::value<T>(coin: &Coin<T>): u64"]]
+
+
+def test_upgraded_packages_are_not_served(chain):
+    catalog = abi_catalog.AbiCatalog.build(records())
+    catalog.stamp(NODE)
+    chain["packages"] = {"AptosFramework": 4}
+    assert not catalog.serves("0x1", NODE, "coin")
+    assert catalog.search("coin::value", node_url=NODE) == []
+    assert chain["fetched"] == ["0x1::coin"]
+
+
+def test_stale_pickles_are_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr(symbol_index.SymbolIndex, "build", classmethod(lambda cls: cls(records())))
+    index_path, catalog_path = tmp_path / "symbolIndex.pkl", tmp_path / "abiCatalog.pkl"
+    # what the first release of each wrote
+    with open(index_path, "wb") as f:
+        pickle.dump((1, []), f)
+    with open(catalog_path, "wb") as f:
+        pickle.dump((1, 0, {}, {}), f)
+
+    index = symbol_index.load_or_build(str(index_path))
+    assert index.exact("coin::transfer")
+    assert symbol_index.SymbolIndex.load(str(index_path)).exact("coin::transfer")
+
+    monkeypatch.setattr(symbol_index, "get_index", lambda: index)
+    catalog = abi_catalog.load_or_build(str(catalog_path))
+    assert catalog.covers("0x1", "coin") is False
+    assert abi_catalog.AbiCatalog.load(str(catalog_path)).modules["0x1"]["coin"]
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Rejected
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def queue_in_background(controller, user):
+    tickets = []
+    thread = threading.Thread(target=lambda: tickets.append(controller.acquire(user)), daemon=True)
+    thread.start()
+    wait_for(lambda: len(controller.waiting) > 0 and controller.waiting[-1].user == user)
+    return thread, tickets
+
+
+def test_user_over_twice_their_limit_gets_429():
+    controller = AdmissionController(max_concurrent=4, max_per_user=1, max_queue=8, timeout=5)
+    running = controller.acquire("a")
+    thread, tickets = queue_in_background(controller, "a")
+    with pytest.raises(Rejected) as e:
+        controller.acquire("a")
+    assert e.value.status == 429
+    controller.release(running)
+    thread.join(5)
+    assert tickets[0].admitted
+    controller.release(tickets[0])
+    assert controller.stats()['active'] == 0
+
+
+def test_full_queue_gets_503():
+    controller = AdmissionController(max_concurrent=1, max_per_user=1, max_queue=1, timeout=5)
+    running = controller.acquire("a")
+    thread, tickets = queue_in_background(controller, "b")
+    with pytest.raises(Rejected) as e:
+        controller.acquire("c")
+    assert (e.value.status, e.value.retry_after) == (503, 2)
+    controller.release(running)
+    thread.join(5)
+    assert tickets[0].admitted
+    controller.release(tickets[0])
+
+
+def test_wait_past_the_deadline_gets_503():
+    controller = AdmissionController(max_concurrent=1, max_per_user=1, max_queue=4, timeout=0.05)
+    running = controller.acquire("a")
+    with pytest.raises(Rejected) as e:
+        controller.acquire("b")
+    assert (e.value.status, e.value.retry_after) == (503, 5)
+    # the timed out ticket left the queue and took no slot
+    assert controller.stats()['waiting'] == 0
+    controller.release(running)
+    assert controller.stats()['active'] == 0
+
+
+def test_admit_releases_on_error():
+    controller = AdmissionController(max_concurrent=1)
+    with pytest.raises(ValueError):
+        with controller.admit("a"):
+            raise ValueError
+    assert controller.stats()['active'] == 0
@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("langchain")
+os.environ.setdefault("WARM_UP", "0")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from aiohttp import web
+
+import batch_tools
+import http_client
+
+
+@pytest.fixture
+def node(monkeypatch):
+    async def account(request):
+        if request.match_info["address"] == "0x404":
+            return web.json_response({"error_code": "account_not_found"}, status=404)
+        return web.json_response({"sequence_number": "0"})
+
+    async def start():
+        runner = web.AppRunner(web.Application())
+        runner.app.router.add_get("/v1/accounts/{address}", account)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, site._server.sockets[0].getsockname()[1]
+
+    runner, port = http_client.run(start())
+    monkeypatch.setattr(batch_tools, "NODE_URL", f"http://127.0.0.1:{port}/v1")
+    batch_tools.tool_cache.transactions.invalidate()
+    yield
+    http_client.run(runner.cleanup())
+
+
+def test_unknown_accounts_have_no_transactions(node):
+    result = json.loads(batch_tools.account_transactions_batch("0x404, 0x1"))
+    assert result == {"0x404": [], "0x1": []}
+
+
+def test_sync_calls_share_one_session(node):
+    batch_tools.account_balances("0x1")
+    session = http_client._async_clients[http_client.background_loop()]._session
+    batch_tools.account_transactions_batch("0x2")
+    assert http_client._async_clients[http_client.background_loop()]._session is session
+    assert not session.closed
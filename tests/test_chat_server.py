@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("langchain")
+pytest.importorskip("gql")
+os.environ.setdefault("WARM_UP", "0")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("CONVERSATION_DB", os.path.join(tempfile.mkdtemp(), "conversations.db"))
+
+import admission
+import chatServer
+from conversation_store import ConversationStore
+from session_pool import SessionPool
+
+
+class EchoAgent:
+    def __init__(self):
+        self.history = None
+
+    def load_history(self, turns):
+        self.history = list(turns)
+
+    def chat(self, user_input, callbacks=None):
+        output = f"echo {user_input} after {len(self.history)}"
+        self.history.append({"user": user_input, "agent": output})
+        return {"output": output}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(chatServer, "sessions", SessionPool(EchoAgent))
+    monkeypatch.setattr(chatServer, "conversations", ConversationStore(str(tmp_path / "c.db")))
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController())
+    return chatServer.app.test_client()
+
+
+def chat(client, text, convo="c1"):
+    return client.post("/chat", json={"user_id": "u", "convo_id": convo, "messages": text})
+
+
+def test_turns_are_kept_and_paged(client):
+    assert chat(client, "hi").get_data(as_text=True) == "echo hi after 0"
+    assert chat(client, "again").get_data(as_text=True) == "echo again after 1"
+    page = client.get("/conversations?user_id=u&convo_id=c1&format=json&limit=1").get_json()
+    assert [t["user"] for t in page["turns"]] == ["hi"] and page["next_offset"] == 1
+    text = client.get("/conversations?user_id=u&convo_id=c1").get_data(as_text=True)
+    assert text == "User: hi\nAgent: echo hi after 0\nUser: again\nAgent: echo again after 1\n"
+    assert client.get("/sessions").get_json()["size"] == 1
+
+
+def test_rejected_turns_are_answered_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController(max_concurrent=0, max_queue=0))
+    response = chat(client, "hi")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_store_behind_on_writes_is_answered_with_503(client, monkeypatch):
+    monkeypatch.setattr(chatServer.conversations, "flush", lambda timeout=None: False)
+    response = client.get("/conversations?user_id=u&convo_id=c1")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from conversation_store import ConversationStore, StoreUnavailable
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(str(tmp_path / "c.db"), recent_turns=3, flush_timeout=0.2)
+
+
+def said(turns):
+    return [t['user'] for t in turns]
+
+
+def test_writes_land_in_the_order_they_were_made(store):
+    for i in range(3):
+        store.append("u", "c1", f"old {i}", "ok")
+        store.append("u", "c2", f"other {i}", "ok")
+    store.delete("u", "c1")
+    store.append("u", "c1", "new", "ok")
+    assert said(store.page("u", "c1")['turns']) == ["new"]
+    assert said(store.page("u", "c2")['turns']) == ["other 0", "other 1", "other 2"]
+
+
+def test_non_text_turns_are_stored_as_json(store):
+    store.append("u", "c", ["hi", "there"], {"answer": 1})
+    assert store.page("u", "c")['turns'][0]['agent'] == '{"answer": 1}'
+
+
+def test_page_walks_the_transcript_oldest_first(store):
+    for i in range(5):
+        store.append("u", "c", str(i), "ok")
+    offset, pages = 0, []
+    while offset is not None:
+        page = store.page("u", "c", offset, limit=2)
+        pages.append(said(page['turns']))
+        offset = page['next_offset']
+    assert pages == [["0", "1"], ["2", "3"], ["4"]]
+    assert store.page("u", "missing") == {'turns': [], 'next_offset': None}
+
+
+def test_recent_keeps_the_last_turns_in_memory(store):
+    for i in range(5):
+        store.append("u", "c", str(i), "ok")
+    store.forget("u", "c")
+    assert said(store.recent("u", "c")) == ["2", "3", "4"]
+    store.append("u", "c", "5", "ok")
+    assert said(store.windows[("u", "c")]) == ["3", "4", "5"]
+    assert said(store.recent("u", "c", 2)) == ["4", "5"]
+
+
+def test_turn_appended_while_loading_is_not_lost(store, monkeypatch):
+    store.append("u", "c", "first", "ok")
+    store.forget("u", "c")
+    read = store._tail
+
+    def racing_read(key):
+        # the read misses a turn that arrives right after it
+        tail = read(key)
+        store.append("u", "c", "second", "ok")
+        return tail
+
+    monkeypatch.setattr(store, "_tail", racing_read)
+    assert said(store.recent("u", "c")) == ["first"]
+    # the incomplete read did not become the window
+    assert ("u", "c") not in store.windows
+    assert store.loading == {}
+    monkeypatch.setattr(store, "_tail", read)
+    assert said(store.recent("u", "c")) == ["first", "second"]
+    assert said(store.windows[("u", "c")]) == ["first", "second"]
+
+
+def test_stalled_writer_fails_reads_loudly(store, monkeypatch, caplog):
+    write = store._write_batch
+    stalled = threading.Event()
+
+    def stall(conn, writes):
+        stalled.wait(5)
+        write(conn, writes)
+
+    monkeypatch.setattr(store, "_write_batch", stall)
+    store.append("u", "c", "hi", "ok")
+    with caplog.at_level(logging.ERROR, logger="conversation_store"):
+        with pytest.raises(StoreUnavailable):
+            store.page("u", "c")
+    assert "has not committed" in caplog.text
+    stalled.set()
+    assert store.flush(5)
+    assert said(store.page("u", "c")['turns']) == ["hi"]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_writer_is_restarted(store, monkeypatch, caplog):
+    write = store._write_batch
+
+    def die(conn, writes):
+        monkeypatch.setattr(store, "_write_batch", write)
+        raise SystemExit
+
+    monkeypatch.setattr(store, "_write_batch", die)
+    store.append("u", "c", "lost", "ok")
+    deadline = time.monotonic() + 5
+    while store.writer.is_alive():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    store.append("u", "c", "kept", "ok")
+    with caplog.at_level(logging.ERROR, logger="conversation_store"):
+        assert said(store.page("u", "c")['turns']) == ["kept"]
+    assert "writer died" in caplog.text
+
+
+def test_failing_batch_does_not_stop_the_writer(store, monkeypatch):
+    write = store._write_batch
+
+    def fail_once(conn, writes):
+        monkeypatch.setattr(store, "_write_batch", write)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(store, "_write_batch", fail_once)
+    store.append("u", "c", "lost", "ok")
+    assert store.flush(5)
+    store.append("u", "c", "kept", "ok")
+    assert said(store.page("u", "c")['turns']) == ["kept"]
+    assert store.writer.is_alive()
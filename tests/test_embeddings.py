@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import embeddings
+
+openai = pytest.importorskip("openai")
+
+
+class FlakyEmbedder(embeddings.OpenAIEmbedder):
+    remote = False
+
+    def __init__(self, errors):
+        super().__init__(max_tokens=64)
+        self.errors = list(errors)
+        self.inputs = []
+
+    def embed_batch(self, texts):
+        self.inputs.append(texts)
+        if self.errors:
+            raise self.errors.pop(0)
+        return [np.ones(4) for _ in texts]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(embeddings, "BACKOFF", 0)
+
+
+def test_rate_limits_are_retried():
+    embedder = FlakyEmbedder([openai.error.RateLimitError("slow down"),
+                              openai.error.APIError("bad gateway", http_status=502)])
+    pipeline = embeddings.EmbeddingPipeline(embedder)
+    assert len(pipeline.embed_documents(["a", "b"])) == 2
+    assert pipeline.stats()["retries"] == 2
+
+
+@pytest.mark.parametrize("error", [
+    openai.error.AuthenticationError("bad key"),
+    openai.error.InvalidRequestError("too many tokens", param="input"),
+    openai.error.APIError("bad request", http_status=400),
+])
+def test_permanent_errors_fail_at_once(error):
+    embedder = FlakyEmbedder([error] * 6)
+    with pytest.raises(type(error)):
+        embeddings.EmbeddingPipeline(embedder).embed_documents(["a"])
+    assert len(embedder.inputs) == 1
+
+
+def test_oversized_inputs_are_cut_before_sending(monkeypatch):
+    monkeypatch.setattr(embeddings, "encoding_for", lambda model: None)
+    embedder = FlakyEmbedder([])
+    cache = embeddings.EmbeddingCache(":memory:")
+    pipeline = embeddings.EmbeddingPipeline(embedder, cache)
+    long_text = "x" * 1000
+    pipeline.embed_documents([long_text, "short"])
+    assert [len(t) for t in embedder.inputs[0]] == [64, 5]
+    # cached under the full text
+    assert cache.get_many([embeddings.cache_key(pipeline.model, long_text)])
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("aptos_sdk")
+httpx = pytest.importorskip("httpx")
+
+import http_client
+from aptos_sdk.metadata import Metadata
+
+
+def test_rest_client_keeps_the_sdk_header(monkeypatch):
+    monkeypatch.setattr(httpx.Client, "get", lambda self, url, **kw: httpx.Response(200, json={"chain_id": "1"}))
+    client = http_client.rest_client("http://node/v1")
+    assert client.chain_id == 1
+    assert client.client.headers[Metadata.APTOS_HEADER] == Metadata.get_aptos_header_val()
+    assert http_client.throttle_request in client.client.event_hooks["request"]
@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pytest
+
+import retrieval
+
+
+class Embedder:
+    model = "test"
+
+    def embed_query(self, text):
+        return [1.0, 0.0] if "script" in text else [0.0, 1.0]
+
+
+def test_move_context_names_scripts_without_a_module(tmp_path, monkeypatch):
+    chunks = [
+        {"kind": "script", "name": "script", "module": None, "path": "a.move", "text": "script { }"},
+        {"kind": "function", "name": "transfer", "module": "coin", "path": "coin.move", "text": "fun transfer()"},
+    ]
+    store = str(tmp_path / "store")
+    assert not retrieval.has_store(store)
+    retrieval.RetrievalIndex(np.array([[1, 0], [0, 1]], dtype=np.float32), chunks).save(store)
+    assert retrieval.has_store(store)
+
+    engine = retrieval.RetrievalEngine(retrieval.RetrievalIndex.load(store), Embedder())
+    monkeypatch.setattr(retrieval, "get_engine", lambda: engine)
+    items = [hit["item"] for hit in json.loads(retrieval.move_context("a script", k=2))]
+    assert items == ["script", "coin::transfer"]
+
+
+def test_unavailable_tools_are_left_out():
+    pytest.importorskip("langchain")
+    from AptosToolClient import create_kit
+
+    specs = [{"name": name, "func": str, "use": "", "input": "", "available": lambda ok=ok: ok}
+             for name, ok in (("Here", True), ("Missing", False))]
+    assert [tool.name for tool in create_kit(specs)] == ["Here"]
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import semantic_cache
+
+
+WORDS = ["what", "how", "why"]
+
+
+def embed(text):
+    # questions sharing a first word are "similar"
+    vector = np.zeros(len(WORDS), dtype=np.float32)
+    vector[WORDS.index(text.split()[0])] = 1
+    return vector
+
+
+@pytest.mark.parametrize("answer", [
+    None, "", json.dumps({"answer": None}), json.dumps({"answer": ""}),
+    json.dumps("None"), json.dumps({"error": "move server down"}), "Empty Response",
+])
+def test_failed_answers_are_not_cached(answer):
+    cache = semantic_cache.SemanticCache("test", embed=embed)
+    calls = []
+
+    @cache.wrap
+    def tool(input):
+        calls.append(input)
+        return answer
+
+    tool("what is move")
+    tool("what is move")
+    assert len(calls) == 2
+    assert cache.stats()["size"] == 0 and cache.stats()["skipped"] == 2
+
+
+def test_answers_are_cached():
+    cache = semantic_cache.SemanticCache("test", embed=embed)
+    calls = []
+
+    @cache.wrap_async
+    async def tool(input):
+        calls.append(input)
+        return json.dumps({"answer": "a resource-oriented language"})
+
+    async def run():
+        await tool("what is move")
+        return await tool("what is move really")
+
+    assert json.loads(asyncio.run(run()))["answer"]
+    assert len(calls) == 1
+
+
+def test_failed_answers_saved_earlier_are_dropped(tmp_path):
+    cache = semantic_cache.SemanticCache("test", embed=embed, path=str(tmp_path))
+    cache.store("what is move", json.dumps({"answer": "a language"}))
+    cache.store("how do I", json.dumps({"answer": "like this"}))
+    # as an older release would have stored it
+    cache._insert("why", json.dumps({"answer": None}), embed("why"), 0)
+    cache.save()
+    reloaded = semantic_cache.SemanticCache("test", embed=embed, path=str(tmp_path))
+    assert reloaded.lookup("why not")[0] is None
+    assert reloaded.lookup("what is move")[0]
+
+
+def test_a_new_embedder_starts_an_empty_cache(tmp_path):
+    cache = semantic_cache.SemanticCache("test", embed=embed, path=str(tmp_path))
+    cache.store("what is move", json.dumps({"answer": "a language"}))
+    cache.save()
+
+    def wider(text):
+        return np.append(embed(text), 0)
+
+    reloaded = semantic_cache.SemanticCache("test", embed=wider, path=str(tmp_path))
+    assert reloaded.lookup("what is move")[0] is None
+    reloaded.store("how do I", json.dumps({"answer": "like this"}))
+    reloaded.save()
+    again = semantic_cache.SemanticCache("test", embed=wider, path=str(tmp_path))
+    assert again.lookup("how do I")[0] and again.stats()["size"] == 1
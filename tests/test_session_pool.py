@@ -0,0 +1,78 @@
+import threading
+import time
+
+from session_pool import SessionPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def pool(**kwargs):
+    evicted = []
+    return SessionPool(object, on_evict=lambda key, session: evicted.append(key), **kwargs), evicted
+
+
+def turn(sessions, key):
+    session = sessions.get(key)
+    sessions.release(session)
+    return session
+
+
+def test_least_recently_used_is_evicted():
+    sessions, evicted = pool(max_size=2)
+    a = turn(sessions, "a")
+    turn(sessions, "b")
+    assert turn(sessions, "a") is a
+    turn(sessions, "c")
+    assert evicted == ["b"]
+    assert "a" in sessions and "c" in sessions and len(sessions) == 2
+
+
+def test_idle_sessions_expire():
+    clock = Clock()
+    sessions, evicted = pool(ttl=60, clock=clock)
+    turn(sessions, "a")
+    clock.now = 30
+    turn(sessions, "b")
+    clock.now = 61
+    assert sessions.evict_expired() == 1
+    assert evicted == ["a"] and "b" in sessions
+
+
+def test_sessions_in_a_turn_are_never_dropped():
+    clock = Clock()
+    sessions, evicted = pool(max_size=1, ttl=60, clock=clock)
+    busy = sessions.get("busy")
+    # the pool is full, but the only session to make room with is mid-turn
+    other = sessions.get("other")
+    assert evicted == [] and len(sessions) == 2
+    sessions.release(other)
+    assert evicted == ["other"]
+    clock.now = 120
+    assert sessions.evict_expired() == 0
+    assert sessions.get("busy") is busy
+    sessions.release(busy)
+    sessions.release(busy)
+    turn(sessions, "next")
+    assert evicted == ["other", "busy"]
+
+
+def test_concurrent_first_requests_share_one_session():
+    def slow_factory():
+        time.sleep(0.05)
+        return object()
+
+    sessions = SessionPool(slow_factory)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(sessions.get("a"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(s) for s in got}) == 1
+    assert got[0].leases == 8
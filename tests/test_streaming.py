@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("langchain")
+os.environ.setdefault("WARM_UP", "0")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from aiohttp.test_utils import TestClient, TestServer
+from langchain.schema import AgentFinish
+
+import asyncChatServer
+import streaming
+from session_pool import SessionPool
+
+
+class FakeAgent:
+    def __init__(self, hang=False):
+        self.hang = hang
+        self.cancelled = asyncio.Event()
+
+    async def achat(self, user_input, callbacks):
+        stream = callbacks[0]
+        for token in ("The ", "answer"):
+            await stream.on_llm_new_token(token)
+        if self.hang:
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                self.cancelled.set()
+                raise
+        await stream.on_agent_finish(AgentFinish({"output": "The answer"}, ""), run_id=uuid.uuid4())
+        return {"output": "The answer"}
+
+
+def serve(monkeypatch, agent):
+    pool = SessionPool(lambda: agent, lock_factory=asyncio.Lock)
+    monkeypatch.setattr(asyncChatServer, "sessions", pool)
+    return pool, TestClient(TestServer(asyncChatServer.create_app()))
+
+
+def parse(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        event, data = frame.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_answer_is_sent_once(monkeypatch):
+    async def run():
+        _, client = serve(monkeypatch, FakeAgent())
+        async with client:
+            response = await client.post("/chat/stream", json={"user_id": "u", "convo_id": "c", "messages": "hi"})
+            return parse(await response.text())
+
+    events = asyncio.run(run())
+    assert [e for e, _ in events] == ["start", "token", "token", "done"]
+    assert events[-1][1] == {"output": "The answer"}
+
+
+def test_disconnect_cancels_the_agent(monkeypatch):
+    agent = FakeAgent(hang=True)
+    monkeypatch.setattr(streaming, "HEARTBEAT", 0.05)
+
+    async def run():
+        pool, client = serve(monkeypatch, agent)
+        async with client:
+            response = await client.post("/chat/stream", json={"user_id": "u", "convo_id": "c", "messages": "hi"})
+            await response.content.readuntil(b"answer")
+            response.close()
+            await asyncio.wait_for(agent.cancelled.wait(), 5)
+            session = pool.get(("u", "c"))
+            # the turn let go of the conversation once the agent had stopped
+            await asyncio.wait_for(session.lock.acquire(), 5)
+
+    asyncio.run(run())
@@ -0,0 +1,18 @@
+import tool_cache
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    now = [1000.0]
+    disk = tool_cache.DiskTier(str(tmp_path / "tools.db"))
+    cache = tool_cache.ToolCache("balance", 15, disk=disk, clock=lambda: now[0])
+    cache.set("0x1", "1.5")
+    now[0] += 14
+    assert cache.get("0x1") == (True, "1.5")
+
+    # another process, same file
+    other = tool_cache.ToolCache("balance", 15, disk=disk, clock=lambda: now[0])
+    assert other.get("0x1") == (True, "1.5")
+    now[0] += 1
+    assert cache.get("0x1") == (False, None)
+    assert other.get("0x1") == (False, None)
+    assert cache.stats()["stale"] == 1
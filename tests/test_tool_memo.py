@@ -0,0 +1,34 @@
+import asyncio
+
+from tool_memo import ToolMemo, memo_key
+
+
+def test_only_addresses_are_case_folded():
+    assert memo_key(' "0xABcd  last=5" ') == "0xabcd last=5"
+    assert memo_key("write module MyCoin") != memo_key("write module mycoin")
+
+
+def test_followers_outlive_a_cancelled_leader():
+    memo = ToolMemo()
+    calls = []
+
+    async def tool(input):
+        calls.append(input)
+        await asyncio.sleep(0.05)
+        return f"done {input}"
+
+    memoized = memo.wrap_async("Move Agent", tool)
+
+    async def run():
+        leader = asyncio.create_task(memoized("q"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(memoized("q"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        assert leader.cancelled()
+        return result
+
+    assert asyncio.run(run()) == "done q"
+    assert calls == ["q", "q"]
+    assert memo.stats()["size"] == 1 and memo.stats()["in_flight"] == 0
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import embeddings
+import move_chunker
+import retrieval
+import vector_file
+
+SOURCE = """
+module 0x1::coin {
+    struct Coin<phantom T> has store { value: u64 }
+
+    public fun value<T>(coin: &Coin<T>): u64 { coin.value }
+
+    public entry fun transfer<T>(from: &signer, to: address, amount: u64) { }
+}
+
+module 0x1::table {
+    public fun borrow<K: copy + drop, V>(table: &Table<K, V>, key: K): &V { abort 0 }
+}
+"""
+
+
+def test_retrieval_hnsw_round_trip(tmp_path):
+    pytest.importorskip("hnswlib")
+    chunks = move_chunker.chunk_source(SOURCE, "sources/coin.move")
+    embedder = embeddings.EmbeddingPipeline(embeddings.HashEmbedder())
+    index = retrieval.RetrievalIndex.build(chunks, embedder)
+    index.build_hnsw()
+    index.save(str(tmp_path / "store"), model=embedder.model)
+
+    loaded = retrieval.RetrievalIndex.load(str(tmp_path / "store"))
+    assert loaded.hnsw is not None
+    transfer = next(c for c in chunks if c["name"] == "transfer")
+    hits = retrieval.RetrievalEngine(loaded, embedder).query(transfer["text"], k=2)
+    assert len(hits) == 2
+    assert hits[0]["name"] == "transfer"
+    assert hits[0]["path"] == "sources/coin.move"
+
+
+def test_ids_from_hnsw_read_as_rows(tmp_path):
+    path = str(tmp_path / "store")
+    vector_file.write(path, np.eye(3), ["a", "b", "c"], [{"n": 0}, {"n": 1}, {"n": 2}])
+    store = vector_file.VectorFile(path)
+    ids = np.array([2, 0], dtype=np.uint64)
+    assert [store.text(i) for i in ids] == ["c", "a"]
+    assert [store.info(i)["n"] for i in ids] == [2, 0]
+
+
+@pytest.fixture
+def llama_store(tmp_path, monkeypatch):
+    llama_index = pytest.importorskip("llama_index")
+    import llama_index.utils
+    from llama_index.token_counter.mock_chain_wrapper import MockLLMPredictor
+    # the default tiktoken tokenizer downloads its vocabulary
+    monkeypatch.setattr(llama_index.utils.globals_helper, "_tokenizer", str.split)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    service_context = llama_index.ServiceContext.from_defaults(
+        embed_model=llama_index.MockEmbedding(embed_dim=8), llm_predictor=MockLLMPredictor(max_tokens=16))
+    docs = [llama_index.Document(text=f"coin transfer notes {i}",
+                                 metadata={"file_path": f"sources/f{i}.move"}) for i in range(3)]
+    index = llama_index.GPTVectorStoreIndex.from_documents(docs, service_context=service_context)
+    index.storage_context.persist(str(tmp_path / "docStore"))
+    vector_file.convert("llama", str(tmp_path / "docStore"), str(tmp_path / "docStore.bin"))
+    return str(tmp_path / "docStore.bin"), service_context
+
+
+def test_converted_store_keeps_metadata(llama_store):
+    store = vector_file.VectorFile(llama_store[0])
+    assert sorted(store.info(i)["metadata"]["file_path"] for i in range(len(store))) == \
+        ["sources/f0.move", "sources/f1.move", "sources/f2.move"]
+
+
+def test_converted_store_opens_through_get_vector_store(llama_store, monkeypatch):
+    import AptosToolClient
+    path, service_context = llama_store
+    monkeypatch.setattr(AptosToolClient, "DOC_STORE_BIN", path)
+    monkeypatch.setattr(AptosToolClient, "_vector_store", None)
+    index = AptosToolClient.get_vector_store()
+    index._service_context = service_context
+    hits = index.as_retriever(similarity_top_k=2).retrieve("coin transfer")
+    assert len(hits) == 2
+    assert all(hit.node.metadata["file_path"].startswith("sources/") for hit in hits)
+    assert all(hit.node.ref_doc_id for hit in hits)
+    with pytest.raises(TypeError):
+        index.vector_store.add([])
@@ -0,0 +1,178 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Module ABIs only change on a package upgrade, balances and transactions move
+# with every block. The TTL is the only bound: at these TTLs the ledger barely
+# moves between fetch and expiry, a version bound would never fire first.
+MODULES_TTL = int(os.getenv("CACHE_MODULES_TTL", str(6 * 60 * 60)))
+BALANCE_TTL = int(os.getenv("CACHE_BALANCE_TTL", "15"))
+TRANSACTIONS_TTL = int(os.getenv("CACHE_TRANSACTIONS_TTL", "30"))
+NFTS_TTL = int(os.getenv("CACHE_NFTS_TTL", "60"))
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+# set to a file path to share entries across processes and restarts
+DISK_PATH = os.getenv("TOOL_CACHE_DB")
+
+
+class DiskTier:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # sqlite connections must not be used across a fork either
+        os.register_at_fork(after_in_child=self.after_fork)
+        # was tool_cache, with a ledger version per entry; a file from then keeps
+        # that table unused
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS tool_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires REAL NOT NULL, PRIMARY KEY (namespace, key))")
+
+    def after_fork(self):
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite connections can't cross threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        row = self.connection().execute(
+            "SELECT value, expires FROM tool_entries WHERE namespace=? AND key=?",
+            (namespace, key)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, expires):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO tool_entries VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), expires))
+
+    def delete(self, namespace, key):
+        self.connection().execute(
+            "DELETE FROM tool_entries WHERE namespace=? AND key=?", (namespace, key))
+
+    def purge(self, now=None):
+        self.connection().execute(
+            "DELETE FROM tool_entries WHERE expires < ?", (now or time.time(),))
+
+
+class ToolCache:
+    def __init__(self, namespace, ttl, max_entries=MAX_ENTRIES, disk=None, clock=time.time):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = disk
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (value, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now < entry[1]:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[0]
+                del self.entries[key]
+                self.stale += 1
+        if self.disk is not None:
+            entry = self.disk.get(self.namespace, key)
+            if entry is not None and now < entry[1]:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, entry)
+                return True, entry[0]
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        entry = (value, self.clock() + self.ttl)
+        with self._lock:
+            self._store(key, entry)
+        if self.disk is not None:
+            self.disk.set(self.namespace, key, *entry)
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+        if self.disk is not None and key is not None:
+            self.disk.delete(self.namespace, key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self.entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+def normalize_address(input):
+    # the agent passes addresses with stray quotes and whitespace now and then
+    return str(input).strip().strip('"\'').lower()
+
+
+def cached(cache, key=normalize_address):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(input, *args, **kwargs):
+            cache_key = key(input)
+            hit, value = cache.get(cache_key)
+            if hit:
+                return value
+            value = func(input, *args, **kwargs)
+            # failed lookups come back empty, don't pin them for a whole TTL
+            if value:
+                cache.set(cache_key, value)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorate
+
+
+disk = DiskTier(DISK_PATH) if DISK_PATH else None
+
+balances = ToolCache("balance", BALANCE_TTL, disk=disk)
+transactions = ToolCache("transactions", TRANSACTIONS_TTL, disk=disk)
+modules = ToolCache("modules", MODULES_TTL, disk=disk)
+nfts = ToolCache("nfts", NFTS_TTL, disk=disk)
+
+caches = [balances, transactions, modules, nfts]
+
+
+def stats():
+    return {cache.namespace: cache.stats() for cache in caches}
@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Tool results remembered for one conversation: the agent asking the same tool
+# the same thing twice within MEMO_TTL gets the first answer back, and identical
+# calls that overlap share a single request (single-flight).
+MEMO_TTL = int(os.getenv("TOOL_MEMO_TTL", "60"))
+MEMO_MAX_ENTRIES = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", "64"))
+
+memo_calls = metrics.counter("movegpt_tool_memo_total", "Memoized tool calls by result, hit, miss or coalesced")
+
+
+ADDRESS_RE = re.compile(r"0x[0-9a-fA-F]+")
+
+
+def memo_key(input):
+    # collapsed whitespace and stray quotes; only addresses are case folded, a
+    # code request for MyCoin is not one for mycoin
+    text = " ".join(str(input).split()).strip('"\'')
+    return ADDRESS_RE.sub(lambda m: m.group(0).lower(), text)
+
+
+class LeaderCancelled(Exception):
+    # the call the followers were waiting on was cancelled with its caller;
+    # they still want the result, so one of them makes the call itself
+    pass
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ToolMemo:
+    def __init__(self, ttl=MEMO_TTL, max_entries=MEMO_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.entries = OrderedDict()  # (tool, key) -> (value, expires)
+        self.flights = {}  # (tool, key) -> Flight
+        self.async_flights = {}  # (tool, key) -> asyncio.Future
+        self.counts = {'hit': 0, 'miss': 0, 'coalesced': 0}
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[1] <= self.clock():
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        return True, entry[0]
+
+    def _set(self, key, value):
+        # empty results are failures, the next call should retry
+        if not value:
+            return
+        self.entries[key] = (value, self.clock() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _count(self, result):
+        self.counts[result] += 1
+        memo_calls.inc(result=result)
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def memoized(input, *args, **kwargs):
+            key = (name, memo_key(input))
+            with self._lock:
+                hit, value = self._get(key)
+                if hit:
+                    self._count("hit")
+                    return value
+                flight = self.flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.flights[key] = Flight()
+                    self._count("miss")
+                else:
+                    self._count("coalesced")
+            if not leader:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            try:
+                flight.value = func(input, *args, **kwargs)
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    if flight.error is None:
+                        self._set(key, flight.value)
+                    del self.flights[key]
+                flight.done.set()
+            return flight.value
+        memoized.memo = self
+        return memoized
+
+    def wrap_async(self, name, coroutine):
+        @functools.wraps(coroutine)
+        async def memoized(input, *args, **kwargs):
+            key = (name, memo_key(input))
+            with self._lock:
+                hit, value = self._get(key)
+                if hit:
+                    self._count("hit")
+                    return value
+                future = self.async_flights.get(key)
+                leader = future is None
+                if leader:
+                    future = self.async_flights[key] = asyncio.get_running_loop().create_future()
+                    self._count("miss")
+                else:
+                    self._count("coalesced")
+            if not leader:
+                try:
+                    # a follower giving up must not cancel the leader's call
+                    return await asyncio.shield(future)
+                except LeaderCancelled:
+                    return await memoized(input, *args, **kwargs)
+            try:
+                value = await coroutine(input, *args, **kwargs)
+            except asyncio.CancelledError:
+                future.set_exception(LeaderCancelled())
+                future.exception()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # retrieved here so an unawaited future doesn't log a warning
+                future.exception()
+                raise
+            else:
+                future.set_result(value)
+            finally:
+                with self._lock:
+                    if future.done() and future.exception() is None:
+                        self._set(key, future.result())
+                    del self.async_flights[key]
+            return value
+        memoized.memo = self
+        return memoized
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self.entries),
+                **self.counts,
+                'in_flight': len(self.flights) + len(self.async_flights),
+            }
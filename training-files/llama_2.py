@@ -6,6 +6,10 @@ from llama_index.llms import Replicate
 from llama_index.llms.llama_utils import messages_to_prompt, completion_to_prompt
 import openai
 
+# the repo root, for the shared embedding stage
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import embeddings
+
 # Set up logging
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logging.getLogger().addHandler(logging.StreamHandler(stream=sys.stdout))
@@ -36,7 +40,8 @@ llm = Replicate(
 )
 
 # Set a global service context
-ctx = ServiceContext.from_defaults(llm=llm)
+# embeddings go through the batched, cached stage, a rerun only embeds new text
+ctx = ServiceContext.from_defaults(llm=llm, embed_model=embeddings.llama_embedding(embeddings.get_pipeline()))
 set_global_service_context(ctx)
 
 # Load .move and .md documents
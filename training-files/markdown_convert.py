@@ -1,56 +1,193 @@
+import argparse
+import hashlib
+import json
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor
 
-def convert_move_to_md(move_file_path, md_file_path):
-    try:
-        with open(move_file_path, 'r') as move_file:
-            code = move_file.read()
+# Prepares dapps/ for indexing: every .move source gets a fenced markdown copy in
+# its dapp's md-move/ folder. Output names carry the content hash, so the same
+# source always maps to the same file, and a manifest of source -> output lets
+# reruns skip everything that did not change.
+START_DIRECTORY = 'dapps'
+MANIFEST_NAME = '.convert-manifest.json'
+WORKERS = int(os.getenv('CONVERT_WORKERS', str(os.cpu_count() or 4)))
+HASH_CHARS = 12
+
+
+def md_name(file, digest):
+    return f"{file[:-len('.move')]}-{digest[:HASH_CHARS]}.md"
 
-        # Check for duplicate filenames and add a counter if needed
-        counter = 1
-        original_md_file_path = md_file_path
-        while os.path.exists(md_file_path):
-            md_file_path = original_md_file_path.replace('.md', f'_{counter}.md')
-            counter += 1
 
-        with open(md_file_path, 'w') as md_file:
-            md_file.write("```rust\n" + code + "\n```")
-        print(f"Converted {move_file_path} to {md_file_path}")
+def legacy_stems(file):
+    # what the converter wrote before outputs carried the hash: <name>.md, and
+    # <name>_1.md, <name>_2.md... from its counter on every rerun
+    if not file.endswith('.md'):
+        return ()
+    stem = file[:-len('.md')]
+    base, sep, counter = stem.rpartition('_')
+    return (stem, base) if sep and counter.isdigit() else (stem,)
+
+
+def convert_move_to_md(task):
+    move_file_path, md_move_folder = task
+    try:
+        with open(move_file_path, 'rb') as move_file:
+            code = move_file.read()
+        digest = hashlib.sha256(code).hexdigest()
+        md_file_path = os.path.join(md_move_folder, md_name(os.path.basename(move_file_path), digest))
+        # same content, same name: an existing output is already correct
+        if not os.path.exists(md_file_path):
+            tmp_path = md_file_path + '.tmp'
+            with open(tmp_path, 'w') as md_file:
+                md_file.write("```rust\n" + code.decode('utf-8', errors='replace') + "\n```")
+            os.replace(tmp_path, md_file_path)
+        stat = os.stat(move_file_path)
+        return move_file_path, {'sha256': digest, 'output': md_file_path,
+                                'size': stat.st_size, 'mtime': stat.st_mtime}, None
     except Exception as e:
-        print(f"Error processing {move_file_path}: {e}")
+        return move_file_path, None, str(e)
 
-def process_directory(directory):
-    # Define folder paths
+
+def organize(directory, prune=False):
+    # one walk: .move files into move/, .md into markdown/, the rest left alone
+    # unless pruning. Returns the .move sources to convert.
     move_folder = os.path.join(directory, 'move')
     md_move_folder = os.path.join(directory, 'md-move')
     markdown_folder = os.path.join(directory, 'markdown')
+    for folder in (move_folder, md_move_folder, markdown_folder):
+        os.makedirs(folder, exist_ok=True)
 
-    # Create folders if they don't exist
-    os.makedirs(move_folder, exist_ok=True)
-    os.makedirs(md_move_folder, exist_ok=True)
-    os.makedirs(markdown_folder, exist_ok=True)
-
-    # Move all .move and .md files to their respective folders
+    sources = []
     for root, dirs, files in os.walk(directory):
+        if root == md_move_folder:
+            dirs[:] = []
+            continue
         for file in files:
             file_path = os.path.join(root, file)
+            if not os.path.isfile(file_path):
+                # dangling symlinks into repos that were not vendored
+                continue
             if file.endswith('.move'):
-                shutil.move(file_path, os.path.join(move_folder, file))
+                target = file_path if root == move_folder else place(file_path, move_folder)
+                sources.append(target)
             elif file.endswith('.md'):
-                shutil.move(file_path, os.path.join(markdown_folder, file))
-            else:
-                os.remove(file_path)  # Delete other files
+                if root != markdown_folder:
+                    place(file_path, markdown_folder)
+            elif prune:
+                os.remove(file_path)
+    # what place() moved into move/ comes up again when the walk gets there
+    return list(dict.fromkeys(sources)), md_move_folder
 
-    # Convert .move files to .md as before
-    for root, dirs, files in os.walk(move_folder):
-        for file in files:
-            if file.endswith('.move'):
-                move_file_path = os.path.join(root, file)
-                md_file_path = os.path.join(md_move_folder, file.replace('.move', '.md'))
-                convert_move_to_md(move_file_path, md_file_path)
-
-# Start from the dapps/ directory
-start_directory = 'dapps'
-for subdir in os.listdir(start_directory):
-    if os.path.isdir(os.path.join(start_directory, subdir)):
-        process_directory(os.path.join(start_directory, subdir))
+
+def place(file_path, folder):
+    # move into folder; a name already taken by different content gets the hash
+    target = os.path.join(folder, os.path.basename(file_path))
+    if os.path.exists(target):
+        if file_digest(target) == file_digest(file_path):
+            os.remove(file_path)
+            return target
+        stem, ext = os.path.splitext(os.path.basename(file_path))
+        target = os.path.join(folder, f"{stem}-{file_digest(file_path)[:HASH_CHARS]}{ext}")
+    os.replace(file_path, target)
+    return target
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def unchanged(path, entry):
+    if entry is None or not os.path.exists(entry['output']):
+        return False
+    stat = os.stat(path)
+    return stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert dapp .move sources to markdown")
+    parser.add_argument('directory', nargs='?', default=START_DIRECTORY)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--prune', action='store_true',
+                        help="delete files that are not .move or .md, and md-move outputs no source maps to")
+    args = parser.parse_args()
+
+    manifest_path = os.path.join(args.directory, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    tasks = []
+    seen = set()
+    for subdir in sorted(os.listdir(args.directory)):
+        directory = os.path.join(args.directory, subdir)
+        if not os.path.isdir(directory):
+            continue
+        sources, md_move_folder = organize(directory, args.prune)
+        for source in sources:
+            seen.add(source)
+            if not unchanged(source, manifest.get(source)):
+                tasks.append((source, md_move_folder))
+
+    converted = errors = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for source, entry, error in executor.map(convert_move_to_md, tasks, chunksize=32):
+            if error:
+                errors += 1
+                print(f"Error processing {source}: {error}")
+                continue
+            old = manifest.get(source)
+            if old and old['output'] != entry['output'] and os.path.exists(old['output']):
+                os.remove(old['output'])
+            manifest[source] = entry
+            converted += 1
+
+    for source in set(manifest) - seen:
+        # source deleted upstream, its copy goes with it
+        output = manifest.pop(source)['output']
+        if os.path.exists(output):
+            os.remove(output)
+    outputs = {entry['output'] for entry in manifest.values()}
+    # a tree converted before the hashed names still has the unhashed copies
+    # next to each <name>-<hash>.md; left there, the corpus would be indexed
+    # two or more times
+    stems = {}
+    for source in seen:
+        entry = manifest.get(source)
+        if entry is not None:
+            stems.setdefault(os.path.dirname(entry['output']), set()).add(
+                os.path.basename(source)[:-len('.move')])
+    migrated = 0
+    for folder, names in stems.items():
+        for file in os.listdir(folder):
+            path = os.path.join(folder, file)
+            if path not in outputs and any(stem in names for stem in legacy_stems(file)):
+                os.remove(path)
+                migrated += 1
+    if args.prune:
+        for subdir in os.listdir(args.directory):
+            md_move_folder = os.path.join(args.directory, subdir, 'md-move')
+            if os.path.isdir(md_move_folder):
+                for file in os.listdir(md_move_folder):
+                    path = os.path.join(md_move_folder, file)
+                    if path not in outputs:
+                        os.remove(path)
+
+    save_manifest(manifest_path, manifest)
+    print(f"Converted {converted}, unchanged {len(seen) - len(tasks)}, errors {errors}, "
+          f"replaced {migrated} unhashed outputs, {len(manifest)} sources in {manifest_path}")
+
+
+if __name__ == '__main__':
+    main()
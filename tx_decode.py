@@ -0,0 +1,122 @@
+import functools
+import json
+
+# Transaction pages from the fullnode are mostly write sets and events the agent
+# never sees. Pages decode straight into TxRecords, which keep only what a
+# summary needs. Backends, fastest available first:
+# - ijson with its C backend, one transaction at a time off the socket, so a
+#   page is never materialized whole
+# - orjson on the whole body
+# - the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+    # the pure Python ijson backends lose to a whole-page orjson parse
+    if ijson.backend_name != "yajl2_c":
+        ijson = None
+except ImportError:
+    ijson = None
+
+STREAMING = ijson is not None
+
+
+class TxRecord:
+    __slots__ = ("address", "module", "function", "type", "type_arguments", "arguments",
+                 "version", "success")
+
+    def __init__(self, address=None, module=None, function=None, type=None,
+                 type_arguments=None, arguments=None, version=None, success=None):
+        self.address = address
+        self.module = module
+        self.function = function
+        self.type = type
+        self.type_arguments = type_arguments
+        self.arguments = arguments
+        self.version = version
+        self.success = success
+
+    def as_dict(self):
+        # same keys, in the same order, as the agent has always been given
+        if self.function is not None:
+            tx = {'address': self.address, 'module': self.module, 'function': self.function}
+        else:
+            tx = {'type': self.type}
+        if self.type_arguments:
+            tx['type_arguments'] = self.type_arguments
+        if self.arguments:
+            tx['arguments'] = self.arguments
+        if self.version is not None:
+            tx['version'] = self.version
+        if self.success is not None:
+            tx['success'] = self.success
+        return tx
+
+    def __repr__(self):
+        return f"TxRecord({self.as_dict()!r})"
+
+
+# a page is usually a handful of entry functions called over and over
+@functools.lru_cache(maxsize=4096)
+def split_function(func_str):
+    parts = func_str.split("::")
+    return parts[0], parts[1], parts[2]
+
+
+def record(d):
+    payload = d.get('payload') or {}
+    if payload.get('type') == 'multisig_payload':
+        payload = payload.get('transaction_payload') or payload
+    rec = TxRecord(type_arguments=payload.get('type_arguments') or None,
+                   arguments=payload.get('arguments') or None,
+                   success=d.get('success'))
+    function = payload.get('function')
+    if function is not None:
+        rec.address, rec.module, rec.function = split_function(function)
+    else:
+        rec.type = payload.get('type', d.get('type'))
+    version = d.get('version')
+    if version is not None:
+        rec.version = int(version)
+    return rec
+
+
+def loads(body):
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # orjson stops at 64-bit integers, json doesn't
+            pass
+    return json.loads(body)
+
+
+def dumps(records):
+    out = [r.as_dict() for r in records]
+    if orjson is not None:
+        try:
+            return orjson.dumps(out).decode()
+        except TypeError:
+            pass
+    return json.dumps(out, separators=(',', ':'))
+
+
+def decode_page(body):
+    return [record(d) for d in loads(body)]
+
+
+def iter_stream(stream):
+    # one transaction dict alive at a time
+    for d in ijson.items(stream, "item", use_float=True):
+        yield record(d)
+
+
+def decode_response(response):
+    # `response` is a requests response, opened with stream=STREAMING
+    if STREAMING:
+        response.raw.decode_content = True
+        return list(iter_stream(response.raw))
+    return decode_page(response.content)
@@ -0,0 +1,101 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+import tx_decode
+
+# The fullnode serves at most 100 transactions per page
+PAGE_LIMIT = 100
+# pages in flight at once, which is also the most we ever hold in memory
+CONCURRENCY = 4
+
+
+def split_function(func_str):
+    address, module, function = tx_decode.split_function(func_str)
+    return {'address': address, 'module': module, 'function': function}
+
+
+def summarize(d):
+    # only what the agent needs; payloads without an entry function
+    # (scripts, module publishing, multisig without a body) keep just their type
+    return tx_decode.record(d).as_dict()
+
+
+def sequence_number(node_url, address):
+    # number of transactions the account has sent, i.e. one past the last cursor
+    req = http_client.get(node_url + "/accounts/" + address)
+    if req.status_code == 404:
+        return 0
+    req.raise_for_status()
+    return int(req.json()['sequence_number'])
+
+
+def fetch_page(node_url, address, start, limit):
+    # decoded into TxRecords as it arrives, the raw page is never kept
+    with http_client.get(node_url + "/accounts/" + address + '/transactions',
+                         params={'start': start, 'limit': limit},
+                         stream=tx_decode.STREAMING) as req:
+        req.raise_for_status()
+        return tx_decode.decode_response(req)
+
+
+def page_cursors(end, start=0, page_size=PAGE_LIMIT, newest_first=True):
+    if newest_first:
+        upper = end
+        while upper > start:
+            lower = max(start, upper - page_size)
+            yield lower, upper - lower
+            upper = lower
+    else:
+        lower = start
+        while lower < end:
+            yield lower, min(page_size, end - lower)
+            lower += page_size
+
+
+def iter_pages(node_url, address, cursors, concurrency=CONCURRENCY):
+    # keeps up to `concurrency` pages downloading ahead of the consumer, in order
+    cursors = iter(cursors)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque()
+        try:
+            for cursor in cursors:
+                pending.append(pool.submit(fetch_page, node_url, address, *cursor))
+                if len(pending) >= concurrency:
+                    break
+            while pending:
+                page = pending.popleft().result()
+                next_cursor = next(cursors, None)
+                if next_cursor is not None:
+                    pending.append(pool.submit(fetch_page, node_url, address, *next_cursor))
+                yield page
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_transactions(node_url, address, last=None, since_version=None, start=None,
+                      page_size=PAGE_LIMIT, concurrency=CONCURRENCY, predicate=None):
+    # newest first by default: `last` stops after that many matches and
+    # `since_version` at the first older transaction. A `start` sequence number
+    # walks forward from there instead.
+    if last is not None and predicate is None and since_version is None:
+        # a handful of recent transactions shouldn't prefetch whole pages
+        page_size = min(page_size, last)
+        concurrency = min(concurrency, -(-last // page_size))
+    end = sequence_number(node_url, address)
+    newest_first = start is None
+    cursors = page_cursors(end, start or 0, page_size, newest_first)
+    count = 0
+    for page in iter_pages(node_url, address, cursors, concurrency):
+        for tx in (reversed(page) if newest_first else page):
+            if since_version is not None and tx.version is not None and tx.version < since_version:
+                if newest_first:
+                    return
+                continue
+            if predicate is not None and not predicate(tx):
+                continue
+            yield tx
+            count += 1
+            if last is not None and count >= last:
+                return
@@ -0,0 +1,281 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Vector stores as flat binary files instead of JSON lists of floats. A store
+# is a directory holding:
+#   meta.json       small header: format, version, count, dim, model, source
+#   embeddings.npy  float32 (count, dim), rows L2-normalized
+#   offsets.npy     int64 (count + 1, 2), text and info byte offsets per chunk
+#   text.bin        the chunk texts, utf-8, back to back
+#   info.bin        per-chunk JSON (ids, path, metadata), back to back
+# Everything is opened with mmap: loading takes milliseconds, nothing is copied
+# until a row is read, and every process opening the store shares the same
+# page cache.
+FORMAT = "movegpt-vectors"
+FORMAT_VERSION = 1
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def write(path, matrix, texts, infos, model=None, source=None):
+    # written next to `path` and swapped in, readers never see half a store
+    matrix = normalize_rows(matrix)
+    if matrix.ndim != 2 or len(matrix) != len(texts) or len(texts) != len(infos):
+        raise ValueError(f"{len(matrix)} vectors, {len(texts)} texts and {len(infos)} infos")
+    tmp = path.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    offsets = np.zeros((len(texts) + 1, 2), dtype=np.int64)
+    with open(os.path.join(tmp, "text.bin"), "wb") as text_file, \
+            open(os.path.join(tmp, "info.bin"), "wb") as info_file:
+        for i, (text, info) in enumerate(zip(texts, infos)):
+            offsets[i + 1, 0] = offsets[i, 0] + text_file.write(text.encode("utf-8"))
+            offsets[i + 1, 1] = offsets[i, 1] + info_file.write(
+                json.dumps(info, separators=(",", ":")).encode("utf-8"))
+    np.save(os.path.join(tmp, "embeddings.npy"), matrix)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    meta = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "count": len(texts),
+        "dim": int(matrix.shape[1]) if len(matrix) else 0,
+        "dtype": "float32",
+        "model": model,
+        "source": source,
+        "created": time.time(),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    old = path.rstrip("/") + ".old"
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def is_store(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+def map_file(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Records:
+    # chunk i as a dict, decoded only when asked for
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, i):
+        return dict(self.store.info(i), text=self.store.text(i))
+
+
+class VectorFile:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT or self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is {self.meta.get('format')} v{self.meta.get('version')}, "
+                             f"expected {FORMAT} v{FORMAT_VERSION}")
+        self.matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.texts = map_file(os.path.join(path, "text.bin"))
+        self.infos = map_file(os.path.join(path, "info.bin"))
+        if self.matrix.shape[0] != self.meta["count"] or len(self.texts) != self.offsets[-1, 0]:
+            raise ValueError(f"{path} is truncated or does not match its header")
+        self.records = Records(self)
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def text(self, i):
+        # ids come back from numpy and hnswlib as uint64, which offsets[i + 1]
+        # would turn into a float index
+        i = int(i)
+        start, end = self.offsets[i, 0], self.offsets[i + 1, 0]
+        return self.texts[start:end].decode("utf-8")
+
+    def info(self, i):
+        i = int(i)
+        start, end = self.offsets[i, 1], self.offsets[i + 1, 1]
+        return loads(self.infos[start:end])
+
+    def search(self, query_vectors, k):
+        # (n, d) queries -> (n, k) row ids and cosine scores, best first
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        k = min(k, len(self))
+        scores = queries @ self.matrix.T
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def node_metadata(node):
+    # llama_index 0.6.x keeps it under "metadata", older releases under "extra_info"
+    return node.get("metadata") or node.get("extra_info") or {}
+
+
+def from_llama_storage(persist_dir):
+    # a llama_index StorageContext persist dir: vector_store.json + docstore.json
+    vectors = read_json(os.path.join(persist_dir, "vector_store.json"))
+    docstore = read_json(os.path.join(persist_dir, "docstore.json"))
+    embeddings = vectors["embedding_dict"]
+    ref_docs = vectors.get("text_id_to_ref_doc_id") or vectors.get("text_id_to_doc_id") or {}
+    nodes = next(v for k, v in docstore.items() if k.endswith("/data"))
+    ids = [node_id for node_id in embeddings if node_id in nodes]
+    texts, infos = [], []
+    for node_id in ids:
+        node = nodes[node_id].get("__data__", nodes[node_id])
+        texts.append(node.get("text") or "")
+        infos.append({"id": node_id, "doc_id": ref_docs.get(node_id),
+                      "metadata": node_metadata(node)})
+    return np.array([embeddings[i] for i in ids], dtype=np.float32), texts, infos
+
+
+def from_simple_index(path):
+    # a GPTSimpleVectorIndex.save_to_disk file, docs and embeddings in one JSON
+    data = read_json(path)
+    vectors = data["vector_store"].get("simple_vector_store_data_dict", data["vector_store"])
+    embeddings = vectors["embedding_dict"]
+    ref_docs = vectors.get("text_id_to_doc_id") or {}
+    docs = data["docstore"]["docs"]
+    ids = [node_id for node_id in embeddings if node_id in docs]
+    texts = [docs[i].get("text") or "" for i in ids]
+    infos = [{"id": i, "doc_id": ref_docs.get(i), "metadata": node_metadata(docs[i])} for i in ids]
+    return np.array([embeddings[i] for i in ids], dtype=np.float32), texts, infos
+
+
+def from_retrieval_store(path):
+    # retrieval.py's older embeddings.npy + chunks.json pair
+    matrix = np.load(os.path.join(path, "embeddings.npy"))
+    with open(os.path.join(path, "chunks.json")) as f:
+        chunks = json.load(f)
+    texts = [c["text"] for c in chunks]
+    infos = [{k: v for k, v in c.items() if k != "text"} for c in chunks]
+    return matrix, texts, infos
+
+
+CONVERTERS = {
+    "llama": from_llama_storage,
+    "simple": from_simple_index,
+    "retrieval": from_retrieval_store,
+}
+
+
+def convert(kind, source, out, model=None):
+    matrix, texts, infos = CONVERTERS[kind](source)
+    return write(out, matrix, texts, infos, model=model, source=f"{kind}:{source}")
+
+
+def llama_index(store, service_context=None):
+    # a llama_index index answering from the mapped store, for use_gh
+    from llama_index import GPTVectorStoreIndex
+    from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
+    from llama_index.vector_stores.types import VectorStore, VectorStoreQueryResult
+
+    class MappedVectorStore(VectorStore):
+        stores_text = True
+        is_embedding_query = True
+
+        @property
+        def client(self):
+            return store
+
+        def add(self, embedding_results):
+            raise TypeError("the mapped store is read-only, rebuild and convert instead")
+
+        def delete(self, ref_doc_id, **delete_kwargs):
+            raise TypeError("the mapped store is read-only, rebuild and convert instead")
+
+        def query(self, query, **kwargs):
+            ids, scores = store.search(np.asarray(query.query_embedding, dtype=np.float32),
+                                       query.similarity_top_k)
+            nodes = []
+            for i in ids[0]:
+                info = store.info(i)
+                node = TextNode(text=store.text(i), id_=info.get("id") or str(i), metadata=node_metadata(info))
+                if info.get("doc_id"):
+                    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=info["doc_id"])
+                nodes.append(node)
+            return VectorStoreQueryResult(nodes=nodes, similarities=scores[0].tolist(),
+                                          ids=[n.node_id for n in nodes])
+
+    return GPTVectorStoreIndex.from_vector_store(MappedVectorStore(), service_context=service_context)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path):
+    # one mapping per path and process
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = VectorFile(path)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert vector stores to the mapped binary format")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert")
+    conv.add_argument("kind", choices=sorted(CONVERTERS))
+    conv.add_argument("source", help="persist dir, save_to_disk file or retrieval store")
+    conv.add_argument("out")
+    conv.add_argument("--model", default="text-embedding-ada-002")
+    info = sub.add_parser("info")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        start = time.perf_counter()
+        meta = convert(args.kind, args.source, args.out, args.model)
+        print(f"Converted {meta['count']} chunks of {meta['dim']} dims "
+              f"in {time.perf_counter() - start:.1f}s -> {args.out}")
+    else:
+        start = time.perf_counter()
+        store = VectorFile(args.path)
+        print(json.dumps(store.meta, indent=2))
+        print(f"open {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()